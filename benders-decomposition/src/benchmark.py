@@ -0,0 +1,149 @@
+"""
+Benchmark of the standalone model and Benders Decomposition on generated instances.
+
+Every case runs in its own process, so peak memory is measured per case and Gurobi state is not shared.
+Run from `benders-decomposition/src`:
+    python main.py benchmark --sizes 10x50 20x100 --seeds 0 1 --output results.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing as mp
+import resource
+import subprocess
+import sys
+from typing import Dict, List, Any, Tuple
+
+from input import generate_instance
+from input.instance_generator import COST_DISTRIBUTIONS
+
+METHODS = ['standalone', 'benders_single', 'benders_multi']
+
+COLUMNS = ['method', 'facilities', 'customers', 'seed', 'objective', 'gap', 'build_time', 'runtime',
+           'sub_problem_time', 'callbacks', 'cuts', 'peak_rss_mb']
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_case(method: str, instance: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Generates the instance and solves it by given method. Runs in a worker process.
+    """
+    # imported here, so the benchmark module can be loaded without Gurobi
+    from benders_decomposition.solver import solve_using_benders_decomposition
+    from standalone_facility_location_model import solve_using_standalone_model
+
+    input_data = generate_instance(**instance)
+    if method == 'standalone':
+        statistics = solve_using_standalone_model(input_data, options['candidates'])
+    else:
+        statistics = solve_using_benders_decomposition(input_data,
+                                                       cuts=method[len('benders_'):],
+                                                       backend=options['backend'],
+                                                       candidates=options['candidates'])
+        statistics['cuts'] = statistics['feasibility_cuts'] + statistics['optimality_cuts']
+    statistics['peak_rss_mb'] = _peak_rss_mb()
+    return statistics
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run_benchmark(sizes: List[Tuple[int, int]],
+                  methods: List[str],
+                  seeds: List[int],
+                  instance_options: Dict[str, Any],
+                  options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Solves generated instance of every size and seed by every method.
+    :param sizes: list of pairs (number of facilities, number of customers)
+    :param methods: methods from METHODS
+    :param seeds: seeds of the instance generator
+    :param instance_options: remaining arguments of generate_instance
+    :param options: solver options - 'backend' and 'candidates'
+    :return: one record per case, failed cases have 'error' set
+    """
+    context = mp.get_context('spawn')
+    records = []
+    for n_facilities, n_customers in sizes:
+        for seed in seeds:
+            instance = dict(instance_options, n_facilities=n_facilities, n_customers=n_customers, seed=seed)
+            for method in methods:
+                record = dict(method=method, facilities=n_facilities, customers=n_customers, seed=seed)
+                logging.info("Benchmark case %s.", record)
+                # a fresh process per case keeps peak RSS of cases apart
+                with context.Pool(1, maxtasksperchild=1) as pool:
+                    try:
+                        record.update(pool.apply(_run_case, (method, instance, options)))
+                    except Exception as ex:
+                        logging.exception("Benchmark case failed.")
+                        record['error'] = repr(ex)
+                records.append(record)
+    return records
+
+
+def report(records: List[Dict[str, Any]]) -> None:
+    logging.info("** Benchmark results **")
+    logging.info(" ".join("%16s" for _ in COLUMNS), *COLUMNS)
+    for record in records:
+        logging.info(" ".join("%16s" for _ in COLUMNS),
+                     *[f"{record[c]:.6g}" if isinstance(record.get(c), float) else record.get(c, '')
+                       for c in COLUMNS])
+
+
+def _size(value: str) -> Tuple[int, int]:
+    n_facilities, n_customers = value.lower().split('x')
+    return int(n_facilities), int(n_customers)
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(prog='main.py benchmark',
+                                     description="Benchmarks solution methods on generated instances.")
+    parser.add_argument('--sizes', type=_size, nargs='+', default=[(10, 50), (20, 100)],
+                        help='Instance sizes as <facilities>x<customers>. default=10x50 20x100.')
+    parser.add_argument('--methods', choices=METHODS, nargs='+', default=METHODS,
+                        help='Methods to benchmark. default=all.')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0],
+                        help='Seeds of the instance generator. default=0.')
+    parser.add_argument('--costs', choices=COST_DISTRIBUTIONS, default='euclidean',
+                        help='Distribution of transport costs. default=euclidean.')
+    parser.add_argument('--capacity-tightness', type=float, default=2.0,
+                        help='Ratio of total supply to total demand. default=2.0.')
+    parser.add_argument('--density', type=float, default=1.0,
+                        help='Fraction of existing lanes. default=1.0.')
+    parser.add_argument('--clusters', type=int, default=None,
+                        help='Number of customer clusters used as multi-cut blocks, '
+                             'by default every customer is a block.')
+    parser.add_argument('--sub-problem-backend', choices=['gurobi', 'transport'], default='gurobi',
+                        help='Solver of Benders sub-problems. default=gurobi.')
+    parser.add_argument('--candidates', type=int, default=0,
+                        help='Number of cheapest candidate facilities kept for every customer. default=0.')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='JSON file the results are written to. default=benchmark_results.json.')
+    args = parser.parse_args(argv)
+
+    instance_options = dict(costs=args.costs,
+                            capacity_tightness=args.capacity_tightness,
+                            density=args.density,
+                            n_clusters=args.clusters)
+    options = dict(backend=args.sub_problem_backend, candidates=args.candidates)
+
+    records = run_benchmark(args.sizes, args.methods, args.seeds, instance_options, options)
+    report(records)
+
+    with open(args.output, 'w') as f:
+        json.dump({'commit': _git_commit(),
+                   'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                   'instance_options': instance_options,
+                   'options': options,
+                   'results': records}, f, indent=2)
+    logging.info("Benchmark results written to %s.", args.output)
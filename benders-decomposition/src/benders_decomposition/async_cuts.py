@@ -0,0 +1,99 @@
+import logging
+import queue
+import threading
+from typing import Callable, List, Tuple, Set, Optional
+
+import numpy as np
+
+from .cut import Cut
+
+
+class AsyncCutGenerator:
+    """
+    Generates cuts in a background thread, so sub-problems are solved while the master problem explores the tree.
+
+    Facility vectors are submitted speculatively (e.g. rounded node relaxations) and their cuts are collected
+    by the callback through a thread-safe queue. The thread has to own its sub-problem, which is never
+    used by the callback. Gurobi releases the GIL while it optimizes, so the thread really runs in parallel.
+    """
+
+    def __init__(self, generate: Callable[[np.ndarray], List[Cut]], dispose: Callable[[], None], max_pending: int = 4):
+        """
+        :param generate: generates cuts for a facility vector, runs in the background thread
+        :param dispose: releases resources of generate, called from the background thread when it stops
+        :param max_pending: maximal number of vectors submitted but not collected yet
+        """
+        self.generate = generate
+        self.dispose = dispose
+        self.max_pending = max_pending
+
+        self.requests: queue.Queue = queue.Queue()
+        self.results: queue.Queue = queue.Queue()
+        self.pending: Set[bytes] = set()
+
+        self.submitted_count = 0
+        self.wait_count = 0
+
+        self.thread = threading.Thread(target=self._run, name='benders-cuts', daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                request = self.requests.get()
+                if request is None:
+                    break
+                key, is_open = request
+                try:
+                    self.results.put((key, self.generate(is_open)))
+                except Exception:
+                    logging.exception("Background cut generation failed.")
+                    self.results.put((key, None))
+        finally:
+            self.dispose()
+
+    def is_pending(self, key: bytes) -> bool:
+        return key in self.pending
+
+    def submit(self, key: bytes, is_open: np.ndarray) -> bool:
+        """
+        Submits facility vector unless it is pending already or too many vectors are pending.
+        :return: True if submitted
+        """
+        if key in self.pending or len(self.pending) >= self.max_pending:
+            return False
+        self.pending.add(key)
+        self.submitted_count += 1
+        self.requests.put((key, is_open))
+        return True
+
+    def collect(self) -> List[Tuple[bytes, Optional[List[Cut]]]]:
+        """
+        :return: all results finished so far as pairs (key, cuts), cuts are None if generation failed
+        """
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        for key, _ in finished:
+            self.pending.discard(key)
+        return finished
+
+    def wait(self, key: bytes) -> List[Tuple[bytes, Optional[List[Cut]]]]:
+        """
+        Blocks until result of a pending facility vector is finished.
+        :return: all results finished meanwhile, including the awaited one
+        """
+        self.wait_count += 1
+        finished = []
+        while key in self.pending:
+            result = self.results.get()
+            self.pending.discard(result[0])
+            finished.append(result)
+        return finished + self.collect()
+
+    def close(self) -> None:
+        self.requests.put(None)
+        self.thread.join()
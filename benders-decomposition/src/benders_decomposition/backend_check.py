@@ -0,0 +1,122 @@
+"""
+Correctness harness cross-checking sub-problem backends on random instances.
+
+Run from `benders-decomposition/src`:
+    python -m benders_decomposition.backend_check --instances 200
+"""
+import argparse
+import logging
+import sys
+from typing import List
+
+import gurobi as grb
+import numpy as np
+
+from input import InputData
+from .sub_problem import SubProblemBackend, SubProblemResult
+from .sub_problem_builder import SubProblemBuilder
+
+TOLERANCE = 1e-6
+
+
+def random_input_data(rng: np.random.Generator, n_facilities: int, n_customers: int) -> InputData:
+    demand = rng.integers(1, 100, size=n_customers)
+    # supplies range from tight to uncapacitated
+    supply = rng.integers(1, 2 * demand.sum() // max(1, n_facilities // 2) + 2, size=n_facilities)
+    cost = rng.integers(1, 50, size=(n_facilities, n_customers)).astype(float)
+    if rng.random() < 0.5:
+        # fractional costs expose rounding errors on zero-cost cycles of the residual network
+        cost += np.round(rng.random(cost.shape), 3)
+
+    return InputData(facility_names=[f'f{i}' for i in range(n_facilities)],
+                     customer_names=[f'c{j}' for j in range(n_customers)],
+                     facility_supply=supply.astype(float),
+                     facility_build_cost=np.zeros(n_facilities),
+                     facility_exists=np.zeros(n_facilities, dtype=bool),
+                     customer_demand=demand.astype(float),
+                     transport_cost=cost.astype(float))
+
+
+def check_certificate(sub_problem: SubProblemBackend,
+                      cost: np.ndarray,
+                      is_open: np.ndarray,
+                      result: SubProblemResult) -> List[str]:
+    """
+    Checks that duals prove optimality or Farkas duals prove infeasibility of the sub-problem.
+    :return: list of problems found, empty if certificate is valid
+    """
+    problems = []
+    capacity = sub_problem.supply * is_open
+    u, v = result.supply_duals, result.demand_duals
+    has_arc = np.isfinite(cost)
+    arc_cost = np.where(has_arc, cost, 0.0)
+
+    if result.status == grb.GRB.Status.OPTIMAL:
+        if np.any(u < -TOLERANCE) or np.any(v < -TOLERANCE):
+            problems.append("negative dual")
+        if np.any(has_arc & (v[None, :] - u[:, None] > arc_cost + TOLERANCE)):
+            problems.append("dual infeasible")
+        dual_obj = v @ sub_problem.demand - u @ capacity
+        if abs(dual_obj - result.obj_val) > TOLERANCE * max(1.0, abs(result.obj_val)):
+            problems.append(f"duality gap {result.obj_val - dual_obj}")
+    elif result.status == grb.GRB.Status.INFEASIBLE:
+        if np.any(u > TOLERANCE) or np.any(v > TOLERANCE):
+            problems.append("positive Farkas dual")
+        if np.any(has_arc & (v[None, :] - u[:, None] < -TOLERANCE)):
+            problems.append("Farkas ray is not a ray")
+        if u @ -capacity + v @ sub_problem.demand > -TOLERANCE:
+            problems.append("Farkas ray does not prove infeasibility")
+    return problems
+
+
+def cross_check(instances: int, seed: int) -> int:
+    """
+    Solves random sub-problems with both backends and compares status, objective and certificates.
+    :return: number of failed checks
+    """
+    rng = np.random.default_rng(seed)
+    failures = 0
+    for k in range(instances):
+        data = random_input_data(rng, int(rng.integers(1, 12)), int(rng.integers(1, 15)))
+        cost = data.cost_matrix()
+        backends = {backend: SubProblemBuilder(data, backend=backend).build() for backend in ['gurobi', 'transport']}
+
+        for _ in range(5):
+            is_open = rng.random(len(data.facility_names)) < rng.random()
+            if rng.random() < 0.3:
+                # fractional facility values as separated at MIPNODE
+                is_open = is_open * rng.random(len(data.facility_names))
+            results = {backend: sub_problem.solve_for(is_open) for backend, sub_problem in backends.items()}
+
+            problems = []
+            if results['gurobi'].status != results['transport'].status:
+                problems.append(f"status {results['gurobi'].status} != {results['transport'].status}")
+            elif results['gurobi'].status == grb.GRB.Status.OPTIMAL \
+                    and abs(results['gurobi'].obj_val - results['transport'].obj_val) \
+                    > TOLERANCE * max(1.0, abs(results['gurobi'].obj_val)):
+                problems.append(f"objective {results['gurobi'].obj_val} != {results['transport'].obj_val}")
+            for backend, result in results.items():
+                problems += [f"{backend}: {p}" for p in check_certificate(backends[backend], cost, is_open, result)]
+
+            if problems:
+                failures += 1
+                logging.error("Instance %d, facility values %s: %s", k, is_open, "; ".join(problems))
+
+        for sub_problem in backends.values():
+            sub_problem.dispose()
+
+    logging.info("Cross-checked %d instances, %d failures.", instances, failures)
+    return failures
+
+
+def main():
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Cross-checks sub-problem backends on random instances.")
+    parser.add_argument('--instances', type=int, default=100, help='Number of random instances. default=100.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed. default=0.')
+    args = parser.parse_args()
+    sys.exit(1 if cross_check(args.instances, args.seed) else 0)
+
+
+if __name__ == '__main__':
+    main()
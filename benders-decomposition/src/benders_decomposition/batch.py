@@ -0,0 +1,169 @@
+import csv
+import logging
+import multiprocessing as mp
+from timeit import default_timer as timer
+from typing import Dict, List, Any, Tuple, Optional
+
+import gurobi as grb
+import numpy as np
+
+import utils
+from benders_decomposition.cut_cache import CutCache
+from benders_decomposition.master_problem_builder import MasterProblemBuilder
+from benders_decomposition.solver import cb_benders
+from benders_decomposition.sub_problem_builder import SubProblemBuilder
+from input import InputData
+
+COLUMNS = ['name', 'status', 'objective', 'gap', 'callbacks', 'feasibility_cuts', 'optimality_cuts',
+           'nodes', 'runtime', 'time', 'open_facilities']
+
+
+def variant_vectors(data: InputData, variant: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Applies variant to vectors of the base instance.
+    :param data: base input data
+    :param variant: dictionary with optional keys 'demand' (customer name -> demand),
+                    'build_cost' (facility name -> build cost) and 'exists' (facility name -> bool)
+    :return: triple (demand, build cost, exists) of the variant
+    """
+    demand = data.demand_vector().astype(float)
+    customer_index = {name: j for j, name in enumerate(data.customer_names)}
+    for name, value in variant.get('demand', dict()).items():
+        demand[customer_index[name]] = value
+
+    facility_index = {name: i for i, name in enumerate(data.facility_names)}
+    build_cost = data.facility_build_cost.astype(float)
+    for name, value in variant.get('build_cost', dict()).items():
+        build_cost[facility_index[name]] = value
+    exists = data.facility_exists.astype(bool)
+    for name, value in variant.get('exists', dict()).items():
+        exists[facility_index[name]] = bool(value)
+
+    return demand, build_cost, exists
+
+
+class BendersSkeleton:
+    """
+    Master problem and sub-problem built once and re-used for variants of one instance.
+
+    A variant only changes facility objective coefficients and lower bounds in the master problem and
+    demand RHS values in the sub-problem. Cuts depend on the sub-problem only, so cached cuts are kept
+    between variants with equal demands.
+    """
+
+    def __init__(self,
+                 data: InputData,
+                 backend: str = 'gurobi',
+                 cut_cache_size: int = 10000,
+                 cut_cache_memory: int = 256):
+        """
+        :param data: base input data
+        :param backend: sub-problem solver, 'gurobi' LP or native 'transport' solver
+        :param cut_cache_size: maximal number of facility vectors with cached cuts, 0 disables the cache
+        :param cut_cache_memory: maximal memory of cached cuts in MB
+        """
+        self.data = data
+        self.demand = data.demand_vector()
+
+        self.master = MasterProblemBuilder(data).build()
+        self.sub_problem = SubProblemBuilder(data, backend=backend).build()
+        if cut_cache_size > 0:
+            self.master.cut_cache = CutCache(cut_cache_size, cut_cache_memory * 1024 * 1024)
+        self.master.register_callback(cb_benders(self.master, self.sub_problem, None, self.master.cut_cache))
+
+    def solve(self, variant: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Solves variant of the base instance.
+        :param variant: variant as accepted by variant_vectors, optionally named by key 'name'
+        :return: row of the results table
+        """
+        s = timer()
+        demand, build_cost, exists = variant_vectors(self.data, variant)
+        if not np.array_equal(demand, self.demand):
+            self.sub_problem.update_demand(demand)
+            self.demand = demand
+            if self.master.cut_cache is not None:
+                self.master.cut_cache.clear()
+
+        model = self.master.model
+        columns = self.master.facility_columns
+        model.setAttr(grb.GRB.Attr.Obj, columns, np.where(exists, 0.0, build_cost).tolist())
+        model.setAttr(grb.GRB.Attr.LB, columns, np.where(exists, 1.0, 0.0).tolist())
+        model.reset()
+        self.master.reset_statistics()
+
+        self.master.solve()
+
+        row: Dict[str, Any] = dict(name=variant.get('name', ''), status=utils.get_status(model.Status))
+        if model.SolCount > 0:
+            row.update(self.master.statistics())
+            values = np.array(model.getAttr(grb.GRB.Attr.X, columns))
+            row['open_facilities'] = ' '.join(np.array(self.master.facility_names)[utils.is_non_zero(values)])
+        row['time'] = timer() - s
+        return row
+
+    def dispose(self) -> None:
+        self.sub_problem.dispose()
+        self.master.model.dispose()
+
+
+# skeleton of a worker process of the batch pool
+_skeleton: Optional[BendersSkeleton] = None
+
+
+def _init_worker(data: InputData, options: Dict[str, Any]) -> None:
+    global _skeleton
+    _skeleton = BendersSkeleton(data, **options)
+
+
+def _solve_variant(variant: Dict[str, Any]) -> Dict[str, Any]:
+    return _skeleton.solve(variant)
+
+
+def solve_variants(data: InputData,
+                   variants: List[Dict[str, Any]],
+                   workers: int = 0,
+                   **options) -> List[Dict[str, Any]]:
+    """
+    Solves variants of one instance by single-cut Benders Decomposition, building models only once per process.
+    :param data: base input data
+    :param variants: variants as accepted by BendersSkeleton.solve
+    :param workers: number of worker processes, each builds its own skeleton; 0 solves variants in this process
+    :param options: remaining arguments of BendersSkeleton
+    :return: results table, one row per variant in the order of variants
+    """
+    s = timer()
+    logging.info("[START] Solving %d variants of warehouse location problem.", len(variants))
+    if workers <= 0:
+        skeleton = BendersSkeleton(data, **options)
+        try:
+            rows = [skeleton.solve(variant) for variant in variants]
+        finally:
+            skeleton.dispose()
+    else:
+        # spawn gives each worker a clean process, Gurobi environments should not be forked
+        context = mp.get_context('spawn')
+        with context.Pool(workers, initializer=_init_worker, initargs=(data, options)) as pool:
+            rows = pool.map(_solve_variant, variants, chunksize=1)
+    logging.info("[END] Solving %d variants of warehouse location problem. It took %f sec.",
+                 len(variants), timer() - s)
+    return rows
+
+
+def report_variants(rows: List[Dict[str, Any]]) -> None:
+    logging.info("** Results of variants **")
+    logging.info("%-16s %-12s %16s %12s %12s %12s %s", 'name', 'status', 'objective', 'callbacks', 'cuts', 'time',
+                 'open facilities')
+    for row in rows:
+        logging.info("%-16s %-12s %16g %12d %12d %12f %s",
+                     row['name'], row['status'], row.get('objective', float('nan')), row.get('callbacks', 0),
+                     row.get('feasibility_cuts', 0) + row.get('optimality_cuts', 0), row['time'],
+                     row.get('open_facilities', ''))
+
+
+def write_variants(rows: List[Dict[str, Any]], path: str) -> None:
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, restval='', extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    logging.info("Results of %d variants written to %s.", len(rows), path)
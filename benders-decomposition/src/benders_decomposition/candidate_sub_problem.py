@@ -0,0 +1,119 @@
+import logging
+from typing import Callable, List, Optional
+
+import gurobi as grb
+import numpy as np
+
+from input import InputData
+from utils.model_export import ModelExporter
+from .sub_problem import SubProblemBackend, SubProblemResult
+
+
+class CandidateSubProblem(SubProblemBackend):
+    """
+    Sub-problem restricted to candidate lanes, e.g. k cheapest lanes of every customer.
+
+    Restricted sub-problem alone would give invalid cuts: it can be infeasible or more expensive
+    than the full one. After each solve the pruned lanes are priced with the duals of the restricted
+    sub-problem - lanes with negative reduced cost, or which break the Farkas certificate, are added back
+    to the backend in place and the sub-problem is solved again, a Gurobi LP from its previous basis.
+    The final result is therefore valid for the full network.
+    """
+
+    def __init__(self,
+                 data: InputData,
+                 candidates: np.ndarray,
+                 build: Callable[[InputData], SubProblemBackend],
+                 tolerance: float = 1e-6,
+                 with_names: bool = False):
+        """
+        :param data: input data with full transport network
+        :param candidates: boolean mask over lanes of data used initially
+        :param build: builds backend for restricted input data
+        :param tolerance: reduced cost below -tolerance makes a pruned lane enter the sub-problem
+        :param with_names: whether restored lane columns should be named
+        """
+        self.data = data
+        self.facility_names = data.facility_names
+        self.supply = data.supply_vector()
+        self.demand = data.demand_vector()
+
+        self.active = candidates.copy()
+        self.tolerance = tolerance
+        self.with_names = with_names
+        self.restored_arc_count = 0
+        self.backend = build(data.with_arcs(self.active))
+
+    @property
+    def solve_count(self) -> int:
+        return self.backend.solve_count
+
+    @property
+    def reuse_count(self) -> int:
+        return self.backend.reuse_count
+
+    def solve_for(self, is_open: np.ndarray) -> SubProblemResult:
+        solve_time, duals_time = 0.0, 0.0
+        while True:
+            result = self.backend.solve_for(is_open)
+            solve_time += result.solve_time
+            duals_time += result.duals_time
+            entering = self._price(result)
+            if entering.size == 0:
+                return result._replace(solve_time=solve_time, duals_time=duals_time)
+
+            self.active[entering] = True
+            self.restored_arc_count += entering.size
+            logging.debug("Restoring %d pruned lanes of %s.", entering.size, type(self.backend).__name__)
+            self._restore(entering)
+
+    def _price(self, result: SubProblemResult) -> np.ndarray:
+        """
+        :return: indices of pruned lanes violating dual feasibility of the result
+        """
+        pruned = np.flatnonzero(~self.active)
+        if pruned.size == 0:
+            return pruned
+
+        facility_ids, customer_ids, costs = self.data.arcs()
+        facility_ids, customer_ids, costs = facility_ids[pruned], customer_ids[pruned], costs[pruned]
+
+        # column of x_ij has -1 in supply row i and +1 in demand row j
+        dual_activity = result.demand_duals[customer_ids] - result.supply_duals[facility_ids]
+        if result.status == grb.GRB.Status.OPTIMAL:
+            violation = costs - dual_activity
+        elif result.status == grb.GRB.Status.INFEASIBLE:
+            violation = dual_activity
+        else:
+            return pruned[:0]
+        return pruned[violation < -self.tolerance]
+
+    def update_demand(self, demand: np.ndarray) -> None:
+        self.data = self.data.variant(demand=demand)
+        self.demand = demand
+        self.backend.update_demand(demand)
+
+    def add_arcs(self,
+                 facility_ids: np.ndarray,
+                 customer_ids: np.ndarray,
+                 costs: np.ndarray,
+                 names: Optional[List[str]] = None) -> None:
+        """
+        Extends the full network by the lanes, which are active right away.
+        """
+        self.data = self.data.with_added_arcs(facility_ids, customer_ids, costs)
+        self.active = np.concatenate([self.active, np.ones(len(costs), dtype=bool)])
+        self.backend.add_arcs(facility_ids, customer_ids, costs, names)
+
+    def _restore(self, entering: np.ndarray) -> None:
+        facility_ids, customer_ids, costs = self.data.arcs()
+        facility_ids, customer_ids, costs = facility_ids[entering], customer_ids[entering], costs[entering]
+        names = [f'x_{self.data.facility_names[i]}_{self.data.customer_names[j]}'
+                 for i, j in zip(facility_ids, customer_ids)] if self.with_names else None
+        self.backend.add_arcs(facility_ids, customer_ids, costs, names)
+
+    def write(self, exporter: Optional[ModelExporter] = None) -> None:
+        self.backend.write(exporter)
+
+    def dispose(self) -> None:
+        self.backend.dispose()
@@ -0,0 +1,73 @@
+from typing import NamedTuple, Optional, Tuple, List, Dict
+
+import numpy as np
+
+FEASIBILITY = 'feasibility'
+OPTIMALITY = 'optimality'
+
+
+class Cut(NamedTuple):
+    """
+    Benders cut in facility variables y:
+        feasibility cut: coefficients^T y + constant >= 0
+        optimality cut:  coefficients^T y + constant <= z, where z is aggregated recourse variable
+                         or recourse variable of a block.
+    Duals of the sub-problem which produced the cut are kept, so the cut can be re-derived for changed data.
+    """
+    kind: str
+    coefficients: np.ndarray
+    constant: float
+    block: Optional[str] = None
+    supply_duals: Optional[np.ndarray] = None
+    demand_duals: Optional[np.ndarray] = None
+
+    def violation(self, facility_values: np.ndarray, recourse_value: float) -> float:
+        """
+        :return: amount by which the cut is violated by given solution, non-positive if satisfied
+        """
+        value = float(self.coefficients @ facility_values) + self.constant
+        if self.kind == FEASIBILITY:
+            return -value
+        return value - recourse_value
+
+
+def compute_cut_coefficients(supply_duals: np.ndarray,
+                             demand_duals: np.ndarray,
+                             supply: np.ndarray,
+                             demand: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Computes u^T (b - By) as an expression in facility variables y.
+    Supply constraints contribute -s_i * y_i, demand constraints contribute constant d_j.
+    :param supply_duals: duals (or Farkas duals) of supply constraints
+    :param demand_duals: duals (or Farkas duals) of demand constraints
+    :param supply: vector of facility supplies
+    :param demand: vector of customer demands
+    :return: pair (coefficients of facility variables, constant term)
+    """
+    coefficients = -supply_duals * supply
+    constant = float(demand_duals @ demand)
+    return coefficients, constant
+
+
+def aggregate_cuts(cuts: List[Cut], weights: Dict[str, float]) -> List[Cut]:
+    """
+    Replaces optimality cuts of blocks by their weighted sum bounding aggregated recourse variable z,
+    e.g. expected recourse over scenarios. Feasibility cuts are kept as they are.
+    The sum is a valid cut only if every block produced an optimality cut, otherwise none is returned.
+    Duals of the aggregated cut are weighted sums as well, they do not re-derive its constant.
+    :param cuts: cuts of blocks
+    :param weights: dictionary block name -> weight
+    :return: feasibility cuts and at most one aggregated optimality cut
+    """
+    feasibility_cuts = [cut for cut in cuts if cut.kind == FEASIBILITY]
+    optimality_cuts = [cut for cut in cuts if cut.kind == OPTIMALITY]
+    if len(optimality_cuts) < len(weights):
+        return feasibility_cuts
+
+    w = np.array([weights[cut.block] for cut in optimality_cuts])
+    return feasibility_cuts + [Cut(OPTIMALITY,
+                                   w @ np.array([cut.coefficients for cut in optimality_cuts]),
+                                   float(w @ np.array([cut.constant for cut in optimality_cuts])),
+                                   None,
+                                   w @ np.array([cut.supply_duals for cut in optimality_cuts]),
+                                   w @ np.array([cut.demand_duals for cut in optimality_cuts]))]
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from .cut import Cut
+
+# rough size of a cut apart from its coefficients
+CUT_OVERHEAD_BYTES = 128
+
+
+class CutCache:
+    """
+    Cuts generated for master problem facility vectors, keyed by the vector packed into a bitset.
+    Least recently used entries are evicted when number of entries or estimated memory exceeds its limit.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: 'OrderedDict[bytes, List[Cut]]' = OrderedDict()
+        self.size_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(is_open: np.ndarray) -> bytes:
+        return np.packbits(is_open).tobytes()
+
+    @staticmethod
+    def _entry_bytes(key: bytes, cuts: List[Cut]) -> int:
+        return len(key) + sum(cut.coefficients.nbytes + cut.supply_duals.nbytes + cut.demand_duals.nbytes
+                              + CUT_OVERHEAD_BYTES
+                              for cut in cuts)
+
+    def __contains__(self, key: bytes) -> bool:
+        # membership test does not count as a hit or a miss and does not refresh the entry
+        return key in self.entries
+
+    def get(self, key: bytes) -> Optional[List[Cut]]:
+        cuts = self.entries.get(key)
+        if cuts is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return cuts
+
+    def put(self, key: bytes, cuts: List[Cut]) -> None:
+        if key in self.entries:
+            self.size_bytes -= self._entry_bytes(key, self.entries.pop(key))
+        self.entries[key] = cuts
+        self.size_bytes += self._entry_bytes(key, cuts)
+
+        while self.entries and (len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes):
+            evicted_key, evicted_cuts = self.entries.popitem(last=False)
+            self.size_bytes -= self._entry_bytes(evicted_key, evicted_cuts)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size_bytes = 0
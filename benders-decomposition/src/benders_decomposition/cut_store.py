@@ -0,0 +1,154 @@
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from input import InputData
+from .cut import Cut, FEASIBILITY, OPTIMALITY, compute_cut_coefficients
+
+KINDS = [FEASIBILITY, OPTIMALITY]
+
+
+class CutStore:
+    """
+    Persists Benders cuts between runs in a compressed NPZ file.
+
+    Every cut is stored with its coefficients and the sub-problem duals which produced it.
+    When loaded for (possibly changed) input data, duals are mapped by facility and customer names
+    and supply duals are repaired so that they stay dual feasible (optimality cuts) or remain
+    a Farkas ray (feasibility cuts). The cut is then re-derived from the new supplies and demands.
+    """
+
+    def __init__(self, data: InputData, blocks: Dict[str, List[str]]):
+        """
+        :param data: input data of the current run
+        :param blocks: customers of sub-problem blocks of the current run
+        """
+        self.data = data
+        self.blocks = blocks
+        self.facility_names = data.facility_names
+        self.cuts: Dict[Tuple, Cut] = dict()
+
+    def _block_customers(self, block: Optional[str]) -> List[str]:
+        if block is None:
+            return self.data.customer_names
+        return self.blocks[block]
+
+    def record(self, cut: Cut) -> None:
+        key = (cut.kind, cut.block, cut.coefficients.tobytes(), cut.constant)
+        self.cuts.setdefault(key, cut)
+
+    def save(self, path: str) -> None:
+        cuts = list(self.cuts.values())
+        block_names = sorted({cut.block for cut in cuts if cut.block is not None})
+        block_index = {block: k for k, block in enumerate(block_names)}
+
+        customer_names = self.data.customer_names
+        customer_index = {name: j for j, name in enumerate(customer_names)}
+
+        # demand duals are stored sparse, blocks usually hold few customers
+        dual_cut, dual_customer, dual_value = [], [], []
+        for k, cut in enumerate(cuts):
+            block_customers = self._block_customers(cut.block)
+            for j in np.flatnonzero(cut.demand_duals):
+                dual_cut.append(k)
+                dual_customer.append(customer_index[block_customers[j]])
+                dual_value.append(cut.demand_duals[j])
+
+        n = len(self.facility_names)
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                facility_names=np.array(self.facility_names),
+                customer_names=np.array(customer_names),
+                block_names=np.array(block_names, dtype=str),
+                kind=np.array([KINDS.index(cut.kind) for cut in cuts], dtype=np.int8),
+                block=np.array([block_index.get(cut.block, -1) for cut in cuts], dtype=np.int32),
+                constant=np.array([cut.constant for cut in cuts]),
+                coefficients=np.array([cut.coefficients for cut in cuts]).reshape(len(cuts), n),
+                supply_duals=np.array([cut.supply_duals for cut in cuts]).reshape(len(cuts), n),
+                demand_dual_cut=np.array(dual_cut, dtype=np.int32),
+                demand_dual_customer=np.array(dual_customer, dtype=np.int32),
+                demand_dual_value=np.array(dual_value),
+            )
+        logging.info("Saved %d cuts to %s.", len(cuts), path)
+
+    def load(self, path: str) -> List[Cut]:
+        """
+        Loads cuts still valid for the current data. Loaded cuts are recorded, so they are saved again.
+        :param path: path to the file created by save
+        :return: list of valid cuts
+        """
+        if not os.path.exists(path):
+            logging.info("Cut store %s does not exist yet.", path)
+            return []
+
+        stored = np.load(path)
+        stored_facility_names = stored['facility_names'].tolist()
+        stored_customer_names = stored['customer_names'].tolist()
+        stored_block_names = stored['block_names'].tolist()
+
+        facility_index = {name: i for i, name in enumerate(stored_facility_names)}
+        facility_map = np.array([facility_index.get(name, -1) for name in self.facility_names])
+
+        n_cuts = len(stored['kind'])
+        demand_duals = [dict() for _ in range(n_cuts)]
+        for k, j, value in zip(stored['demand_dual_cut'], stored['demand_dual_customer'], stored['demand_dual_value']):
+            demand_duals[k][stored_customer_names[j]] = value
+
+        block_data: Dict[Optional[str], Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]] = dict()
+        cuts = []
+        for k in range(n_cuts):
+            kind = KINDS[stored['kind'][k]]
+            block = stored_block_names[stored['block'][k]] if stored['block'][k] >= 0 else None
+            if block is not None and block not in self.blocks:
+                continue
+
+            if block not in block_data:
+                data = self.data if block is None else self.data.restrict(self.blocks[block])
+                block_data[block] = (data.cost_matrix(), data.supply_vector(), data.demand_vector(),
+                                     data.customer_names)
+            cost, supply, demand, customer_names = block_data[block]
+
+            # facilities and customers missing in stored cut get zero duals before repair
+            supply_duals = np.where(facility_map >= 0, stored['supply_duals'][k][facility_map], 0.0)
+            cut_demand_duals = np.array([demand_duals[k].get(name, 0.0) for name in customer_names])
+
+            cut = self._revalidate(kind, block, supply_duals, cut_demand_duals, cost, supply, demand)
+            if cut is not None:
+                cuts.append(cut)
+                self.record(cut)
+
+        logging.info("Loaded %d of %d stored cuts from %s.", len(cuts), n_cuts, path)
+        return cuts
+
+    @staticmethod
+    def _revalidate(kind: str,
+                    block: Optional[str],
+                    supply_duals: np.ndarray,
+                    demand_duals: np.ndarray,
+                    cost: np.ndarray,
+                    supply: np.ndarray,
+                    demand: np.ndarray) -> Optional[Cut]:
+        """
+        Repairs duals for given data and re-derives the cut.
+        :return: cut or None if it cannot cut off any facility vector
+        """
+        has_arc = np.isfinite(cost)
+        if kind == OPTIMALITY:
+            # u_i >= max(0, max_j v_j - c_ij) restores v_j - u_i <= c_ij
+            demand_duals = np.maximum(demand_duals, 0.0)
+            with np.errstate(invalid='ignore'):
+                reduced = np.where(has_arc, demand_duals[None, :] - cost, -np.inf).max(axis=1, initial=-np.inf)
+            supply_duals = np.maximum(supply_duals, np.maximum(reduced, 0.0))
+        else:
+            # u_i <= min(0, min_j v_j) restores -u_i + v_j >= 0, ray stays non-positive
+            demand_duals = np.minimum(demand_duals, 0.0)
+            bound = np.where(has_arc, demand_duals[None, :], np.inf).min(axis=1, initial=np.inf)
+            supply_duals = np.minimum(supply_duals, np.minimum(bound, 0.0))
+
+        coefficients, constant = compute_cut_coefficients(supply_duals, demand_duals, supply, demand)
+        if kind == FEASIBILITY and constant >= 0.0:
+            return None
+        return Cut(kind, coefficients, constant, block, supply_duals, demand_duals)
@@ -0,0 +1,159 @@
+import logging
+from timeit import default_timer as timer
+from typing import List, Tuple
+
+import gurobi as grb
+import numpy as np
+
+from input import InputData
+from .cut import Cut, FEASIBILITY
+from .master_problem import MasterProblem
+
+# maximal number of cost comparisons spent on dominance between facilities
+MAX_DOMINANCE_WORK = 10 ** 8
+# relative tolerance of supply comparisons, so rounding never makes an inequality invalid
+TOLERANCE = 1e-9
+
+
+class MasterPresolve:
+    """
+    Valid inequalities and fixings of facility variables derived from supplies, demands and lanes only,
+    so capacity-infeasible facility vectors are cut off before they reach the sub-problem.
+
+    Inequalities are expressed as feasibility cuts coefficients^T y + constant >= 0:
+        capacity cover         sum_i s_i y_i >= D, where D is total demand (of the largest scenario)
+        extended covers        closing a set C of facilities with sum_C s_i > sum_i s_i - D is infeasible, so
+                               sum_{E(C)} y_i >= |E(C)| - |C| + 1 for E(C) = C + facilities at least as large
+        reachability covers    sum_{i reaches j} min(s_i / d_j, 1) y_i >= 1 for every customer j
+        dominance              y_k <= y_i if facility i is not more expensive to build or to ship from
+                               than facility k and has at least its supply
+    Facilities without which total supply or supply reachable by some customer is too small are fixed open.
+    A dominated facility is fixed closed if its dominating facility alone covers total demand.
+    """
+
+    def __init__(self, data: InputData):
+        self.cost = data.cost_matrix()
+        self.supply = np.asarray(data.facility_supply, dtype=float)
+        self.exists = np.asarray(data.facility_exists, dtype=bool)
+        self.build_cost = np.where(self.exists, 0.0, data.facility_build_cost).astype(float)
+        # every scenario has to be served, so the largest demands bound the facility vectors
+        if data.is_stochastic():
+            self.demand = data.scenario_demand.max(axis=0)
+            self.total_demand = float(data.scenario_demand.sum(axis=1).max())
+        else:
+            self.demand = np.asarray(data.demand_vector(), dtype=float)
+            self.total_demand = float(self.demand.sum())
+
+        self.cuts: List[Cut] = []
+        self.fixed_open = np.zeros(len(self.supply), dtype=bool)
+        self.fixed_closed = np.zeros(len(self.supply), dtype=bool)
+        self.counts = dict(capacity_covers=0, reachability_covers=0, dominance=0)
+
+    def _add_cut(self, coefficients: np.ndarray, constant: float, kind: str) -> None:
+        self.cuts.append(Cut(FEASIBILITY, coefficients, constant))
+        self.counts[kind] += 1
+
+    def run(self) -> 'MasterPresolve':
+        s = timer()
+        self._capacity_covers()
+        self._reachability_covers()
+        self._dominance()
+        logging.info("Master presolve: %s, fixed open: %d, fixed closed: %d in %f sec.",
+                     ", ".join(f"{kind} {count}" for kind, count in self.counts.items()),
+                     self.fixed_open.sum(), self.fixed_closed.sum(), timer() - s)
+        return self
+
+    def _capacity_covers(self) -> None:
+        if self.total_demand <= 0.0:
+            return
+        # closing facilities with total supply above slack leaves demand unserved
+        slack = self.supply.sum() - self.total_demand + TOLERANCE * self.total_demand
+        self.fixed_open |= ~self.exists & (self.supply > slack)
+        if slack < 0.0:
+            logging.warning("Total supply does not cover total demand.")
+            return
+        self._add_cut(self.supply / self.total_demand, -1.0, 'capacity_covers')
+
+        order = np.argsort(-self.supply, kind='stable')
+        sorted_supply = self.supply[order]
+        prefix = np.concatenate([[0.0], np.cumsum(sorted_supply)])
+        needed = int(np.searchsorted(prefix, self.total_demand * (1.0 - TOLERANCE)))
+        if needed > 1:
+            self._add_cut(np.ones(len(order)), -float(needed), 'capacity_covers')
+
+        seen = set()
+        for start in range(len(order)):
+            # minimal window of sorted facilities starting at start whose closing is infeasible
+            end = int(np.searchsorted(prefix, prefix[start] + slack, side='right'))
+            if end > len(order):
+                break
+            # single facility windows are fixed open already
+            if end - start == 1:
+                continue
+            extended = self.supply >= sorted_supply[start]
+            extended[order[start:end]] = True
+            rhs = extended.sum() - (end - start) + 1
+            key = extended.tobytes()
+            if key not in seen:
+                seen.add(key)
+                self._add_cut(extended.astype(float), -float(rhs), 'capacity_covers')
+
+    def _reachability_covers(self) -> None:
+        has_arc = np.isfinite(self.cost)
+        seen = set()
+        for j in np.flatnonzero(self.demand > 0.0):
+            coefficients = np.where(has_arc[:, j], np.minimum(self.supply / self.demand[j], 1.0), 0.0)
+            reachable = coefficients.sum()
+            # a facility is required if the others cannot cover the customer
+            self.fixed_open |= ~self.exists & (coefficients > 0.0) & (reachable - coefficients < 1.0 - TOLERANCE)
+            if has_arc[:, j].all() and (coefficients == 1.0).all():
+                continue
+            key = coefficients.tobytes()
+            if key not in seen:
+                seen.add(key)
+                self._add_cut(coefficients, -1.0, 'reachability_covers')
+
+    def _dominance(self) -> None:
+        n, m = self.cost.shape
+        if n * n * m > MAX_DOMINANCE_WORK:
+            logging.info("Dominance between facilities is skipped, it would take %d cost comparisons.", n * n * m)
+            return
+
+        has_arc = np.isfinite(self.cost).any(axis=1)
+        self.fixed_closed |= ~self.exists & ~has_arc
+        for k in np.flatnonzero(~self.exists & has_arc):
+            candidates = np.flatnonzero((self.build_cost <= self.build_cost[k]) & (self.supply >= self.supply[k]))
+            candidates = candidates[candidates != k]
+            if candidates.size == 0:
+                continue
+            not_worse = (self.cost[candidates] <= self.cost[k]).all(axis=1)
+            better = (self.build_cost[candidates] < self.build_cost[k]) | (self.supply[candidates] > self.supply[k]) \
+                | (self.cost[candidates] < self.cost[k]).any(axis=1)
+            # among identical facilities only the first one dominates, so they cannot force each other open
+            dominating = candidates[not_worse & (better | (candidates < k))]
+            if dominating.size == 0:
+                continue
+            if (self.supply[dominating] >= self.total_demand).any():
+                self.fixed_closed[k] = True
+                continue
+            i = dominating[np.argmax(self.supply[dominating])]
+            coefficients = np.zeros(n)
+            coefficients[i], coefficients[k] = 1.0, -1.0
+            self._add_cut(coefficients, 0.0, 'dominance')
+
+    def apply(self, master: MasterProblem) -> Tuple[int, int]:
+        """
+        Adds inequalities as constraints of the master problem and fixes bounds of facility columns.
+        :return: pair (number of added constraints, number of fixed facilities)
+        """
+        columns = master.facility_columns
+        for k, cut in enumerate(self.cuts):
+            support = np.flatnonzero(cut.coefficients)
+            master.model.addConstr(grb.LinExpr(cut.coefficients[support].tolist(), [columns[i] for i in support])
+                                   + cut.constant >= 0.0, name=f'presolve_{k}')
+
+        fixed_open = np.flatnonzero(self.fixed_open & ~self.fixed_closed)
+        fixed_closed = np.flatnonzero(self.fixed_closed & ~self.fixed_open)
+        master.model.setAttr(grb.GRB.Attr.LB, [columns[i] for i in fixed_open], [1.0] * len(fixed_open))
+        master.model.setAttr(grb.GRB.Attr.UB, [columns[i] for i in fixed_closed], [0.0] * len(fixed_closed))
+        return len(self.cuts), len(fixed_open) + len(fixed_closed)
@@ -1,34 +1,146 @@
 import logging
-from typing import Dict, Callable
+from typing import Dict, Callable, List, Optional
 
 import gurobi as grb
+import numpy as np
 
 import utils
+from utils.model_export import ModelExporter
+from .cut import Cut, FEASIBILITY
+from .cut_cache import CutCache
+from .cut_store import CutStore
+from .metrics import MetricsCollector
 
 
 class MasterProblem:
 
-    def __init__(self, model: grb.Model, name_to_column: Dict[str, grb.Var], aux_var_name: str):
+    def __init__(self,
+                 model: grb.Model,
+                 name_to_column: Dict[str, grb.Var],
+                 aux_var_name: str,
+                 block_to_column: Optional[Dict[str, grb.Var]] = None):
         self.model = model
         self.name_to_column = name_to_column
         self.facility_to_column = dict(name_to_column)
         self.facility_to_column.pop(aux_var_name)
+        # recourse variables of sub-problem blocks, empty in single-cut mode
+        self.block_to_column = block_to_column or dict()
+
+        # fixed facility order shared with the sub-problem, so callback values can be handled as vectors
+        self.facility_names: List[str] = list(self.facility_to_column.keys())
+        self.facility_columns: List[grb.Var] = list(self.facility_to_column.values())
 
         self.cb: Callable = None
         self.aux_var_name = aux_var_name
+        self.aux_column = name_to_column[aux_var_name]
         self.count = 1
 
+        # statistics collected by the Benders callback
+        self.reset_statistics()
+        self.cut_cache: Optional[CutCache] = None
+        self.cut_store: Optional[CutStore] = None
+        self.metrics: Optional[MetricsCollector] = None
+        # cuts added by the callback, recorded only if set, so snapshots of the model can include them
+        self.added_cuts: Optional[List[Cut]] = None
+
     def register_callback(self, cb: Callable):
         self.cb = cb
 
     def solve(self):
         self.model.optimize(self.cb)
 
-    def write(self):
+    def set_start(self, is_open: np.ndarray) -> None:
+        """
+        Sets start values of facility columns, Gurobi completes recourse variables of the start by the cuts.
+        """
+        self.model.setAttr(grb.GRB.Attr.Start, self.facility_columns, is_open.astype(float).tolist())
+
+    def write(self, exporter: Optional[ModelExporter] = None):
+        """
+        Writes the model together with cuts added by the callback so far, see added_cuts.
+        :param exporter: exporter of the model, by default LP file is written to the working directory
+        """
+        exporter = exporter or ModelExporter()
         self.model.update()
-        self.model.write(f'master_{self.count}.lp')
+        name = f'master_{self.count}'
+        if self.added_cuts:
+            snapshot = self._with_model(self.model.copy())
+            snapshot.model.ModelName = self.model.ModelName
+            snapshot.add_cuts(self.added_cuts, 'added_cut')
+            snapshot.model.update()
+            exporter.export(snapshot.model, name)
+            snapshot.model.dispose()
+        else:
+            exporter.export(self.model, name)
         self.count += 1
 
+    def reset_statistics(self) -> None:
+        self.callback_count = 0
+        self.feasibility_cut_count = 0
+        self.optimality_cut_count = 0
+        self.user_cut_count = 0
+        self.lp_cut_count = 0
+        self.sub_problem_time = 0.0
+
+    def relax(self) -> 'MasterProblem':
+        """
+        :return: LP relaxation of the master problem as a new master problem sharing column names
+        """
+        self.model.update()
+        return self._with_model(self.model.relax())
+
+    def _with_model(self, model: grb.Model) -> 'MasterProblem':
+        """
+        :return: master problem over a copy of the model, columns are matched by their index
+        """
+        columns = model.getVars()
+        return MasterProblem(model,
+                             {name: columns[var.index] for name, var in self.name_to_column.items()},
+                             self.aux_var_name,
+                             {name: columns[var.index] for name, var in self.block_to_column.items()})
+
+    def recourse_column(self, block: Optional[str] = None) -> grb.Var:
+        """
+        :return: recourse variable of given block, aggregated recourse variable z if block is None
+        """
+        return self.aux_column if block is None else self.block_to_column[block]
+
+    def cut_constraint(self, cut: Cut) -> grb.TempConstr:
+        expr = grb.LinExpr(cut.coefficients.tolist(), self.facility_columns)
+        expr.addConstant(cut.constant)
+        if cut.kind == FEASIBILITY:
+            return expr >= 0
+        expr.addTerms(-1.0, self.recourse_column(cut.block))
+        return expr <= 0
+
+    def add_cuts(self, cuts: List[Cut], name: str) -> None:
+        """
+        Adds cuts as regular constraints before solving.
+        """
+        for k, cut in enumerate(cuts):
+            self.model.addConstr(self.cut_constraint(cut), name=f'{name}_{k}')
+
+    def open_facilities(self) -> List[str]:
+        """
+        :return: names of facilities open in the best solution found
+        """
+        values = self.model.getAttr(grb.GRB.Attr.X, self.facility_columns)
+        return [name for name, value in zip(self.facility_names, values) if utils.is_non_zero(value)]
+
+    def statistics(self) -> Dict[str, float]:
+        return {
+            'callbacks': self.callback_count,
+            'feasibility_cuts': self.feasibility_cut_count,
+            'optimality_cuts': self.optimality_cut_count,
+            'user_cuts': self.user_cut_count,
+            'lp_cuts': self.lp_cut_count,
+            'nodes': self.model.getAttr(grb.GRB.Attr.NodeCount),
+            'runtime': self.model.getAttr(grb.GRB.Attr.Runtime),
+            'objective': self.model.getAttr(grb.GRB.Attr.ObjVal),
+            'gap': self.model.getAttr(grb.GRB.Attr.MIPGap),
+            'sub_problem_time': self.sub_problem_time,
+        }
+
     def report_results(self):
         logging.info("** Final results using Benders Decomposition **")
 
@@ -37,8 +149,12 @@ class MasterProblem:
         obj_val = self.model.getAttr(grb.GRB.Attr.ObjVal)
         logging.info("Objective value: %f.", obj_val)
         logging.info("The facilities at the following locations should be built:")
-        for var in self.model.getVars():
-            if utils.is_non_zero(var.x):
-                facility_name = var.varName
-                if facility_name:
-                    logging.info(f"   {facility_name} ... {var.x}")
\ No newline at end of file
+        for facility_name in self.open_facilities():
+            logging.info("   %s", facility_name)
+        logging.info("Recourse value %s: %f.", self.aux_var_name, self.aux_column.X)
+        logging.info("Callbacks: %d, feasibility cuts: %d, optimality cuts: %d, user cuts: %d.",
+                     self.callback_count, self.feasibility_cut_count, self.optimality_cut_count,
+                     self.user_cut_count)
+        if self.cut_cache is not None:
+            logging.info("Cut cache hits: %d, misses: %d, evictions: %d.",
+                         self.cut_cache.hits, self.cut_cache.misses, self.cut_cache.evictions)
\ No newline at end of file
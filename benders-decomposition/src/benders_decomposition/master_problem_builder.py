@@ -1,5 +1,6 @@
 import logging
-from typing import Optional, Dict, Tuple
+from timeit import default_timer as timer
+from typing import Optional, Dict, Tuple, List
 
 import gurobi as grb
 
@@ -10,19 +11,35 @@ from .master_problem import MasterProblem
 
 class MasterProblemBuilder:
 
-    def __init__(self, data: InputData):
+    def __init__(self,
+                 data: InputData,
+                 block_names: Optional[List[str]] = None,
+                 block_weights: Optional[Dict[str, float]] = None):
+        """
+        :param data: input data
+        :param block_names: names of sub-problem blocks; if given, each block gets its own
+                            recourse variable z_<block> and z >= sum_b z_<block> is added (multi-cut mode)
+        :param block_weights: weights w_b of block recourse variables in z >= sum_b w_b z_<block>,
+                              e.g. probabilities of scenarios; all weights are 1 by default
+        """
         self.data = data
+        self.block_names = block_names or []
+        self.block_weights = block_weights or dict()
         self.name_to_column = dict()
+        self.block_to_column: Dict[str, grb.Var] = dict()
         self.model = grb.Model("facility_location_master_problem")
         self.aux_var_name = 'z'
 
     def build(self) -> Optional[MasterProblem]:
         try:
+            s = timer()
             self._build_model()
+            self.model.update()
+            logging.info("Built %s in %f sec.", self.model.ModelName, timer() - s)
             self.model.Params.PreCrush = 1
             self.model.Params.lazyConstraints = 1
             # use bidict here!
-            return MasterProblem(self.model, self.name_to_column, self.aux_var_name)
+            return MasterProblem(self.model, self.name_to_column, self.aux_var_name, self.block_to_column)
         except grb.GurobiError as ex:
             logging.exception("Gurobi %r" % ex)
         except Exception as ex:
@@ -31,13 +48,14 @@ class MasterProblemBuilder:
 
     def _build_model(self) -> None:
         self._build_columns()
+        self._build_block_columns()
 
     def _build_columns(self) -> None:
 
-        facility_to_column = build_facility_columns(self.data, self.model)
+        facility_columns = build_facility_columns(self.data, self.model)
         name, var = self._build_aux_column()
 
-        self.name_to_column.update(facility_to_column)
+        self.name_to_column.update(zip(self.data.facility_names, facility_columns.tolist()))
         self.name_to_column[name] = var
 
     def _build_aux_column(self) -> Tuple[str, grb.Var]:
@@ -53,3 +71,24 @@ class MasterProblemBuilder:
             name=name
         )
         return name, var
+
+    def _build_block_columns(self) -> None:
+        """
+        Builds z_b >= 0 for each block together with linking constraint z - sum_b w_b z_b >= 0.
+        """
+        if not self.block_names:
+            return
+
+        for block_name in self.block_names:
+            self.block_to_column[block_name] = self.model.addVar(
+                lb=0.0,
+                ub=grb.GRB.INFINITY,
+                obj=0.0,
+                vtype=grb.GRB.CONTINUOUS,
+                name=f'{self.aux_var_name}_{block_name}'
+            )
+
+        z = self.name_to_column[self.aux_var_name]
+        lhs = z - grb.LinExpr([self.block_weights.get(block_name, 1.0) for block_name in self.block_to_column],
+                              list(self.block_to_column.values()))
+        self.model.addConstr(lhs >= 0.0, name='recourse_link')
@@ -0,0 +1,112 @@
+import csv
+import json
+import logging
+import os
+from collections import Counter
+from timeit import default_timer as timer
+from typing import Dict, List, Any, Optional
+
+from .cut import Cut
+from .sub_problem import SubProblemResult
+
+FIELDS = ['event', 'time', 'candidate', 'incumbent', 'bound', 'cached', 'block', 'status',
+          'solve_time', 'duals_time', 'cut_time', 'kind', 'violation', 'added']
+
+
+class MetricsCollector:
+    """
+    Collects one trace row per cut of every MIPSOL callback of the Benders loop.
+
+    The callback only calls the collector if it is set on the master problem,
+    so nothing is measured or allocated when metrics are disabled.
+    """
+
+    def __init__(self):
+        self.start = timer()
+        self.rows: List[Dict[str, Any]] = []
+        self.callback_times: List[float] = []
+
+        self._event: Dict[str, Any] = dict()
+        self._sub_problems: Dict[Optional[str], Dict[str, Any]] = dict()
+        self._event_start = 0.0
+
+    def begin_event(self, candidate: float, incumbent: float, bound: float, cached: bool) -> None:
+        """
+        Starts a MIPSOL event.
+        :param candidate: objective of the new solution
+        :param incumbent: objective of the best solution found so far
+        :param bound: best bound of the master problem
+        :param cached: whether cuts were taken from the cut cache
+        """
+        self._event_start = timer()
+        self._event = dict(event=len(self.callback_times),
+                           time=self._event_start - self.start,
+                           candidate=candidate,
+                           incumbent=incumbent,
+                           bound=bound,
+                           cached=cached)
+        self._sub_problems = dict()
+
+    def sub_problem(self, block: Optional[str], result: SubProblemResult, cut_time: float) -> None:
+        """
+        Records sub-problem solved for the current event.
+        :param block: name of the block, None for the full sub-problem
+        :param result: result of the solve
+        :param cut_time: time spent building cut from the result
+        """
+        self._sub_problems[block] = dict(status=result.status,
+                                         solve_time=result.solve_time,
+                                         duals_time=result.duals_time,
+                                         cut_time=cut_time)
+
+    def cut(self, cut: Cut, violation: float, added: bool) -> None:
+        """
+        Records cut of the current event.
+        :param cut: the cut
+        :param violation: violation of the cut by the candidate solution
+        :param added: whether the cut was added as lazy constraint
+        """
+        row = dict(self._event, block=cut.block or '', kind=cut.kind, violation=violation, added=added)
+        row.update(self._sub_problems.get(cut.block, dict()))
+        self.rows.append(row)
+
+    def end_event(self) -> None:
+        self.callback_times.append(timer() - self._event_start)
+
+    def write(self, path: str) -> None:
+        """
+        Writes the trace, as CSV if path ends with .csv, otherwise as JSON lines.
+        """
+        with open(path, 'w', newline='') as f:
+            if os.path.splitext(path)[1] == '.csv':
+                writer = csv.DictWriter(f, fieldnames=FIELDS, restval='')
+                writer.writeheader()
+                writer.writerows(self.rows)
+            else:
+                for row in self.rows:
+                    f.write(json.dumps(row))
+                    f.write('\n')
+        logging.info("Benders trace with %d rows written to %s.", len(self.rows), path)
+
+    def summary(self) -> Dict[str, float]:
+        # sub-problem times are counted once per solved block, not once per cut
+        solved = {(row['event'], row['block']): row for row in self.rows if 'solve_time' in row}
+        return {
+            'events': len(self.callback_times),
+            'callback_time': sum(self.callback_times),
+            'solve_time': sum(row['solve_time'] for row in solved.values()),
+            'duals_time': sum(row['duals_time'] for row in solved.values()),
+            'cut_time': sum(row['cut_time'] for row in solved.values()),
+            'cuts_generated': len(self.rows),
+            'cuts_added': sum(1 for row in self.rows if row['added']),
+            'cached_events': len({row['event'] for row in self.rows if row['cached']}),
+        }
+
+    def report(self) -> None:
+        logging.info("** Benders callback metrics **")
+        for name, value in self.summary().items():
+            logging.info("%-24s %16g", name, value)
+
+        kinds = Counter((row['kind'], row['added']) for row in self.rows)
+        for (kind, added), count in sorted(kinds.items()):
+            logging.info("%-24s %16d", f"{kind}{'' if added else ' (skipped)'}", count)
@@ -0,0 +1,145 @@
+import logging
+from typing import List, Optional
+
+import gurobi as grb
+import numpy as np
+
+from utils.model_export import ModelExporter
+from .sub_problem import SubProblemBackend, SubProblemResult
+
+
+class ParetoSubProblem(SubProblemBackend):
+    """
+    Strengthens optimality cuts of a sub-problem backend by Magnanti-Wong procedure.
+
+    Transportation sub-problems are highly degenerate, so duals of the backend are an arbitrary point
+    of the optimal dual face. Among duals u optimal for facility vector y, the auxiliary LP picks one
+    maximizing u^T (b - B y0) at a core point y0, which gives a Pareto-optimal cut. In primal form:
+
+        min c^T x + Q(y) eta
+        s.t. A x + (b - B y) eta >= b - B y0,  x >= 0, eta free
+
+    Only the coefficients of eta and its cost change between solves, so the auxiliary model is kept and
+    re-optimized from its previous basis. As suggested by Papadakos, the core point is moved towards
+    every feasible facility vector, y0 <- (1 - core_step) y0 + core_step y; it starts with all facilities open.
+    """
+
+    def __init__(self,
+                 backend: SubProblemBackend,
+                 model: grb.Model,
+                 supply_constraints: List[grb.Constr],
+                 demand_constraints: List[grb.Constr],
+                 eta_column: grb.Var,
+                 core_step: float = 0.5,
+                 tolerance: float = 1e-6):
+        """
+        :param backend: sub-problem backend providing status, objective value and feasibility cuts
+        :param model: auxiliary LP with transport columns, supply and demand constraints and eta column
+        :param supply_constraints: supply constraints of the auxiliary LP in facility order
+        :param demand_constraints: demand constraints of the auxiliary LP in customer order
+        :param eta_column: column eta, its demand coefficients have to be set to demands
+        :param core_step: weight of a new facility vector in the update of the core point
+        :param tolerance: relative tolerance of tightness of the strengthened cut at y
+        """
+        self.backend = backend
+        self.facility_names = backend.facility_names
+        self.supply = backend.supply
+        self.demand = backend.demand
+
+        self.model = model
+        self.supply_constraints = supply_constraints
+        self.demand_constraints = demand_constraints
+        self.eta_column = eta_column
+        self.core_step = core_step
+        self.tolerance = tolerance
+
+        self.core_point = np.ones(len(self.supply))
+        self.last_is_open: Optional[np.ndarray] = None
+        self.strengthened_count = 0
+        self.pareto_solve_count = 0
+
+    @property
+    def solve_count(self) -> int:
+        return self.backend.solve_count
+
+    @property
+    def reuse_count(self) -> int:
+        return self.backend.reuse_count
+
+    def solve_for(self, is_open: np.ndarray) -> SubProblemResult:
+        result = self.backend.solve_for(is_open)
+        if result.status != grb.GRB.Status.OPTIMAL:
+            return result
+
+        supply_duals, demand_duals = self._solve_pareto(is_open, result.obj_val)
+        self.core_point = (1.0 - self.core_step) * self.core_point + self.core_step * is_open
+        if supply_duals is None:
+            return result
+
+        # the strengthened duals have to keep the cut tight at is_open
+        cut_value = float(demand_duals @ self.demand - supply_duals @ (self.supply * is_open))
+        if abs(cut_value - result.obj_val) > self.tolerance * max(1.0, abs(result.obj_val)):
+            logging.debug("Pareto-optimal duals are not tight (%f != %f), backend duals are used.",
+                          cut_value, result.obj_val)
+            return result
+
+        self.strengthened_count += 1
+        return result._replace(supply_duals=supply_duals, demand_duals=demand_duals)
+
+    def _solve_pareto(self, is_open: np.ndarray, obj_val: float):
+        """
+        :return: pair (supply duals, demand duals) of the auxiliary LP, (None, None) if it is not optimal
+        """
+        rhs = -self.supply * is_open
+        if self.last_is_open is None:
+            changed = np.arange(len(rhs))
+        else:
+            changed = np.flatnonzero(is_open != self.last_is_open)
+        for k in changed:
+            self.model.chgCoeff(self.supply_constraints[k], self.eta_column, float(rhs[k]))
+        self.last_is_open = np.array(is_open, dtype=float)
+
+        self.eta_column.Obj = obj_val
+        self.model.setAttr(grb.GRB.Attr.RHS, self.supply_constraints, (-self.supply * self.core_point).tolist())
+        self.model.optimize()
+        self.pareto_solve_count += 1
+
+        if self.model.status != grb.GRB.Status.OPTIMAL:
+            logging.debug("Auxiliary Pareto LP finished with status %s.", self.model.status)
+            return None, None
+        supply_duals = np.array(self.model.getAttr(grb.GRB.Attr.Pi, self.supply_constraints))
+        demand_duals = np.array(self.model.getAttr(grb.GRB.Attr.Pi, self.demand_constraints))
+        return supply_duals, demand_duals
+
+    def update_demand(self, demand: np.ndarray) -> None:
+        self.backend.update_demand(demand)
+        self.demand = demand
+        # demands are both RHS and coefficients of eta in demand constraints
+        self.model.setAttr(grb.GRB.Attr.RHS, self.demand_constraints, np.asarray(demand, dtype=float).tolist())
+        for constraint, value in zip(self.demand_constraints, demand):
+            self.model.chgCoeff(constraint, self.eta_column, float(value))
+
+    def add_arcs(self,
+                 facility_ids: np.ndarray,
+                 customer_ids: np.ndarray,
+                 costs: np.ndarray,
+                 names: Optional[List[str]] = None) -> None:
+        """
+        Adds the lanes to the backend and to the auxiliary LP, whose duals have to stay feasible for all lanes.
+        """
+        self.backend.add_arcs(facility_ids, customer_ids, costs, names)
+        for k, (i, j, cost) in enumerate(zip(facility_ids, customer_ids, costs)):
+            self.model.addVar(lb=0.0,
+                              ub=grb.GRB.INFINITY,
+                              obj=float(cost),
+                              vtype=grb.GRB.CONTINUOUS,
+                              column=grb.Column([-1.0, 1.0], [self.supply_constraints[i], self.demand_constraints[j]]),
+                              name=names[k] if names is not None else '')
+        self.model.update()
+
+    def write(self, exporter: Optional[ModelExporter] = None) -> None:
+        self.backend.write(exporter)
+
+    def dispose(self) -> None:
+        self.backend.dispose()
+        self.model.dispose()
@@ -0,0 +1,110 @@
+import logging
+from timeit import default_timer as timer
+from typing import Dict, Any, List, Optional
+
+import gurobi as grb
+import numpy as np
+
+from benders_decomposition.solver import solve_using_benders_decomposition, suffixed_path
+from benders_decomposition.sub_problem_builder import SubProblemBuilder
+from input import InputData
+from utils.solution_export import extract_solution, write_solution
+
+
+def evaluate_decision(data: InputData, is_open: np.ndarray, backend: str = 'gurobi') -> float:
+    """
+    Computes build cost plus expected recourse of a facility vector over all scenarios of the instance.
+    A single sub-problem is built and its demands are updated scenario by scenario.
+    :param data: stochastic input data
+    :param is_open: vector of open facilities ordered as facility names
+    :param backend: sub-problem solver, 'gurobi' LP or native 'transport' solver
+    :return: cost of the decision, infinity if some scenario cannot be served
+    """
+    build_cost = float(np.where(data.facility_exists, 0.0, data.facility_build_cost) @ is_open)
+    sub_problem = SubProblemBuilder(data.scenario(0), "facility_location_evaluation", backend=backend).build()
+    try:
+        recourse = 0.0
+        for k, probability in enumerate(data.scenario_probability):
+            if k > 0:
+                sub_problem.update_demand(data.scenario_demand[k])
+            result = sub_problem.solve_for(is_open)
+            if result.status != grb.GRB.Status.OPTIMAL:
+                logging.info("Decision cannot serve scenario %s.", data.scenario_names[k])
+                return float('inf')
+            recourse += probability * result.obj_val
+    finally:
+        sub_problem.dispose()
+    return build_cost + recourse
+
+
+def solve_using_saa(input_data: InputData,
+                    sample_size: int,
+                    replications: int = 5,
+                    seed: int = 0,
+                    solution_path: Optional[str] = None,
+                    **options) -> Dict[str, Any]:
+    """
+    Solves stochastic instance with many scenarios by sample average approximation.
+    Every replication solves Benders Decomposition on a sample of scenarios and its decision is evaluated
+    on all scenarios. The mean of sample objectives estimates a lower bound of the optimum,
+    the best evaluated decision gives an upper bound.
+    :param input_data: stochastic input data
+    :param sample_size: number of scenarios drawn in every replication
+    :param replications: number of independent samples
+    :param seed: seed of the sampling
+    :param solution_path: if given, the solution of the best decision over all scenarios is written to this
+                          NPZ or CSV file
+    :param options: remaining keyword arguments of solve_using_benders_decomposition, a metrics file
+                    gets the replication appended to its name
+    :return: statistics of the run with bounds and open facilities of the best decision
+    """
+    if not input_data.is_stochastic():
+        raise ValueError("Sample average approximation requires input data with demand scenarios.")
+
+    s = timer()
+    logging.info("[START] Solving warehouse location problem by sample average approximation "
+                 "(%d replications of %d scenarios).", replications, sample_size)
+    rng = np.random.default_rng(seed)
+    facility_names = np.array(input_data.facility_names)
+
+    sample_objectives: List[float] = []
+    best_cost, best_open_facilities = float('inf'), []
+    for replication in range(replications):
+        sample = input_data.sample_scenarios(sample_size, rng)
+        logging.info("SAA replication %d: %d distinct scenarios drawn.", replication, len(sample.scenario_names))
+        replication_options = dict(options,
+                                   metrics_path=suffixed_path(options.get('metrics_path'),
+                                                              f'replication_{replication}'))
+        statistics = solve_using_benders_decomposition(sample, **replication_options)
+        sample_objectives.append(statistics['objective'])
+
+        is_open = np.isin(facility_names, statistics['open_facilities'])
+        cost = evaluate_decision(input_data, is_open, options.get('backend', 'gurobi'))
+        logging.info("SAA replication %d: sample objective %f, evaluated cost %f.",
+                     replication, statistics['objective'], cost)
+        if cost < best_cost:
+            best_cost, best_open_facilities = cost, statistics['open_facilities']
+
+    lower_bound = float(np.mean(sample_objectives))
+    std_error = float(np.std(sample_objectives, ddof=1) / np.sqrt(replications)) if replications > 1 else 0.0
+    statistics = {
+        'lower_bound': lower_bound,
+        'lower_bound_std_error': std_error,
+        'upper_bound': best_cost,
+        'gap': (best_cost - lower_bound) / max(1.0, abs(best_cost)),
+        'open_facilities': best_open_facilities,
+        'time': timer() - s,
+    }
+
+    logging.info("** Final results using sample average approximation **")
+    logging.info("Lower bound estimate: %f (standard error %f).", lower_bound, std_error)
+    logging.info("Upper bound (best evaluated decision): %f.", best_cost)
+    logging.info("The facilities at the following locations should be built:")
+    for name in best_open_facilities:
+        logging.info("   %s", name)
+    if solution_path is not None and np.isfinite(best_cost):
+        is_open = np.isin(facility_names, best_open_facilities)
+        write_solution(extract_solution(input_data, is_open), solution_path)
+    logging.info("[END] Solving warehouse location problem by sample average approximation. It took %f sec.",
+                 statistics['time'])
+    return statistics
@@ -1,121 +1,653 @@
 import logging
-from typing import Dict, Union
+import os
+from typing import Dict, Optional, Union, List, NamedTuple, Tuple, Any
 from timeit import default_timer as timer
 
 import gurobi as grb
+import numpy as np
 
 import utils
+from benders_decomposition.async_cuts import AsyncCutGenerator
+from benders_decomposition.candidate_sub_problem import CandidateSubProblem
+from benders_decomposition.cut import Cut, FEASIBILITY, OPTIMALITY, compute_cut_coefficients, aggregate_cuts
+from benders_decomposition.cut_cache import CutCache
+from benders_decomposition.cut_store import CutStore
 from benders_decomposition.master_problem import MasterProblem
+from benders_decomposition.master_presolve import MasterPresolve
 from benders_decomposition.master_problem_builder import MasterProblemBuilder
-from benders_decomposition.sub_problem import SubProblem
+from benders_decomposition.metrics import MetricsCollector
+from benders_decomposition.pareto_sub_problem import ParetoSubProblem
+from benders_decomposition.sub_problem import SubProblemBackend, SubProblemResult
 from benders_decomposition.sub_problem_builder import SubProblemBuilder
+from benders_decomposition.sub_problem_pool import LocalSubProblemPool, SubProblemPool, customer_blocks, \
+    scenario_blocks
 from input import InputData
+from utils.incumbent_exchange import IncumbentExchange
+from utils.model_export import ModelExporter
+from utils.solution_export import extract_solution, write_solution
+from utils.start_heuristic import StartHeuristic
 
+CUT_MODES = ['single', 'multi']
 
-def solve_using_benders_decomposition(input_data: InputData):
+
+class LpPhase(NamedTuple):
+    """
+    Limits of the in-out cutting-plane loop on the LP relaxation of the master problem run before branching.
+    """
+    max_rounds: int = 100
+    alpha: float = 0.5  # weight of the stability center in the separation point
+    min_violation: float = 1e-4  # relative to the magnitude of cut terms
+    min_improvement: float = 1e-4  # relative bound improvement over tail_rounds below which the loop stops
+    tail_rounds: int = 5
+
+
+class NodeCuts(NamedTuple):
+    """
+    Limits of Benders cut separation at fractional nodes (MIPNODE).
+    Gurobi does not expose node depth in callbacks, so separation is limited by the node count instead;
+    max_nodes=0 separates at the root node only.
+    """
+    max_nodes: int = 0
+    max_rounds: int = 10
+    min_violation: float = 1e-4  # relative to the magnitude of cut terms
+
+
+def solve_using_benders_decomposition(input_data: InputData,
+                                      cuts: str = 'single',
+                                      workers: int = 0,
+                                      backend: str = 'gurobi',
+                                      cut_cache_size: int = 10000,
+                                      cut_cache_memory: int = 256,
+                                      cut_store_path: Optional[str] = None,
+                                      candidates: int = 0,
+                                      metrics_path: Optional[str] = None,
+                                      node_cuts: Optional[NodeCuts] = None,
+                                      pareto_cuts: bool = False,
+                                      lp_phase: Optional[LpPhase] = None,
+                                      background: bool = False,
+                                      exporter: Optional[ModelExporter] = None,
+                                      snapshot_interval: int = 0,
+                                      heuristic_start: bool = False,
+                                      presolve: bool = False,
+                                      incumbent_exchange: Optional[IncumbentExchange] = None,
+                                      solution_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Solves the problem using Benders Decomposition.
+    Stochastic input data are decomposed by scenario, every scenario is a sub-problem block.
+    :param input_data: input data
+    :param cuts: 'single' - one aggregated recourse variable and one sub-problem,
+                 'multi' - one recourse variable and one sub-problem per customer cluster;
+                 for stochastic input data 'single' bounds expected recourse by cuts aggregated over scenarios,
+                 'multi' gives every scenario its own recourse variable
+    :param workers: number of worker processes solving sub-problem blocks (or scenarios) in parallel,
+                    0 solves them in the callback
+    :param backend: sub-problem solver, 'gurobi' LP or native 'transport' solver
+    :param cut_cache_size: maximal number of facility vectors with cached cuts, 0 disables the cache
+    :param cut_cache_memory: maximal memory of cached cuts in MB
+    :param cut_store_path: file with cuts of previous runs, valid ones pre-seed the master problem
+                           and all cuts of this run are saved to it
+    :param candidates: if positive, sub-problems start with this many cheapest lanes of every customer,
+                       pruned lanes are added back when they price in, so cuts stay valid
+    :param metrics_path: if given, trace of every MIPSOL callback is written to this CSV or JSONL file
+    :param node_cuts: if given, cuts are also separated at fractional nodes within these limits and added as user cuts
+    :param pareto_cuts: strengthen optimality cuts to Pareto-optimal ones (Magnanti-Wong)
+    :param lp_phase: if given, LP relaxation of the master problem is first solved by a stabilized cutting-plane loop
+                     within these limits and its cuts are added to the master problem before branching
+    :param background: solve sub-problems also in a background thread, prefetching rounded node relaxations
+    :param exporter: if given, the master problem is exported by it before branching
+    :param snapshot_interval: if positive, every snapshot_interval-th integer solution the master problem
+                              with cuts added so far and the full sub-problem are exported by exporter
+    :param heuristic_start: start from facilities opened by greedy add, drop and swap heuristic,
+                            cuts of the start vector are added to the master problem before branching
+    :param presolve: add capacity, reachability and dominance inequalities to the master problem and fix
+                     facilities which are always required or dominated before solving
+    :param incumbent_exchange: if given, incumbents are shared with other processes solving the same instance
+    :param solution_path: if given, sub-problems are re-solved for the open facilities and open facilities,
+                          nonzero flows, duals and costs are written to this NPZ or CSV file
+    :return: statistics of the run including names of open facilities
+    """
     s = timer()
-    logging.info("[START] Solving warehouse location problem using Benders Decomposition.")
+    logging.info("[START] Solving warehouse location problem using Benders Decomposition (%s-cut).", cuts)
 
-    master_problem = MasterProblemBuilder(input_data).build()
-    sub_problem = SubProblemBuilder(input_data).build()
+    block_weights = None
+    if input_data.is_stochastic():
+        logging.info("Recourse is decomposed into %d demand scenarios.", len(input_data.scenario_names))
+        blocks = dict()
+        block_data = scenario_blocks(input_data)
+        block_weights = dict(zip(input_data.scenario_names, input_data.scenario_probability.tolist()))
+        recourse_blocks = list(block_data.keys()) if cuts == 'multi' else []
+    else:
+        blocks = input_data.customer_clusters() if cuts == 'multi' else dict()
+        block_data = customer_blocks(input_data, blocks)
+        recourse_blocks = list(blocks.keys())
+    if workers > 0 and not block_data:
+        logging.warning("Worker processes are used only for sub-problem blocks in multi-cut mode or for scenarios.")
 
-    mapping = create_sub_problem_constraint_to_master_column_or_value_map(master_problem, sub_problem, input_data)
+    master_problem = MasterProblemBuilder(input_data, recourse_blocks, block_weights).build()
+    if presolve:
+        MasterPresolve(input_data).run().apply(master_problem)
 
-    master_problem.register_callback(cb_benders(master_problem, sub_problem, mapping, input_data))
-    master_problem.solve()
+    sub_problem_options = dict(backend=backend, candidates=candidates, pareto=pareto_cuts)
+
+    block_pool = None
+    if block_data:
+        block_pool = SubProblemPool(block_data, workers, **sub_problem_options) if workers > 0 \
+            else LocalSubProblemPool(block_data, **sub_problem_options)
+        if not recourse_blocks:
+            block_pool.aggregation = block_weights
+
+    # Customer blocks relax supply constraints, so the full sub-problem is still needed unless those never bind.
+    # Scenarios are exact sub-problems.
+    sub_problem = None
+    if not block_data or not (input_data.is_stochastic() or input_data.is_uncapacitated()):
+        # the full sub-problem is exported with snapshots, which are meant to be read
+        sub_problem = SubProblemBuilder(input_data, with_names=exporter is not None, **sub_problem_options).build()
+
+    cut_cache = None
+    if cut_cache_size > 0:
+        cut_cache = CutCache(cut_cache_size, cut_cache_memory * 1024 * 1024)
+        master_problem.cut_cache = cut_cache
+
+    if metrics_path is not None:
+        master_problem.metrics = MetricsCollector()
+
+    async_cuts = None
+    if background and block_pool is not None:
+        logging.warning("Background sub-problem solving is used only in single-cut mode of deterministic instances.")
+    elif background:
+        if cut_cache is None:
+            cut_cache = CutCache(10000, cut_cache_memory * 1024 * 1024)
+            master_problem.cut_cache = cut_cache
+        async_cuts = start_async_cuts(input_data, sub_problem_options)
+
+    if snapshot_interval > 0 and exporter is None:
+        logging.warning("Snapshots are written only if an exporter is given.")
+        snapshot_interval = 0
+    elif snapshot_interval > 0:
+        master_problem.added_cuts = []
+
+    if cut_store_path is not None and input_data.is_stochastic():
+        logging.warning("Cut store is not used for instances with demand scenarios.")
+    elif cut_store_path is not None:
+        master_problem.cut_store = CutStore(input_data, blocks)
+        master_problem.add_cuts(master_problem.cut_store.load(cut_store_path), 'stored_cut')
+
+    build_time = timer() - s
+    try:
+        if lp_phase is not None:
+            lp_cuts = solve_lp_phase(master_problem, sub_problem, block_pool, lp_phase)
+            master_problem.add_cuts(lp_cuts, 'lp_cut')
+            master_problem.lp_cut_count = len(lp_cuts)
+            if master_problem.cut_store is not None:
+                for cut in lp_cuts:
+                    master_problem.cut_store.record(cut)
+        if heuristic_start:
+            start_cuts = seed_start(master_problem, StartHeuristic(input_data).run(), sub_problem, block_pool)
+            if master_problem.cut_store is not None:
+                for cut in start_cuts:
+                    master_problem.cut_store.record(cut)
+        if exporter is not None:
+            master_problem.write(exporter)
+        master_problem.register_callback(cb_benders(master_problem, sub_problem, block_pool, cut_cache, node_cuts,
+                                                    async_cuts, exporter, snapshot_interval))
+        if incumbent_exchange is not None:
+            master_problem.register_callback(incumbent_exchange.callback(master_problem.facility_columns,
+                                                                         master_problem.cb))
+        master_problem.solve()
+    finally:
+        if block_pool is not None:
+            block_pool.close()
+        if async_cuts is not None:
+            async_cuts.close()
+            logging.info("Background sub-problem solves: %d, waits for pending results: %d.",
+                         async_cuts.submitted_count, async_cuts.wait_count)
     master_problem.report_results()
+    if solution_path is not None:
+        is_open = utils.is_non_zero(np.array(master_problem.model.getAttr(grb.GRB.Attr.X,
+                                                                          master_problem.facility_columns)))
+        write_solution(extract_solution(input_data, is_open), solution_path)
+    if master_problem.cut_store is not None:
+        master_problem.cut_store.save(cut_store_path)
+    if master_problem.metrics is not None:
+        master_problem.metrics.report()
+        master_problem.metrics.write(metrics_path)
+    if sub_problem is not None:
+        report_sub_problems("Sub-problem", [sub_problem])
+    if isinstance(block_pool, LocalSubProblemPool):
+        report_sub_problems("Sub-problem block", list(block_pool.sub_problems.values()))
 
+    statistics = master_problem.statistics()
+    statistics['open_facilities'] = master_problem.open_facilities()
+    statistics['build_time'] = build_time
+    statistics['time'] = timer() - s
     logging.info("[END] Solving warehouse location problem using Benders Decomposition."
-                 "It took %f sec.", timer() - s)
+                 "It took %f sec.", statistics['time'])
+    return statistics
+
+
+def report_sub_problems(label: str, sub_problems: List[Optional[SubProblemBackend]]) -> None:
+    """
+    Logs solve counts of sub-problems together with counts of their Pareto-optimal cuts and restored lanes.
+    """
+    sub_problems = [sub_problem for sub_problem in sub_problems if sub_problem is not None]
+    logging.info("%s solves: %d, reused results: %d.", label,
+                 sum(sub_problem.solve_count for sub_problem in sub_problems),
+                 sum(sub_problem.reuse_count for sub_problem in sub_problems))
+    pareto = [sub_problem for sub_problem in sub_problems if isinstance(sub_problem, ParetoSubProblem)]
+    if pareto:
+        logging.info("Pareto-optimal cuts: %d of %d auxiliary solves.",
+                     sum(sub_problem.strengthened_count for sub_problem in pareto),
+                     sum(sub_problem.pareto_solve_count for sub_problem in pareto))
+    backends = [sub_problem.backend if isinstance(sub_problem, ParetoSubProblem) else sub_problem
+                for sub_problem in sub_problems]
+    candidates = [backend for backend in backends if isinstance(backend, CandidateSubProblem)]
+    if candidates:
+        logging.info("Pruned lanes restored: %d.", sum(backend.restored_arc_count for backend in candidates))
 
 
-def create_sub_problem_constraint_to_master_column_or_value_map(master: MasterProblem,
-                                                                sub_problem: SubProblem,
-                                                                data: InputData)\
-        -> Dict[grb.Constr, Union[grb.Var, float]]:
+def seed_start(master: MasterProblem,
+               is_open: np.ndarray,
+               sub_problem: Optional[SubProblemBackend],
+               block_pool: Optional[Union[LocalSubProblemPool, SubProblemPool]]) -> List[Cut]:
+    """
+    Adds cuts of a start facility vector to the master problem and sets the vector as MIP start.
+    The optimality cut bounds recourse from the first node and the start gives a cutoff.
+    An infeasible start vector only contributes its feasibility cuts.
+    :return: cuts of the start vector
     """
-    Creates a mapping between sub-problem constraint and components of (b - By).
+    cuts = generate_cuts(is_open, sub_problem, block_pool)
+    master.add_cuts(cuts, 'start_cut')
+    if master.cut_cache is not None:
+        master.cut_cache.put(CutCache.key(is_open), cuts)
+
+    if any(cut.kind == FEASIBILITY for cut in cuts):
+        logging.warning("Start vector is infeasible, it is not used as MIP start.")
+    else:
+        master.set_start(is_open)
+    logging.info("Start vector with %d open facilities seeded %d cuts.", is_open.sum(), len(cuts))
+    return cuts
+
+
+def solve_lp_phase(master: MasterProblem,
+                   sub_problem: Optional[SubProblemBackend],
+                   block_pool: Optional[Union[LocalSubProblemPool, SubProblemPool]],
+                   lp_phase: LpPhase) -> List[Cut]:
+    """
+    Solves LP relaxation of the master problem by a cutting-plane loop with in-out stabilization
+    (Ben-Ameur and Neto; Fischetti, Ljubic and Sinnl). Cuts are separated at a convex combination
+    of a stability center and the LP solution. If none of them cuts off the LP solution,
+    the separation point becomes the new center and the LP solution itself is separated.
     :param master: instance of MasterProblem
-    :param sub_problem: instance of Subproblem
-    :param data: input data
-    :return: dictionary with mapping
+    :param sub_problem: sub-problem backend bounding aggregated recourse variable z, can be None in multi-cut mode
+    :param block_pool: pool solving sub-problem blocks, can be None in single-cut mode
+    :param lp_phase: limits of the loop
+    :return: cuts violated by some LP solution of the loop
     """
-    mapping = dict()
-    for facility_name, row in sub_problem.facility_to_supply_constraint.items():
-        mapping[row] = -data.supply(facility_name) * master.name_to_column[facility_name]
+    relaxed = master.relax()
+    relaxed.model.Params.OutputFlag = 0
+
+    # all facilities open is feasible whenever the problem is, so it is a safe first center
+    center = np.ones(len(master.facility_names))
+    cuts: List[Cut] = []
+    bounds: List[float] = []
+
+    for _ in range(lp_phase.max_rounds):
+        relaxed.model.optimize()
+        if relaxed.model.status != grb.GRB.Status.OPTIMAL:
+            logging.warning("LP relaxation of the master problem finished with status %s.",
+                            utils.get_status(relaxed.model.status))
+            break
+        bounds.append(relaxed.model.ObjVal)
+        if len(bounds) > lp_phase.tail_rounds and \
+                bounds[-1] - bounds[-1 - lp_phase.tail_rounds] <= lp_phase.min_improvement * max(1.0, abs(bounds[-1])):
+            break
+
+        facility_values = np.clip(np.array(relaxed.model.getAttr(grb.GRB.Attr.X, relaxed.facility_columns)), 0.0, 1.0)
+        separation_point = lp_phase.alpha * center + (1.0 - lp_phase.alpha) * facility_values
+        violated = _violated_lp_cuts(relaxed, generate_cuts(separation_point, sub_problem, block_pool),
+                                     facility_values, lp_phase.min_violation)
+        if not violated:
+            center = separation_point
+            violated = _violated_lp_cuts(relaxed, generate_cuts(facility_values, sub_problem, block_pool),
+                                         facility_values, lp_phase.min_violation)
+            if not violated:
+                break
+
+        relaxed.add_cuts(violated, f'lp_cut_{len(cuts)}')
+        cuts += violated
 
-    for customer_name, row in sub_problem.customer_to_demand_constraint.items():
-        mapping[row] = row.getAttr(grb.GRB.Attr.RHS)
+    logging.info("LP phase: %d rounds, %d cuts, bound %f.", len(bounds), len(cuts), bounds[-1] if bounds else 0.0)
+    relaxed.model.dispose()
+    return cuts
 
-    return mapping
+
+def _violated_lp_cuts(relaxed: MasterProblem,
+                      cuts: List[Cut],
+                      facility_values: np.ndarray,
+                      min_violation: float) -> List[Cut]:
+    violated = []
+    for cut in cuts:
+        recourse_val = relaxed.recourse_column(cut.block).X if cut.kind == OPTIMALITY else 0.0
+        scale = max(1.0, abs(cut.constant), abs(recourse_val))
+        if cut.violation(facility_values, recourse_val) >= min_violation * scale:
+            violated.append(cut)
+    return violated
+
+
+def start_async_cuts(input_data: InputData, sub_problem_options: Dict) -> AsyncCutGenerator:
+    """
+    Starts background cut generation with its own Gurobi environment and sub-problem.
+    """
+    env = grb.Env()
+    sub_problem = SubProblemBuilder(input_data, "facility_location_background_sub_problem", env,
+                                    **sub_problem_options).build()
+
+    def dispose():
+        sub_problem.dispose()
+        env.dispose()
+
+    return AsyncCutGenerator(lambda is_open: generate_cuts(is_open, sub_problem, None), dispose)
+
+
+def suffixed_path(path: Optional[str], suffix: str) -> Optional[str]:
+    """
+    :return: path with suffix appended to the file name, e.g. cut mode, None if path is None
+    """
+    if path is None:
+        return None
+    base, extension = os.path.splitext(path)
+    return f'{base}_{suffix}{extension}'
+
+
+def compare_cut_modes(input_data: InputData,
+                      workers: int = 0,
+                      backend: str = 'gurobi',
+                      cut_cache_size: int = 10000,
+                      cut_cache_memory: int = 256,
+                      cut_store_path: Optional[str] = None,
+                      candidates: int = 0,
+                      metrics_path: Optional[str] = None,
+                      node_cuts: Optional[NodeCuts] = None,
+                      pareto_cuts: bool = False,
+                      lp_phase: Optional[LpPhase] = None,
+                      background: bool = False,
+                      exporter: Optional[ModelExporter] = None,
+                      snapshot_interval: int = 0,
+                      heuristic_start: bool = False,
+                      presolve: bool = False) -> Dict[str, Dict[str, float]]:
+    """
+    Solves the same input in single-cut and multi-cut mode and reports both side by side.
+    Arguments have the meaning of those of solve_using_benders_decomposition. Every mode uses its own
+    cut store and metrics file, the mode is appended to their names, so one run does not start from cuts
+    of the other or overwrite its trace.
+    :return: dictionary cut mode -> statistics
+    """
+    results = {cuts: solve_using_benders_decomposition(input_data,
+                                                       cuts=cuts,
+                                                       workers=workers,
+                                                       backend=backend,
+                                                       cut_cache_size=cut_cache_size,
+                                                       cut_cache_memory=cut_cache_memory,
+                                                       cut_store_path=suffixed_path(cut_store_path, cuts),
+                                                       candidates=candidates,
+                                                       metrics_path=suffixed_path(metrics_path, cuts),
+                                                       node_cuts=node_cuts,
+                                                       pareto_cuts=pareto_cuts,
+                                                       lp_phase=lp_phase,
+                                                       background=background,
+                                                       exporter=exporter,
+                                                       snapshot_interval=snapshot_interval,
+                                                       heuristic_start=heuristic_start,
+                                                       presolve=presolve)
+               for cuts in CUT_MODES}
+
+    logging.info("** Comparison of Benders cut modes **")
+    columns = ['objective', 'callbacks', 'feasibility_cuts', 'optimality_cuts', 'nodes', 'time']
+    logging.info("%-8s" + " %16s" * len(columns), 'mode', *columns)
+    for cuts, statistics in results.items():
+        logging.info("%-8s" + " %16g" * len(columns), cuts, *[statistics[c] for c in columns])
+    return results
+
+
+def make_cut(result: SubProblemResult,
+             supply: np.ndarray,
+             demand: np.ndarray,
+             block: Optional[str] = None) -> Optional[Cut]:
+    """
+    Derives feasibility or optimality cut from sub-problem result.
+    :param result: result of the sub-problem solved for the incumbent
+    :param supply: supply vector of the sub-problem
+    :param demand: demand vector of the sub-problem
+    :param block: name of the block bounded by the cut, None for aggregated recourse variable
+    :return: cut or None if sub-problem was neither optimal nor infeasible
+    """
+    logging.debug('Subproblem status: %s', result.status)
+
+    if result.status == grb.GRB.Status.INFEASIBLE:
+        coefficients, constant = compute_cut_coefficients(result.supply_duals, result.demand_duals, supply, demand)
+        return Cut(FEASIBILITY, coefficients, constant, block, result.supply_duals, result.demand_duals)
+
+    if result.status == grb.GRB.Status.OPTIMAL:
+        coefficients, constant = compute_cut_coefficients(result.supply_duals, result.demand_duals, supply, demand)
+        return Cut(OPTIMALITY, coefficients, constant, block, result.supply_duals, result.demand_duals)
+
+    return None
+
+
+def generate_cuts(is_open: np.ndarray,
+                  sub_problem: Optional[SubProblemBackend],
+                  block_pool: Optional[Union[LocalSubProblemPool, SubProblemPool]],
+                  metrics: Optional[MetricsCollector] = None) -> List[Cut]:
+    """
+    Solves the full sub-problem and all sub-problem blocks for given facility vector.
+    :param is_open: facility vector, boolean or fractional
+    :param sub_problem: sub-problem backend bounding aggregated recourse variable z, can be None in multi-cut mode
+    :param block_pool: pool solving sub-problem blocks, can be None in single-cut mode
+    :param metrics: collector of the current callback event, None if not measured
+    :return: cuts of all sub-problems which finished optimal or infeasible
+    """
+    cuts = []
+
+    # blocks in worker processes are solved while the full sub-problem is solved here
+    if block_pool is not None:
+        block_pool.submit(is_open)
+
+    if sub_problem is not None:
+        result = sub_problem.solve_for(is_open)
+        cuts.append(_make_metered_cut(result, sub_problem.supply, sub_problem.demand, None, metrics))
+
+    if block_pool is not None:
+        block_cuts = []
+        for block_name, result in block_pool.collect().items():
+            supply, demand = block_pool.block_vectors[block_name]
+            block_cuts.append(_make_metered_cut(result, supply, demand, block_name, metrics))
+        block_cuts = [cut for cut in block_cuts if cut is not None]
+        cuts += aggregate_cuts(block_cuts, block_pool.aggregation) if block_pool.aggregation is not None \
+            else block_cuts
+
+    return [cut for cut in cuts if cut is not None]
+
+
+def _make_metered_cut(result: SubProblemResult,
+                      supply: np.ndarray,
+                      demand: np.ndarray,
+                      block: Optional[str],
+                      metrics: Optional[MetricsCollector]) -> Optional[Cut]:
+    if metrics is None:
+        return make_cut(result, supply, demand, block)
+    s = timer()
+    cut = make_cut(result, supply, demand, block)
+    metrics.sub_problem(block, result, timer() - s)
+    return cut
+
+
+def add_benders_cut(model: grb.Model,
+                    master: MasterProblem,
+                    cut: Cut,
+                    facility_values: np.ndarray) -> None:
+    """
+    Adds cut as lazy constraint if it is violated by the incumbent.
+    :param model: master problem model passed to the callback
+    :param master: instance of MasterProblem
+    :param cut: cut to add
+    :param facility_values: values of facility variables in the incumbent
+    """
+    recourse_val = model.cbGetSolution(master.recourse_column(cut.block)) if cut.kind == OPTIMALITY else 0.0
+    violation = cut.violation(facility_values, recourse_val)
+    is_violated = utils.is_positive(violation)
+    if master.metrics is not None:
+        master.metrics.cut(cut, violation, is_violated)
+    if not is_violated:
+        return
+
+    constraint = master.cut_constraint(cut)
+    logging.debug("Adding %s cut: %s", cut.kind, constraint)
+    model.cbLazy(constraint)
+    if master.cut_store is not None:
+        master.cut_store.record(cut)
+    if master.added_cuts is not None:
+        master.added_cuts.append(cut)
+    if cut.kind == FEASIBILITY:
+        master.feasibility_cut_count += 1
+    else:
+        master.optimality_cut_count += 1
+
+
+def add_node_cut(model: grb.Model,
+                 master: MasterProblem,
+                 cut: Cut,
+                 facility_values: np.ndarray,
+                 min_violation: float) -> None:
+    """
+    Adds cut as user cut if it is violated by the node relaxation by more than min_violation.
+    :param model: master problem model passed to the callback
+    :param master: instance of MasterProblem
+    :param cut: cut to add
+    :param facility_values: fractional values of facility variables in the node relaxation
+    :param min_violation: minimal violation relative to the magnitude of cut terms
+    """
+    recourse_val = model.cbGetNodeRel(master.recourse_column(cut.block)) if cut.kind == OPTIMALITY else 0.0
+    violation = cut.violation(facility_values, recourse_val)
+    scale = max(1.0, abs(cut.constant), abs(recourse_val))
+    if violation < min_violation * scale:
+        return
+
+    model.cbCut(master.cut_constraint(cut))
+    if master.cut_store is not None:
+        master.cut_store.record(cut)
+    if master.added_cuts is not None:
+        master.added_cuts.append(cut)
+    master.user_cut_count += 1
 
 
 def cb_benders(master: MasterProblem,
-               sub_problem: SubProblem,
-               mapping: Dict[grb.Constr, Union[grb.Var, float]],
-               data: InputData):
+               sub_problem: Optional[SubProblemBackend],
+               block_pool: Optional[Union[LocalSubProblemPool, SubProblemPool]] = None,
+               cut_cache: Optional[CutCache] = None,
+               node_cuts: Optional[NodeCuts] = None,
+               async_cuts: Optional[AsyncCutGenerator] = None,
+               exporter: Optional[ModelExporter] = None,
+               snapshot_interval: int = 0):
     """
     Benders Decomposition callback
     :param master: instance of MasterProblem
-    :param sub_problem: instance of SubProblem
-    :param mapping: mapping between sub-problem constraint and and components of (b - By) vector.
-    :param data: input data
+    :param sub_problem: sub-problem backend bounding aggregated recourse variable z, can be None in multi-cut mode
+    :param block_pool: pool solving sub-problem blocks which bound their own recourse variables (multi-cut mode)
+    :param cut_cache: cache of cuts generated for facility vectors
+    :param node_cuts: limits of cut separation at fractional nodes, None separates at integer solutions only
+    :param async_cuts: background cut generator; rounded node relaxations are prefetched with it and its cuts
+                       are collected at MIPSOL. A candidate whose cuts are neither cached nor pending is still
+                       checked synchronously, so no candidate is accepted without its cuts. Requires cut_cache.
+    :param exporter: exporter of snapshots
+    :param snapshot_interval: if positive, every snapshot_interval-th MIPSOL callback writes the master problem
+                              with cuts added so far (requires master.added_cuts) and the full sub-problem
     :return: inner callback function.
     """
-    def callback_inner(model, where):
-
-        if where == grb.GRB.Callback.MIPSOL:
+    for facility_names in [sub_problem and sub_problem.facility_names, block_pool and block_pool.facility_names]:
+        assert not facility_names or master.facility_names == facility_names, \
+            "Master problem and sub-problem have to share facility order."
 
-            # Update sub-problem's RHS based on incumbent solution
-            facility_cols = list(master.facility_to_column.values())
-            mp_facility_values = model.cbGetSolution(facility_cols)
-            facility_names = master.facility_to_column.keys()
+    assert async_cuts is None or cut_cache is not None, "Background cut generation requires the cut cache."
 
-            sub_problem_rhs = {facility_name: -data.supply(facility_name) if utils.is_non_zero(val) else 0.0
-                               for facility_name, val in zip(facility_names, mp_facility_values)}
+    facility_columns = master.facility_columns
+    # separation rounds done at every node
+    node_rounds: Dict[int, int] = dict()
 
-            sub_problem.set_supply_constraint_rhs(sub_problem_rhs)
+    def receive(finished: List[Tuple[bytes, Optional[List[Cut]]]]) -> Dict[bytes, List[Cut]]:
+        ready = {key: cuts for key, cuts in finished if cuts is not None}
+        for key, cuts in ready.items():
+            cut_cache.put(key, cuts)
+        return ready
 
-            # Solve sub-problem
-            sub_problem.solve()
+    def prefetch(model) -> None:
+        if model.cbGet(grb.GRB.Callback.MIPNODE_STATUS) != grb.GRB.Status.OPTIMAL:
+            return
+        is_open = np.array(model.cbGetNodeRel(facility_columns)) > 0.5
+        key = CutCache.key(is_open)
+        if key not in cut_cache:
+            async_cuts.submit(key, is_open)
 
-            logging.debug(f'Subproblem status: {sub_problem.model.getAttr(grb.GRB.Attr.Status)}')
+    def separate_node_cuts(model) -> None:
+        if model.cbGet(grb.GRB.Callback.MIPNODE_STATUS) != grb.GRB.Status.OPTIMAL:
+            return
+        node = int(model.cbGet(grb.GRB.Callback.MIPNODE_NODCNT))
+        if node > node_cuts.max_nodes or node_rounds.get(node, 0) >= node_cuts.max_rounds:
+            return
+        node_rounds[node] = node_rounds.get(node, 0) + 1
 
-            # Add cuts (lazy constraints) based on sub-problem status
-            if sub_problem.status() == grb.GRB.Status.INFEASIBLE:
+        facility_values = np.clip(np.array(model.cbGetNodeRel(facility_columns)), 0.0, 1.0)
+        s = timer()
+        cuts = generate_cuts(facility_values, sub_problem, block_pool)
+        master.sub_problem_time += timer() - s
+        for cut in cuts:
+            add_node_cut(model, master, cut, facility_values, node_cuts.min_violation)
 
-                # Add feasibility cut
-                cut = []
-                for facility_name, row in sub_problem.facility_to_supply_constraint.items():
-                    dual_farkas = row.getAttr(grb.GRB.Attr.FarkasDual)
-                    logging.debug(f'{facility_name}: {dual_farkas}')
-                    cut.append(dual_farkas * mapping[row])
+    def callback_inner(model, where):
 
-                for customer_name, row in sub_problem.customer_to_demand_constraint.items():
-                    dual_farkas = row.getAttr(grb.GRB.Attr.FarkasDual)
-                    logging.debug(f'{customer_name}: {dual_farkas}')
-                    cut.append(dual_farkas * mapping[row])
+        if where == grb.GRB.Callback.MIPSOL:
+            master.callback_count += 1
 
-                logging.debug("Adding feasibility cut: ", grb.quicksum(cut) >= 0)
-                model.cbLazy(grb.quicksum(cut) >= 0)
+            mp_facility_values = np.array(model.cbGetSolution(facility_columns))
+            is_open = utils.is_non_zero(mp_facility_values)
 
-            elif sub_problem.status() == grb.GRB.Status.OPTIMAL:
-                sub_problem_obj_val = sub_problem.model.getAttr(grb.GRB.Attr.ObjVal)
-                z = master.name_to_column[master.aux_var_name]
-                z_val = model.cbGetSolution(z)
-                if utils.is_non_zero(sub_problem_obj_val - z_val):
+            key = CutCache.key(is_open) if cut_cache is not None else None
+            # cuts of other vectors finished in the background are valid as well
+            ready = receive(async_cuts.collect()) if async_cuts is not None else dict()
+            cuts = cut_cache.get(key) if cut_cache is not None else None
+            if cuts is None and async_cuts is not None and async_cuts.is_pending(key):
+                s = timer()
+                ready.update(receive(async_cuts.wait(key)))
+                master.sub_problem_time += timer() - s
+                cuts = ready.get(key)
+            if master.metrics is not None:
+                master.metrics.begin_event(model.cbGet(grb.GRB.Callback.MIPSOL_OBJ),
+                                           model.cbGet(grb.GRB.Callback.MIPSOL_OBJBST),
+                                           model.cbGet(grb.GRB.Callback.MIPSOL_OBJBND),
+                                           cuts is not None)
+            if cuts is None:
+                s = timer()
+                cuts = generate_cuts(is_open, sub_problem, block_pool, master.metrics)
+                master.sub_problem_time += timer() - s
+                if cut_cache is not None:
+                    cut_cache.put(key, cuts)
 
-                    # Add optimality cut
-                    cut = []
-                    for _, row in sub_problem.facility_to_supply_constraint.items():
-                        dual_supply = row.getAttr(grb.GRB.Attr.Pi)
-                        cut.append(dual_supply * mapping[row])
-                    for _, row in sub_problem.customer_to_demand_constraint.items():
-                        dual_demand = row.getAttr(grb.GRB.Attr.Pi)
-                        cut.append(dual_demand * mapping[row])
+            for cut in cuts:
+                add_benders_cut(model, master, cut, mp_facility_values)
+            for other_key, other_cuts in ready.items():
+                if other_key != key:
+                    for cut in other_cuts:
+                        add_benders_cut(model, master, cut, mp_facility_values)
+            if snapshot_interval > 0 and master.callback_count % snapshot_interval == 0:
+                master.write(exporter)
+                if sub_problem is not None:
+                    sub_problem.write(exporter)
+            if master.metrics is not None:
+                master.metrics.end_event()
 
-                    cut.append(-z)
-                    model.cbLazy(grb.quicksum(cut) <= 0)
-                    logging.debug("Adding optimality cut: ", grb.quicksum(cut) <= 0)
+        elif where == grb.GRB.Callback.MIPNODE:
+            if node_cuts is not None:
+                separate_node_cuts(model)
+            if async_cuts is not None:
+                prefetch(model)
 
-    return callback_inner
+    return callback_inner
\ No newline at end of file
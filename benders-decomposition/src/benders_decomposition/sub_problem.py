@@ -1,33 +1,217 @@
-from typing import Dict, Tuple
+from abc import ABC, abstractmethod
+from timeit import default_timer as timer
+from typing import Tuple, NamedTuple, List, Optional
 
 import gurobi as grb
+import numpy as np
 
+from utils.model_export import ModelExporter
 
-class SubProblem(object):
+
+class SubProblemResult(NamedTuple):
+    """
+    Everything needed to build a Benders cut: status, objective value
+    and duals (Pi if optimal, FarkasDual if infeasible) of supply and demand constraints.
+    Times spent solving and fetching duals are zero if the result was reused without solving.
+    """
+    status: int
+    obj_val: float
+    supply_duals: np.ndarray
+    demand_duals: np.ndarray
+    solve_time: float = 0.0
+    duals_time: float = 0.0
+
+
+class SubProblemBackend(ABC):
+    """
+    Interface of a sub-problem solver used by the Benders callback.
+    Supply and demand duals have the same meaning and sign as Gurobi's Pi and FarkasDual
+    of constraints -sum_j x_ij >= -s_i y_i and sum_i x_ij >= d_j.
+    """
+
+    facility_names: List[str]
+    supply: np.ndarray
+    demand: np.ndarray
+
+    # number of solves performed and number of results reused without solving
+    solve_count: int = 0
+    reuse_count: int = 0
+
+    @abstractmethod
+    def solve_for(self, is_open: np.ndarray) -> SubProblemResult:
+        """
+        Solves sub-problem for a given facility vector.
+        :param is_open: vector of open facilities ordered as facility_names, either boolean
+                        or with values in [0, 1] when separating cuts at fractional nodes
+        :return: result of the solve
+        """
+
+    @abstractmethod
+    def update_demand(self, demand: np.ndarray) -> None:
+        """
+        Changes customer demands in place, so the sub-problem can be reused for a variant of the instance.
+        :param demand: vector of customer demands ordered as demand
+        """
+
+    @abstractmethod
+    def add_arcs(self,
+                 facility_ids: np.ndarray,
+                 customer_ids: np.ndarray,
+                 costs: np.ndarray,
+                 names: Optional[List[str]] = None) -> None:
+        """
+        Adds lanes to the sub-problem in place, so the next solve starts from the current state.
+        :param facility_ids: facility indices of the lanes
+        :param customer_ids: customer indices of the lanes
+        :param costs: unit transport costs of the lanes
+        :param names: names of the lanes, if columns are named
+        """
+
+    def write(self, exporter: Optional[ModelExporter] = None) -> None:
+        """
+        Writes model of the sub-problem as set up by the last solve, backends without Gurobi model write nothing.
+        :param exporter: exporter of the model, by default LP file is written to the working directory
+        """
+
+    def dispose(self) -> None:
+        pass
+
+
+class SubProblem(SubProblemBackend):
+    """
+    Sub-problem solved as Gurobi LP.
+
+    Only RHS of supply constraints changes between solves, so the model is re-optimized with dual simplex
+    from the previous basis. RHS values are tracked to touch only constraints which changed and to reuse
+    the last result for a repeated facility vector. The last optimal basis is restored after an infeasible solve.
+    """
 
     def __init__(self,
                  model: grb.Model,
-                 facility_customer_pair_to_column: Dict[Tuple[str, str], grb.Var],
-                 facility_to_supply_constraint: Dict[str, grb.Constr],
-                 customer_to_demand_constraint: Dict[str, grb.Constr]):
+                 transport_columns: grb.MVar,
+                 facility_names: List[str],
+                 supply_constraints: List[grb.Constr],
+                 demand_constraints: List[grb.Constr],
+                 supply: np.ndarray,
+                 demand: np.ndarray):
         self.model = model
-        self.facility_customer_pair_to_column = facility_customer_pair_to_column
-        self.facility_to_supply_constraint = facility_to_supply_constraint
-        self.customer_to_demand_constraint = customer_to_demand_constraint
+        self.transport_columns = transport_columns
+
+        # constraints in a fixed order, aligned with supply and demand vectors
+        self.facility_names = facility_names
+        self.supply_constraints = supply_constraints
+        self.demand_constraints = demand_constraints
+        self.supply = supply
+        self.demand = demand
 
         self.count = 1
 
-    def set_supply_constraint_rhs(self, rhs_map):
-        for location, val in rhs_map.items():
-            self.facility_to_supply_constraint[location].setAttr(grb.GRB.Attr.RHS, val)
+        self.last_rhs: Optional[np.ndarray] = None
+        self.last_result: Optional[SubProblemResult] = None
+        self.basis: Optional[Tuple[List[int], List[int]]] = None
+        self.restore_basis = False
+
+    def set_supply_constraint_rhs(self, rhs: np.ndarray):
+        """
+        Sets RHS of supply constraints which differ from the previously set values.
+        :param rhs: vector of RHS values ordered as supply_constraints
+        """
+        if self.last_rhs is None:
+            self.model.setAttr(grb.GRB.Attr.RHS, self.supply_constraints, rhs.tolist())
+        else:
+            changed = np.flatnonzero(rhs != self.last_rhs)
+            self.model.setAttr(grb.GRB.Attr.RHS,
+                               [self.supply_constraints[k] for k in changed],
+                               rhs[changed].tolist())
+        self.last_rhs = rhs
+        self.last_result = None
 
     def solve(self):
+        if self.restore_basis and self.basis is not None:
+            vbasis, cbasis = self.basis
+            self.model.setAttr(grb.GRB.Attr.VBasis, self.model.getVars(), vbasis)
+            self.model.setAttr(grb.GRB.Attr.CBasis, self.model.getConstrs(), cbasis)
+
         self.model.optimize()
+        self.solve_count += 1
+
+        # infeasible solve leaves a basis which is a poor start for the next RHS
+        self.restore_basis = self.model.status != grb.GRB.Status.OPTIMAL
+        if not self.restore_basis:
+            self.basis = (self.model.getAttr(grb.GRB.Attr.VBasis, self.model.getVars()),
+                          self.model.getAttr(grb.GRB.Attr.CBasis, self.model.getConstrs()))
 
     def status(self):
         return self.model.status
 
-    def write(self):
+    def obj_val(self) -> float:
+        return self.model.getAttr(grb.GRB.Attr.ObjVal)
+
+    def duals(self, attr: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fetches dual values of supply and demand constraints in bulk.
+        :param attr: either Pi or FarkasDual
+        :return: pair of vectors (supply duals, demand duals)
+        """
+        supply_duals = np.array(self.model.getAttr(attr, self.supply_constraints))
+        demand_duals = np.array(self.model.getAttr(attr, self.demand_constraints))
+        return supply_duals, demand_duals
+
+    def result(self) -> SubProblemResult:
+        status = self.status()
+        if status == grb.GRB.Status.OPTIMAL:
+            return SubProblemResult(status, self.obj_val(), *self.duals(grb.GRB.Attr.Pi))
+        if status == grb.GRB.Status.INFEASIBLE:
+            return SubProblemResult(status, grb.GRB.INFINITY, *self.duals(grb.GRB.Attr.FarkasDual))
+        return SubProblemResult(status, grb.GRB.INFINITY, np.empty(0), np.empty(0))
+
+    def solve_for(self, is_open: np.ndarray) -> SubProblemResult:
+        rhs = -self.supply * is_open
+        if self.last_result is not None and np.array_equal(rhs, self.last_rhs):
+            self.reuse_count += 1
+            return self.last_result._replace(solve_time=0.0, duals_time=0.0)
+
+        s = timer()
+        self.set_supply_constraint_rhs(rhs)
+        self.solve()
+        m = timer()
+        result = self.result()
+        self.last_result = result._replace(solve_time=m - s, duals_time=timer() - m)
+        return self.last_result
+
+    def update_demand(self, demand: np.ndarray) -> None:
+        self.model.setAttr(grb.GRB.Attr.RHS, self.demand_constraints, np.asarray(demand, dtype=float).tolist())
+        self.demand = demand
+        self.last_result = None
+
+    def add_arcs(self,
+                 facility_ids: np.ndarray,
+                 customer_ids: np.ndarray,
+                 costs: np.ndarray,
+                 names: Optional[List[str]] = None) -> None:
+        """
+        Adds a column per lane with -1 in its supply row and +1 in its demand row, the columns are appended
+        to transport_columns. New columns enter nonbasic at zero, so the basis stays valid for the next solve.
+        """
+        columns = [self.model.addVar(lb=0.0,
+                                     ub=grb.GRB.INFINITY,
+                                     obj=float(cost),
+                                     vtype=grb.GRB.CONTINUOUS,
+                                     column=grb.Column([-1.0, 1.0], [self.supply_constraints[i],
+                                                                     self.demand_constraints[j]]),
+                                     name=names[k] if names is not None else '')
+                   for k, (i, j, cost) in enumerate(zip(facility_ids, customer_ids, costs))]
+        self.model.update()
+        self.transport_columns = grb.MVar.fromlist(self.transport_columns.tolist() + columns)
+        if self.basis is not None:
+            vbasis, cbasis = self.basis
+            self.basis = (vbasis + [grb.GRB.NONBASIC_LOWER] * len(columns), cbasis)
+        self.last_result = None
+
+    def dispose(self) -> None:
+        self.model.dispose()
+
+    def write(self, exporter: Optional[ModelExporter] = None) -> None:
         self.model.update()
-        self.model.write(f'subproblem_{self.count}.lp')
+        (exporter or ModelExporter()).export(self.model, f'subproblem_{self.count}')
         self.count += 1
\ No newline at end of file
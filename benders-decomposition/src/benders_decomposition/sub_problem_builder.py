@@ -1,8 +1,13 @@
 import logging
+from timeit import default_timer as timer
+from typing import Optional
 
 import gurobi as grb
 
-from .sub_problem import SubProblem
+from .candidate_sub_problem import CandidateSubProblem
+from .pareto_sub_problem import ParetoSubProblem
+from .sub_problem import SubProblem, SubProblemBackend
+from .transport_sub_problem import TransportSubProblem
 
 from input import InputData
 from utils.model_build_utils import build_transport_columns, build_supply_constraints, build_demand_constraints
@@ -10,29 +15,107 @@ from utils.model_build_utils import build_transport_columns, build_supply_constr
 
 class SubProblemBuilder(object):
 
-    def __init__(self, data: InputData):
+    def __init__(self,
+                 data: InputData,
+                 name: str = "facility_location_sub_problem",
+                 env: Optional[grb.Env] = None,
+                 backend: str = 'gurobi',
+                 with_names: bool = False,
+                 candidates: int = 0,
+                 pareto: bool = False):
+        """
+        :param data: input data
+        :param name: name of the model
+        :param env: Gurobi environment, default one is used if not given
+        :param backend: 'gurobi' builds LP model, 'transport' builds native transportation solver
+        :param with_names: whether columns and constraints of LP model should be named
+        :param candidates: if positive, only this many cheapest lanes of every customer are built initially,
+                           pruned lanes are added back when duals of the restricted sub-problem price them in
+        :param pareto: strengthen optimality cuts to Pareto-optimal ones with an auxiliary Magnanti-Wong LP
+        """
         self.data = data
+        self.name = name
+        self.env = env
+        self.backend = backend
+        self.with_names = with_names
+        self.candidates = candidates
+        self.pareto = pareto
 
-    def build(self):
+    def build(self) -> Optional[SubProblemBackend]:
+        backend = None
+        if self.candidates > 0:
+            candidates = self.data.nearest_arcs(self.candidates)
+            if not candidates.all():
+                logging.debug("Sub-problem %s starts with %d of %d lanes.",
+                              self.name, candidates.sum(), candidates.size)
+                backend = CandidateSubProblem(self.data, candidates, self._build_restricted,
+                                              with_names=self.with_names)
+        if backend is None:
+            backend = self._build_backend()
+        if self.pareto and backend is not None:
+            backend = self._build_pareto(backend)
+        return backend
 
+    def _build_pareto(self, backend: SubProblemBackend) -> Optional[SubProblemBackend]:
+        """
+        Builds auxiliary Magnanti-Wong LP over all lanes, which are needed for the duals to be feasible.
+        """
         try:
-            model = grb.Model("facility_location_sub_problem")
+            model = grb.Model(f"{self.name}_pareto", env=self.env)
 
-            facility_customer_pair_to_column \
-                = build_transport_columns(self.data, model)
+            transport_columns = build_transport_columns(self.data, model, self.with_names)
+            supply_constraints = build_supply_constraints(self.data, model, transport_columns, None, self.with_names)
+            demand_constraints = build_demand_constraints(self.data, model, transport_columns, self.with_names)
+            eta_column = model.addVar(lb=-grb.GRB.INFINITY,
+                                      ub=grb.GRB.INFINITY,
+                                      obj=0.0,
+                                      vtype=grb.GRB.CONTINUOUS,
+                                      column=grb.Column(self.data.demand_vector().tolist(),
+                                                        demand_constraints.tolist()),
+                                      name='eta')
+            model.update()
+            return ParetoSubProblem(backend,
+                                    model,
+                                    supply_constraints.tolist(),
+                                    demand_constraints.tolist(),
+                                    eta_column)
+
+        except grb.GurobiError as ex:
+            logging.exception("Gurobi %r" % ex)
+        except Exception as ex:
+            logging.exception(ex)
+        return None
+
+    def _build_restricted(self, data: InputData) -> Optional[SubProblemBackend]:
+        return SubProblemBuilder(data, self.name, self.env, self.backend, self.with_names).build()
 
-            facility_to_supply_constraint \
-                = build_supply_constraints(self.data, model, facility_customer_pair_to_column, dict())
+    def _build_backend(self) -> Optional[SubProblemBackend]:
+        if self.backend == 'transport':
+            return TransportSubProblem(self.data.facility_names,
+                                       self.data.arcs(),
+                                       self.data.supply_vector(),
+                                       self.data.demand_vector())
+
+        try:
+            s = timer()
+            model = grb.Model(self.name, env=self.env)
 
-            customer_to_demand_constraint \
-                = build_demand_constraints(self.data, model, facility_customer_pair_to_column)
+            transport_columns = build_transport_columns(self.data, model, self.with_names)
+            supply_constraints = build_supply_constraints(self.data, model, transport_columns, None, self.with_names)
+            demand_constraints = build_demand_constraints(self.data, model, transport_columns, self.with_names)
 
             model.setParam(grb.GRB.Param.InfUnbdInfo, 1)
+            # only RHS changes between solves, for which dual simplex re-optimizes from the previous basis
+            model.setParam(grb.GRB.Param.Method, 1)
             model.update()
+            logging.debug("Built %s in %f sec.", self.name, timer() - s)
             return SubProblem(model,
-                              facility_customer_pair_to_column,
-                              facility_to_supply_constraint,
-                              customer_to_demand_constraint)
+                              transport_columns,
+                              list(self.data.facility_names),
+                              supply_constraints.tolist(),
+                              demand_constraints.tolist(),
+                              self.data.supply_vector(),
+                              self.data.demand_vector())
 
         except grb.GurobiError as ex:
             logging.exception("Gurobi %r" % ex)
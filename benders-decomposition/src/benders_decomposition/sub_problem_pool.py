@@ -0,0 +1,156 @@
+import logging
+import multiprocessing as mp
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional, Tuple
+
+import gurobi as grb
+import numpy as np
+
+from input import InputData
+from .sub_problem import SubProblemBackend, SubProblemResult
+from .sub_problem_builder import SubProblemBuilder
+
+
+def _worker(connection: Connection, block_data: Dict[str, InputData], options: Dict[str, Any]):
+    """
+    Worker process loop. Builds its own Gurobi environment and sub-problems of its blocks once,
+    then solves them for every facility vector received until None is received.
+    """
+    env = grb.Env()
+    sub_problems = {
+        block_name: SubProblemBuilder(data, f"facility_location_sub_problem_{block_name}", env, **options).build()
+        for block_name, data in block_data.items()
+    }
+    try:
+        while True:
+            is_open = connection.recv()
+            if is_open is None:
+                break
+            connection.send({block_name: sub_problem.solve_for(is_open)
+                             for block_name, sub_problem in sub_problems.items()})
+    finally:
+        for sub_problem in sub_problems.values():
+            sub_problem.dispose()
+        env.dispose()
+        connection.close()
+
+
+def customer_blocks(data: InputData, blocks: Dict[str, List[str]]) -> Dict[str, InputData]:
+    """
+    :param data: input data
+    :param blocks: dictionary block name -> names of its customers
+    :return: dictionary block name -> data restricted to customers of the block
+    """
+    return {block_name: data.restrict(customer_names) for block_name, customer_names in blocks.items()}
+
+
+def scenario_blocks(data: InputData) -> Dict[str, InputData]:
+    """
+    :param data: stochastic input data
+    :return: dictionary scenario name -> deterministic data of the scenario
+    """
+    return {name: data.scenario(k) for k, name in enumerate(data.scenario_names)}
+
+
+def _block_vectors(block_data: Dict[str, InputData]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    return {block_name: (data.supply_vector(), data.demand_vector()) for block_name, data in block_data.items()}
+
+
+class LocalSubProblemPool:
+    """
+    Solves sub-problem blocks one after another in the calling process.
+    """
+
+    def __init__(self, block_data: Dict[str, InputData], **options):
+        """
+        :param block_data: dictionary block name -> input data of its sub-problem,
+                           see customer_blocks and scenario_blocks
+        :param options: remaining arguments of SubProblemBuilder, e.g. backend
+        """
+        self.block_vectors = _block_vectors(block_data)
+        self.sub_problems: Dict[str, SubProblemBackend] = {
+            block_name: SubProblemBuilder(data, f"facility_location_sub_problem_{block_name}", **options).build()
+            for block_name, data in block_data.items()
+        }
+        self.facility_names = next(iter(block_data.values())).facility_names
+        self.results: Dict[str, SubProblemResult] = dict()
+        # weights of blocks whose optimality cuts are aggregated into one cut bounding z, None keeps cut per block
+        self.aggregation: Optional[Dict[str, float]] = None
+
+    def submit(self, is_open: np.ndarray) -> None:
+        self.results = {block_name: sub_problem.solve_for(is_open)
+                        for block_name, sub_problem in self.sub_problems.items()}
+
+    def collect(self) -> Dict[str, SubProblemResult]:
+        return self.results
+
+    def close(self) -> None:
+        for sub_problem in self.sub_problems.values():
+            sub_problem.dispose()
+
+
+class SubProblemPool:
+    """
+    Pool of worker processes solving independent sub-problem blocks in parallel.
+    Blocks are partitioned among workers once, each worker keeps its models across callbacks.
+    Only facility vectors are sent to workers and only SubProblemResult's are sent back.
+    """
+
+    def __init__(self,
+                 block_data: Dict[str, InputData],
+                 workers: int,
+                 **options):
+        """
+        :param block_data: dictionary block name -> input data of its sub-problem,
+                           see customer_blocks and scenario_blocks
+        :param workers: number of worker processes
+        :param options: remaining arguments of SubProblemBuilder, e.g. backend
+        """
+        self.block_vectors = _block_vectors(block_data)
+        self.facility_names = next(iter(block_data.values())).facility_names
+        # weights of blocks whose optimality cuts are aggregated into one cut bounding z, None keeps cut per block
+        self.aggregation: Optional[Dict[str, float]] = None
+
+        workers = max(1, min(workers, len(block_data)))
+        partitions: List[Dict[str, InputData]] = [dict() for _ in range(workers)]
+        for i, (block_name, data) in enumerate(block_data.items()):
+            partitions[i % workers][block_name] = data
+
+        # spawn gives each worker a clean process, Gurobi environments should not be forked
+        context = mp.get_context('spawn')
+        self.connections: List[Connection] = []
+        self.processes = []
+        for partition in partitions:
+            parent_connection, child_connection = context.Pipe()
+            process = context.Process(target=_worker, args=(child_connection, partition, options), daemon=True)
+            process.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+        logging.info("Started %d sub-problem worker processes.", workers)
+
+    def submit(self, is_open: np.ndarray) -> None:
+        """
+        Sends facility vector to all workers without waiting for results.
+        """
+        for connection in self.connections:
+            connection.send(is_open)
+
+    def collect(self) -> Dict[str, SubProblemResult]:
+        """
+        Waits for results of the last submitted facility vector.
+        :return: dictionary block name -> result
+        """
+        results = dict()
+        for connection in self.connections:
+            results.update(connection.recv())
+        return results
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.send(None)
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
@@ -0,0 +1,370 @@
+from timeit import default_timer as timer
+from typing import List, Optional, Tuple
+
+import gurobi as grb
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import dijkstra
+
+from .sub_problem import SubProblemBackend, SubProblemResult
+
+# relative tolerance of flows, excesses, deficits and reduced costs
+EPS = 1e-9
+
+
+class TransportSubProblem(SubProblemBackend):
+    """
+    Sub-problem solved natively as a transportation problem, without Gurobi.
+
+    Successive shortest paths on the residual network of existing lanes: facilities hold their unused capacity as
+    excess, customers their unmet demand as deficit, and a dummy customer takes the spare capacity at zero cost,
+    so the problem is balanced. Node potentials keep reduced costs of all residual arcs nonnegative, so shortest
+    paths from all nodes with excess are found at once by Dijkstra. A search stops at twice the distance of the
+    deficit nodes found by the previous one, potentials change only within the distance of the farthest deficit
+    node found, and every deficit node within it is augmented along the shortest path tree before the next search.
+
+    Flow and potentials are kept between solves. A new facility vector only removes flow above the capacity of
+    a facility and changes excesses, which keeps the potentials valid, so a solve re-routes only the demand
+    affected by the change. Optimal duals follow from the potentials, the infeasibility certificate from
+    customers which cannot be reached from any node with excess.
+
+    Flow and costs are stored per lane. The residual network is a CSR graph of every arc which can become residual,
+    built once per set of lanes; a search only rewrites its weights, giving infinite weight to arcs without residual
+    capacity.
+    """
+
+    def __init__(self,
+                 facility_names: List[str],
+                 arcs: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                 supply: np.ndarray,
+                 demand: np.ndarray):
+        """
+        :param facility_names: names of facilities in the order of supply
+        :param arcs: triple (facility ids, customer ids, costs) of existing lanes
+        :param supply: vector of facility supplies
+        :param demand: vector of customer demands
+        """
+        self.facility_names = facility_names
+        self.supply = supply
+        self.demand = demand
+        self.n_facilities, self.n_customers = len(supply), len(demand)
+        # nodes of the residual network: facilities, customers, dummy customer and source of the searches
+        self.dummy = self.n_facilities + self.n_customers
+        self.source = self.dummy + 1
+
+        self._set_arcs(*arcs)
+        self.last_capacity: Optional[np.ndarray] = None
+        self.last_result: Optional[SubProblemResult] = None
+
+    def _set_arcs(self, facility_ids: np.ndarray, customer_ids: np.ndarray, costs: np.ndarray) -> None:
+        n = self.n_facilities
+        order = np.lexsort((customer_ids, facility_ids))
+        self.facility_ids = np.asarray(facility_ids, dtype=np.int64)[order]
+        self.customer_ids = np.asarray(customer_ids, dtype=np.int64)[order]
+        self.cost = np.asarray(costs, dtype=float)[order]
+        self.lane_key = self.facility_ids * self.n_customers + self.customer_ids
+        self.facility_start = np.searchsorted(self.facility_ids, np.arange(n))
+        self.has_lanes = np.bincount(self.facility_ids, minlength=n) > 0
+        self.tolerance = EPS * max(1.0, float(np.max(self.supply, initial=0.0)),
+                                   float(np.max(self.demand, initial=0.0)))
+        self.cost_tolerance = EPS * max(1.0, float(np.abs(self.cost).max(initial=0.0)))
+
+        # lanes i -> j, reversed lanes j -> i, i -> dummy, reversed dummy -> i and source -> nodes with excess,
+        # ordered by their tails once, so that every solve only rewrites weights of the CSR graph
+        facilities, sources = np.arange(n), np.arange(self.source)
+        customers = n + self.customer_ids
+        tails = np.concatenate([self.facility_ids, customers, facilities, np.full(n, self.dummy),
+                                np.full(self.source, self.source)])
+        heads = np.concatenate([customers, self.facility_ids, np.full(n, self.dummy), facilities, sources])
+        order = np.argsort(tails, kind='stable')
+        self.arc_tail, self.arc_head = tails[order], heads[order]
+        self.arc_cost = np.concatenate([self.cost, -self.cost, np.zeros(2 * n + self.source)])[order]
+        # positions of arcs whose residual capacity is the flow of a lane or the slack of a facility,
+        # arcs from the source come last
+        position = np.argsort(order)
+        lanes = len(self.cost)
+        self.reversed_lane_arcs = position[lanes:2 * lanes]
+        self.slack_arcs = position[2 * lanes + n:2 * lanes + 2 * n]
+        self.first_source_arc = tails.size - self.source
+        self.graph = sp.csr_matrix((np.zeros(tails.size), self.arc_head,
+                                    np.r_[0, np.cumsum(np.bincount(tails, minlength=self.source + 1))]),
+                                   shape=(self.source + 1, self.source + 1))
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Starts the next solve from zero flow and zero potentials.
+        """
+        self.flow = np.zeros(len(self.cost))
+        self.slack = np.zeros(self.n_facilities)
+        self.excess = np.zeros(self.source)
+        self.deficit = np.zeros(self.source)
+        self.potential = np.zeros(self.source + 1)
+        self.last_result = None
+
+    def solve_for(self, is_open: np.ndarray) -> SubProblemResult:
+        capacity = self.supply * is_open
+        if self.last_result is not None and np.array_equal(capacity, self.last_capacity):
+            self.reuse_count += 1
+            return self.last_result._replace(solve_time=0.0, duals_time=0.0)
+
+        s = timer()
+        self.solve_count += 1
+        self._set_capacity(capacity)
+        result = self._augment()
+        self.last_capacity = capacity
+        # duals are by-products of the flow computation, so all time counts as solve time
+        self.last_result = result._replace(solve_time=timer() - s)
+        return self.last_result
+
+    def update_demand(self, demand: np.ndarray) -> None:
+        self.demand = demand
+        # inflow above the new demands is removed, the rest of the flow stays optimal for the next solve
+        inflow = np.bincount(self.customer_ids, weights=self.flow, minlength=self.n_customers)
+        self._remove_flow(self.customer_ids, inflow - demand)
+        self.last_result = None
+
+    def add_arcs(self,
+                 facility_ids: np.ndarray,
+                 customer_ids: np.ndarray,
+                 costs: np.ndarray,
+                 names: Optional[List[str]] = None) -> None:
+        """
+        New lanes may have negative reduced costs at the current potentials, so the next solve starts cold.
+        """
+        self._set_arcs(np.concatenate([self.facility_ids, facility_ids]),
+                       np.concatenate([self.customer_ids, customer_ids]),
+                       np.concatenate([self.cost, costs]))
+
+    def _remove_flow(self, owner_ids: np.ndarray, over: np.ndarray) -> None:
+        """
+        Removes flow from lanes of facilities or customers, the most expensive lanes first.
+        Removing flow only drops residual arcs of zero reduced cost, so the potentials stay valid.
+        :param owner_ids: facility or customer of every lane
+        :param over: amount of flow to remove per facility or customer
+        """
+        lanes = np.flatnonzero((over[owner_ids] > self.tolerance) & (self.flow > 0.0))
+        if lanes.size == 0:
+            return
+        lanes = lanes[np.lexsort((-self.cost[lanes], owner_ids[lanes]))]
+        owners, flow = owner_ids[lanes], self.flow[lanes]
+        self.flow[lanes] -= np.clip(over[owners] - self._earlier_in_group(owners, flow), 0.0, flow)
+
+    def _set_capacity(self, capacity: np.ndarray) -> None:
+        """
+        Applies facility capacities to the flow of the previous solve and sets excesses and deficits of nodes.
+        """
+        n = self.n_facilities
+        # capacity taken away is removed from the slack first, then from the most expensive lanes
+        outflow = np.bincount(self.facility_ids, weights=self.flow, minlength=n)
+        over = outflow + self.slack - capacity
+        slack_cut = np.clip(over, 0.0, self.slack)
+        self.slack -= slack_cut
+        self._remove_flow(self.facility_ids, over - slack_cut)
+
+        outflow = np.bincount(self.facility_ids, weights=self.flow, minlength=n)
+        inflow = np.bincount(self.customer_ids, weights=self.flow, minlength=self.n_customers)
+        self.excess[:] = 0.0
+        self.deficit[:] = 0.0
+        self.excess[:n] = np.maximum(capacity - outflow - self.slack, 0.0)
+        self.deficit[n:self.dummy] = np.maximum(self.demand - inflow, 0.0)
+        # the dummy customer takes spare capacity, slack above it is the excess of the dummy customer,
+        # which hands it back through facilities with slack
+        dummy_demand = max(0.0, float(capacity.sum() - self.demand.sum()))
+        self.excess[self.dummy] = max(0.0, float(self.slack.sum()) - dummy_demand)
+        self.deficit[self.dummy] = max(0.0, dummy_demand - float(self.slack.sum()))
+
+        # facilities without incoming residual arcs get the lowest valid potential, so closed facilities do not
+        # drift away and reopened ones start from the potentials of their customers
+        is_idle = (outflow <= 0.0) & (self.slack <= 0.0)
+        lowest = np.maximum(self._lane_max(self.potential[n + self.customer_ids] - self.cost),
+                            self.potential[self.dummy])
+        self.potential[:n][is_idle] = lowest[is_idle]
+
+    def _lane_max(self, values: np.ndarray) -> np.ndarray:
+        """
+        :param values: value of every lane
+        :return: maximal value over lanes of every facility, -inf for facilities without lanes
+        """
+        result = np.full(self.n_facilities, -np.inf)
+        if len(values) > 0:
+            result[self.has_lanes] = np.maximum.reduceat(values, self.facility_start[self.has_lanes])
+        return result
+
+    def _update_weights(self) -> None:
+        """
+        Sets weights of arcs to their reduced costs, or to infinity if they have no residual capacity.
+        Explicit zeros are arcs for csgraph, so rounding errors must not give negative weights.
+        """
+        weight = self.graph.data
+        np.subtract(self.arc_cost + self.potential[self.arc_tail], self.potential[self.arc_head], out=weight)
+        np.maximum(weight, 0.0, out=weight)
+        weight[self.reversed_lane_arcs[self.flow <= self.tolerance]] = np.inf
+        weight[self.slack_arcs[self.slack <= self.tolerance]] = np.inf
+        # arcs from the source are virtual
+        weight[self.first_source_arc:] = np.where(self.excess > self.tolerance, 0.0, np.inf)
+
+    def _augment(self) -> SubProblemResult:
+        limit = np.inf
+        while np.any(self.deficit > self.tolerance):
+            self._update_weights()
+            distance, predecessor = dijkstra(self.graph, indices=self.source, return_predecessors=True, limit=limit)
+            distance = distance[:self.source]
+            is_target = np.isfinite(distance) & (self.deficit > self.tolerance)
+            if not np.any(is_target):
+                if np.isinf(limit):
+                    return self._farkas_result(~np.isfinite(distance[self.n_facilities:self.dummy])
+                                               & (self.demand > self.tolerance))
+                # deficit nodes lie farther than the limit
+                limit = np.inf
+                continue
+
+            # potentials within the distance of the farthest deficit node found drop to make arcs of the shortest
+            # path tree tight, the others keep theirs, which keeps reduced costs nonnegative
+            reach = distance[is_target].max()
+            explored = np.flatnonzero(distance <= reach)
+            self.potential[explored] += distance[explored] - reach
+            self._augment_tree(explored, predecessor[explored])
+            limit = 2.0 * reach + self.cost_tolerance
+
+        obj_val = float(self.cost @ self.flow)
+        supply_duals, demand_duals = self._duals()
+        return SubProblemResult(grb.GRB.Status.OPTIMAL, obj_val, supply_duals, demand_duals)
+
+    def _augment_tree(self, nodes: np.ndarray, parent: np.ndarray) -> None:
+        """
+        Sends maximal flow from nodes with excess to deficit nodes along arcs of the shortest path tree.
+        All arcs of the tree have zero reduced cost, so any such flow keeps the potentials valid.
+
+        The dummy customer has a single parent in the tree, so it takes spare capacity directly at every facility
+        whose arc to it is tight, up to its deficit. Requests of subtrees are summed up level by level from
+        the leaves, then the flow is handed down: a customer keeps its deficit first, a facility passes flow to
+        its children first and gives the rest to the dummy customer.
+        :param nodes: nodes of the tree
+        :param parent: parent of every node of the tree, the source for its roots
+        """
+        n = self.n_facilities
+        dummy_deficit = self.deficit[self.dummy]
+        is_sink = (nodes < n) & (self.potential[nodes] - self.potential[self.dummy] <= self.cost_tolerance) \
+            & (dummy_deficit > self.tolerance)
+
+        # only paths to customers with deficit and to sinks carry flow, the rest of the tree is dropped
+        is_used = np.zeros(self.source + 1, dtype=bool)
+        tree_parent = np.full(self.source + 1, self.source)
+        tree_parent[nodes] = parent
+        frontier = nodes[is_sink | ((self.deficit[nodes] > self.tolerance) & (nodes != self.dummy))]
+        while frontier.size > 0:
+            is_used[frontier] = True
+            frontier = np.unique(tree_parent[frontier])
+            frontier = frontier[~is_used[frontier]]
+        is_used = is_used[nodes]
+        nodes, parent, is_sink = nodes[is_used], parent[is_used], is_sink[is_used]
+        is_facility, is_customer = nodes < n, (nodes >= n) & (nodes < self.dummy)
+
+        # residual capacity of the tree arc entering every node, lanes are located for arcs between
+        # facilities and customers
+        capacity = np.full(nodes.size, np.inf)
+        from_source = parent == self.source
+        capacity[from_source] = self.excess[nodes[from_source]]
+        from_dummy = is_facility & (parent == self.dummy)
+        capacity[from_dummy] = self.slack[nodes[from_dummy]]
+        is_forward_lane = is_customer & ~from_source
+        is_reversed_lane = is_facility & (parent >= n) & (parent < self.dummy)
+        lanes = np.zeros(nodes.size, dtype=np.int64)
+        lanes[is_forward_lane] = self._lanes(parent[is_forward_lane], nodes[is_forward_lane] - n)
+        lanes[is_reversed_lane] = self._lanes(nodes[is_reversed_lane], parent[is_reversed_lane] - n)
+        capacity[is_reversed_lane] = self.flow[lanes[is_reversed_lane]]
+
+        own_deficit = np.where(is_customer, self.deficit[nodes], 0.0)
+        own_deficit[is_sink] = dummy_deficit
+
+        # depth of every node, parents of the first level are the source
+        position = np.full(self.source + 1, -1)
+        position[nodes] = np.arange(nodes.size)
+        parent_position = position[parent]
+        depth = np.where(from_source, 1, 0)
+        while np.any(depth == 0):
+            known = (depth == 0) & (depth[parent_position] > 0) & ~from_source
+            depth[known] = depth[parent_position[known]] + 1
+        levels = [np.flatnonzero(depth == level) for level in range(1, depth.max(initial=0) + 1)]
+
+        request = np.zeros(nodes.size)
+        children_request = np.zeros(nodes.size)
+        for level in reversed(levels):
+            request[level] = np.minimum(capacity[level], own_deficit[level] + children_request[level])
+            if level is not levels[0]:
+                children_request += np.bincount(parent_position[level], weights=request[level],
+                                                minlength=nodes.size)
+
+        amount = np.zeros(nodes.size)
+        children_amount = np.zeros(nodes.size)
+        if levels:
+            amount[levels[0]] = request[levels[0]]
+        for level in levels[1:]:
+            level = level[np.argsort(parent_position[level], kind='stable')]
+            owners = parent_position[level]
+            to_children = np.where(is_customer[owners],
+                                   amount[owners] - np.minimum(own_deficit[owners], amount[owners]),
+                                   np.minimum(amount[owners], children_request[owners]))
+            amount[level] = np.clip(to_children - self._earlier_in_group(owners, request[level]),
+                                    0.0, request[level])
+            children_amount += np.bincount(owners, weights=amount[level], minlength=nodes.size)
+        kept = amount - children_amount
+
+        # every sink was offered the whole deficit of the dummy customer, flow above it is withdrawn
+        # along the paths of the last sinks
+        sinks = np.flatnonzero(is_sink)
+        withdrawn = np.zeros(nodes.size)
+        withdrawn[sinks] = kept[sinks] - np.clip(dummy_deficit - self._earlier_in_group(np.zeros(sinks.size),
+                                                                                          kept[sinks]),
+                                                 0.0, kept[sinks])
+        kept -= withdrawn
+        for level in reversed(levels[1:]):
+            withdrawn += np.bincount(parent_position[level], weights=withdrawn[level], minlength=nodes.size)
+        amount -= withdrawn
+
+        self.deficit[nodes[is_customer]] -= kept[is_customer]
+        self.deficit[self.dummy] -= kept[sinks].sum()
+        self.slack[nodes[sinks]] += kept[sinks]
+        self.excess[nodes[from_source]] -= amount[from_source]
+        self.flow[lanes[is_forward_lane]] += amount[is_forward_lane]
+        self.flow[lanes[is_reversed_lane]] -= amount[is_reversed_lane]
+        to_dummy = (nodes == self.dummy) & ~from_source
+        self.slack[parent[to_dummy]] += amount[to_dummy]
+        self.slack[nodes[from_dummy]] -= amount[from_dummy]
+
+    def _lanes(self, facility_ids: np.ndarray, customer_ids: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.lane_key, facility_ids * self.n_customers + customer_ids)
+
+    @staticmethod
+    def _earlier_in_group(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """
+        :param groups: group of every value, equal groups are adjacent
+        :return: sum of the earlier values of the same group for every value
+        """
+        before = np.cumsum(values) - values
+        is_first = np.r_[True, groups[1:] != groups[:-1]]
+        # cumulative sums of nonnegative values are nondecreasing
+        return before - np.maximum.accumulate(np.where(is_first, before, 0.0))
+
+    def _duals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Demand duals are customer potentials relative to the dummy customer. Supply duals are the smallest ones
+        keeping v_j - u_i <= c_ij, which equal the potentials of facilities with flow and give the strongest cut
+        for the others.
+        """
+        # customers without flow may end below the dummy customer, zero is a valid dual for them
+        demand_duals = np.maximum(self.potential[self.n_facilities:self.dummy] - self.potential[self.dummy], 0.0)
+        return np.maximum(self._lane_max(demand_duals[self.customer_ids] - self.cost), 0.0), demand_duals
+
+    def _farkas_result(self, is_unserved: np.ndarray) -> SubProblemResult:
+        """
+        Builds Farkas certificate for customers T which cannot be served:
+        -1 for demand rows of T and for supply rows of facilities with a lane to T,
+        so the feasibility cut reads sum_{i in N(T)} s_i y_i >= sum_{j in T} d_j.
+        """
+        demand_duals = np.where(is_unserved, -1.0, 0.0)
+        has_lane_to_unserved = np.bincount(self.facility_ids, weights=is_unserved[self.customer_ids],
+                                           minlength=self.n_facilities) > 0
+        supply_duals = np.where(has_lane_to_unserved, -1.0, 0.0)
+        return SubProblemResult(grb.GRB.Status.INFEASIBLE, grb.GRB.INFINITY, supply_duals, demand_duals)
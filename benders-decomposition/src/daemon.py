@@ -0,0 +1,459 @@
+"""
+Local solver daemon with warm worker processes and a job queue.
+
+Every worker process imports the solvers and starts its Gurobi environment once, then solves jobs one after
+another. Parsed instances are cached by every worker by the hash of the file content, and jobs are preferably
+scheduled to a worker which has their instance cached. The log of a job and its results are streamed back
+to the client as JSON lines over a Unix socket.
+
+Run from `benders-decomposition/src`:
+    python main.py serve --socket /tmp/facility-location.sock --workers 2
+and submit solves with the arguments of main.py, either by this module, which imports only the standard library:
+    python daemon.py /tmp/facility-location.sock ../data/rk_martin_ex_10_8.json --method benders_decomposition
+or by main.py itself:
+    python main.py --daemon /tmp/facility-location.sock ../data/rk_martin_ex_10_8.json --method benders_decomposition
+"""
+import collections
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing as mp
+import os
+import signal
+import socket
+import sys
+import threading
+from timeit import default_timer as timer
+from typing import Dict, List, Any, Optional, Tuple, Deque
+
+DEFAULT_SOCKET = '/tmp/facility-location.sock'
+
+
+def _json_default(value):
+    # numpy scalars and arrays in statistics
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+def send_message(stream, message: Dict[str, Any]) -> None:
+    stream.write(json.dumps(message, default=_json_default))
+    stream.write('\n')
+    stream.flush()
+
+
+def strip_option(argv: List[str], option: str) -> List[str]:
+    """
+    :return: arguments without option and its value
+    """
+    stripped = []
+    skip = False
+    for argument in argv:
+        if skip:
+            skip = False
+        elif argument == option:
+            skip = True
+        elif not argument.startswith(option + '='):
+            stripped.append(argument)
+    return stripped
+
+
+class _PipeHandler(logging.Handler):
+    """
+    Forwards log records of the running job of a worker process to the daemon.
+    """
+
+    def __init__(self, connection):
+        super().__init__()
+        self.connection = connection
+        self.job: Optional[int] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.job is None:
+            return
+        try:
+            self.connection.send(('log', self.job, self.format(record)))
+        except Exception:
+            self.handleError(record)
+
+    def send(self, message: Tuple) -> None:
+        # sub-problem threads of a job may still log, the connection is shared with them
+        self.acquire()
+        try:
+            self.connection.send(message)
+        finally:
+            self.release()
+
+
+def _worker_main(connection, cache_size: int) -> None:
+    # Ctrl+C stops the daemon, which lets workers finish their jobs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    handler = _PipeHandler(connection)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(handlers=[handler], level=logging.INFO)
+
+    # imports and Gurobi license check are paid once per worker, models of all jobs use its default environment;
+    # main imports the solvers only when solving, so they are imported here
+    import gurobi as grb
+    import main
+    import portfolio
+    import benders_decomposition.saa
+    from input import InputData
+    grb.setParam(grb.GRB.Param.OutputFlag, 0)
+
+    # parsed instances by content hash, least recently used first
+    cache: collections.OrderedDict = collections.OrderedDict()
+    while True:
+        job = connection.recv()
+        if job is None:
+            break
+        job_id, argv, cwd, input_hash, input_path = job
+        handler.job = job_id
+        try:
+            os.chdir(cwd)
+            if input_hash in cache:
+                cache.move_to_end(input_hash)
+            else:
+                cache[input_hash] = InputData.read(input_path)
+                while len(cache) > cache_size:
+                    cache.popitem(last=False)
+            message = ('result', job_id, main.solve(argv, cache[input_hash]), list(cache))
+        except BaseException as ex:
+            logging.exception("Job failed.")
+            message = ('error', job_id, repr(ex), list(cache))
+        handler.job = None
+        handler.send(message)
+
+
+class Job:
+
+    def __init__(self, job_id: int, argv: List[str], cwd: str, input_path: str, input_hash: str, stream):
+        self.id = job_id
+        self.argv = argv
+        self.cwd = cwd
+        self.input_path = input_path
+        self.input_hash = input_hash
+        self.stream = stream
+        self.submitted = timer()
+        self.done = threading.Event()
+
+    def send(self, message: Dict[str, Any]) -> None:
+        if self.stream is None:
+            return
+        try:
+            send_message(self.stream, dict(message, job=self.id))
+        except OSError:
+            # the client went away, the job is still finished, so the worker stays in a known state
+            logging.warning("Client of job %d disconnected.", self.id)
+            self.stream = None
+
+
+class _Worker:
+    """
+    Handle of a worker process in the daemon.
+    """
+
+    def __init__(self, index: int, context, cache_size: int):
+        self.index = index
+        self.context = context
+        self.cache_size = cache_size
+        # content hashes of instances cached by the worker, as reported with its last result
+        self.cached: List[str] = []
+        self.job_count = 0
+        self.start()
+
+    def start(self) -> None:
+        self.connection, child = self.context.Pipe()
+        self.process = self.context.Process(target=_worker_main, args=(child, self.cache_size),
+                                            name=f'solver-worker-{self.index}')
+        self.process.start()
+        child.close()
+        self.cached = []
+
+    def run(self, job: Job) -> None:
+        """
+        Solves job by the worker process, streaming its messages to the client.
+        """
+        self.job_count += 1
+        self.connection.send((job.id, job.argv, job.cwd, job.input_hash, job.input_path))
+        while True:
+            try:
+                kind, job_id, *payload = self.connection.recv()
+            except (EOFError, OSError):
+                logging.error("Worker %d died while solving job %d, it is restarted.", self.index, job.id)
+                job.send(dict(event='error', message='worker process died'))
+                self.process.join()
+                self.start()
+                return
+            if kind == 'log':
+                job.send(dict(event='log', message=payload[0]))
+                continue
+            value, self.cached = payload
+            if kind == 'result':
+                job.send(dict(event='result', results=value, time=timer() - job.submitted))
+            else:
+                job.send(dict(event='error', message=value))
+            return
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join()
+
+
+class SolverDaemon:
+    """
+    Serves solve requests of clients on a Unix socket by a bounded pool of warm worker processes.
+
+    Clients send one JSON line, {"command": "solve", "argv": [...], "cwd": "..."} with arguments of main.py,
+    {"command": "status"} or {"command": "shutdown"}. A solve is answered by JSON lines with "event" being
+    "queued", "started", "log" (repeatedly), and finally "result" with statistics by method or "error".
+    Relative paths of a job are resolved in the working directory of its client.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, workers: int = 2, max_queued: int = 64,
+                 cache_size: int = 8):
+        """
+        :param socket_path: path of the Unix socket
+        :param workers: number of worker processes, each solves one job at a time
+        :param max_queued: maximal number of jobs waiting for a worker, more are rejected
+        :param cache_size: number of parsed instances cached by every worker
+        """
+        self.socket_path = socket_path
+        self.n_workers = workers
+        self.max_queued = max_queued
+        self.cache_size = cache_size
+
+        self.jobs: Deque[Job] = collections.deque()
+        self.condition = threading.Condition()
+        self.job_ids = itertools.count(1)
+        self.running: Dict[int, Job] = dict()
+        self.stopping = False
+        self.finished_count = 0
+        # content hashes by (path, size, modification time), so unchanged files are not read again
+        self.hashes: Dict[Tuple[str, int, int], str] = dict()
+        self.workers: List[_Worker] = []
+        self.listener: Optional[socket.socket] = None
+
+    def serve(self) -> None:
+        s = timer()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.socket_path)
+        self.listener.listen()
+
+        # spawn gives each worker a clean process, Gurobi environments should not be forked
+        context = mp.get_context('spawn')
+        self.workers = [_Worker(index, context, self.cache_size) for index in range(self.n_workers)]
+        threads = [threading.Thread(target=self._serve_worker, args=(worker,), name=f'worker-{worker.index}')
+                   for worker in self.workers]
+        for thread in threads:
+            thread.start()
+        logging.info("Solver daemon with %d workers listens on %s.", self.n_workers, self.socket_path)
+
+        try:
+            while not self.stopping:
+                try:
+                    connection, _ = self.listener.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+        except KeyboardInterrupt:
+            logging.info("Solver daemon is interrupted.")
+        finally:
+            self.shutdown()
+            for thread in threads:
+                thread.join()
+            for worker in self.workers:
+                worker.stop()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        logging.info("Solver daemon finished %d jobs in %f sec.", self.finished_count, timer() - s)
+
+    def shutdown(self) -> None:
+        """
+        Rejects queued jobs and stops accepting new ones, running jobs are finished.
+        """
+        with self.condition:
+            if self.stopping:
+                return
+            self.stopping = True
+            while self.jobs:
+                job = self.jobs.popleft()
+                job.send(dict(event='error', message='daemon is shutting down'))
+                job.done.set()
+            self.condition.notify_all()
+        # wakes up the accept loop, closing the socket alone does not
+        try:
+            self.listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.listener.close()
+
+    def status(self) -> Dict[str, Any]:
+        with self.condition:
+            return dict(workers=[dict(index=worker.index, alive=worker.process.is_alive(), jobs=worker.job_count,
+                                      cached=len(worker.cached)) for worker in self.workers],
+                        queued=len(self.jobs),
+                        running=sorted(self.running),
+                        finished=self.finished_count)
+
+    def _handle(self, connection: socket.socket) -> None:
+        with connection, connection.makefile('rw') as stream:
+            try:
+                request = json.loads(stream.readline() or '{}')
+                command = request.get('command')
+                if command == 'status':
+                    send_message(stream, dict(event='status', **self.status()))
+                elif command == 'shutdown':
+                    send_message(stream, dict(event='shutdown'))
+                    self.shutdown()
+                elif command == 'solve':
+                    job = self._submit(request['argv'], request['cwd'], stream)
+                    if job is not None:
+                        job.done.wait()
+                else:
+                    send_message(stream, dict(event='error', message=f'unknown command {command}'))
+            except (OSError, ValueError, KeyError) as ex:
+                logging.warning("Invalid request: %s.", ex)
+
+    def _submit(self, argv: List[str], cwd: str, stream) -> Optional[Job]:
+        # imported here, so clients of this module do not load the solvers
+        from main import create_solve_parser
+
+        try:
+            args = create_solve_parser().parse_args(argv)
+        except SystemExit:
+            send_message(stream, dict(event='error', message=f'invalid arguments {" ".join(argv)}'))
+            return None
+        if args.daemon is not None:
+            send_message(stream, dict(event='error', message='jobs cannot be submitted to another daemon'))
+            return None
+        input_path = os.path.join(cwd, args.input_data)
+        try:
+            input_hash = self._input_hash(input_path)
+        except OSError as ex:
+            send_message(stream, dict(event='error', message=repr(ex)))
+            return None
+
+        with self.condition:
+            if self.stopping:
+                send_message(stream, dict(event='error', message='daemon is shutting down'))
+                return None
+            if len(self.jobs) >= self.max_queued:
+                send_message(stream, dict(event='error', message=f'queue is full ({self.max_queued} jobs)'))
+                return None
+            job = Job(next(self.job_ids), argv, cwd, input_path, input_hash, stream)
+            self.jobs.append(job)
+            job.send(dict(event='queued', position=len(self.jobs)))
+            self.condition.notify_all()
+        logging.info("Job %d queued: %s.", job.id, " ".join(argv))
+        return job
+
+    def _input_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in self.hashes:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            self.hashes[key] = digest.hexdigest()
+        return self.hashes[key]
+
+    def _next_job(self, worker: _Worker) -> Optional[Job]:
+        """
+        Waits for a job, preferring the oldest one whose instance the worker has cached.
+        :return: the job, None if the daemon stops
+        """
+        with self.condition:
+            while not self.jobs and not self.stopping:
+                self.condition.wait()
+            if self.stopping:
+                return None
+            job = next((job for job in self.jobs if job.input_hash in worker.cached), self.jobs[0])
+            self.jobs.remove(job)
+            self.running[job.id] = job
+            return job
+
+    def _serve_worker(self, worker: _Worker) -> None:
+        while True:
+            job = self._next_job(worker)
+            if job is None:
+                return
+            job.send(dict(event='started', worker=worker.index, cached=job.input_hash in worker.cached))
+            s = timer()
+            try:
+                worker.run(job)
+            finally:
+                with self.condition:
+                    del self.running[job.id]
+                    self.finished_count += 1
+                job.done.set()
+            logging.info("Job %d finished by worker %d in %f sec.", job.id, worker.index, timer() - s)
+
+
+def request(socket_path: str, message: Dict[str, Any]):
+    """
+    Sends request to the daemon.
+    :return: connection and stream of its answers, both have to be closed by the caller
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(socket_path)
+    stream = connection.makefile('rw')
+    send_message(stream, message)
+    return connection, stream
+
+
+def submit(socket_path: str, argv: List[str]) -> Dict[str, Any]:
+    """
+    Solves by the daemon, its log is logged here.
+    :param socket_path: Unix socket of the daemon
+    :param argv: solve arguments of main.py, relative paths are relative to the current working directory
+    :return: statistics by method name
+    """
+    connection, stream = request(socket_path, dict(command='solve', argv=argv, cwd=os.getcwd()))
+    with connection, stream:
+        for line in stream:
+            message = json.loads(line)
+            event = message['event']
+            if event == 'log':
+                logging.info(message['message'])
+            elif event == 'queued':
+                logging.info("Job %d queued at position %d.", message['job'], message['position'])
+            elif event == 'started':
+                logging.info("Job %d started by worker %d%s.", message['job'], message['worker'],
+                             ' with cached input data' if message['cached'] else '')
+            elif event == 'result':
+                logging.info("Job %d finished in %f sec.", message['job'], message['time'])
+                return message['results']
+            elif event == 'error':
+                raise RuntimeError(f"Solver daemon: {message['message']}")
+    raise RuntimeError("Solver daemon closed the connection without results.")
+
+
+def main(argv: List[str]) -> None:
+    if not argv or argv[0] in {'-h', '--help'}:
+        print("usage: daemon.py SOCKET (status | shutdown | <solve arguments of main.py>)")
+        return
+    socket_path, argv = argv[0], argv[1:]
+
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+    try:
+        if argv in (['status'], ['shutdown']):
+            connection, stream = request(socket_path, dict(command=argv[0]))
+            with connection, stream:
+                print(stream.readline().strip())
+        else:
+            print(json.dumps(submit(socket_path, argv), default=_json_default))
+    except (OSError, RuntimeError) as ex:
+        logging.error("Solving by the daemon failed: %s", ex)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
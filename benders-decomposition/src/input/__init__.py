@@ -1,3 +1,5 @@
 from .customer import Customer
 from .facility import Facility
+from .scenario import Scenario
 from .input_data import InputData
+from .instance_generator import generate_instance
@@ -0,0 +1,95 @@
+"""
+Versioned binary instance layout which is memory-mapped on load.
+
+    magic (8 bytes) | version (uint32) | header length (uint32) | JSON header | arrays
+
+The header describes offset, dtype and shape of every array. Arrays are aligned to 64 bytes.
+Names are stored as UTF-8 blobs with int64 offsets, so they can be decoded without parsing anything else.
+"""
+import json
+import struct
+from typing import Dict, List, Optional
+
+import numpy as np
+
+MAGIC = b'FLPBIN\x00\x00'
+VERSION = 1
+ALIGNMENT = 64
+PREFIX = struct.Struct('<8sII')
+
+
+def is_binary_instance(fn: str) -> bool:
+    with open(fn, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _encode_names(names: List[str]) -> Dict[str, np.ndarray]:
+    encoded = [name.encode('utf-8') for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    return {'offsets': offsets, 'blob': np.frombuffer(b''.join(encoded), dtype=np.uint8)}
+
+
+def _decode_names(offsets: np.ndarray, blob: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    return [data[offsets[k]:offsets[k + 1]].decode('utf-8') for k in range(len(offsets) - 1)]
+
+
+def write_binary(fn: str, arrays: Dict[str, np.ndarray], names: Dict[str, List[str]], meta: Dict) -> None:
+    """
+    :param fn: output path
+    :param arrays: numeric arrays to store
+    :param names: name tables to store
+    :param meta: additional values stored in the header
+    """
+    arrays = dict(arrays)
+    for table, values in names.items():
+        for part, array in _encode_names(values).items():
+            arrays[f'{table}.{part}'] = array
+
+    layout = dict()
+    offset = 0
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[key] = array
+        layout[key] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({'meta': meta, 'names': list(names), 'arrays': layout}).encode('utf-8')
+    data_start = -(-(PREFIX.size + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    with open(fn, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for key, array in arrays.items():
+            f.seek(data_start + layout[key]['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+
+
+def read_binary(fn: str) -> Dict:
+    """
+    Memory-maps all arrays of the file, nothing is copied.
+    :return: dictionary with 'meta', mapped 'arrays' and decoded 'names'
+    """
+    with open(fn, 'rb') as f:
+        magic, version, header_length = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{fn} is not a binary instance file.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported binary instance version {version}, expected {VERSION}.")
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    data_start = -(-(PREFIX.size + header_length) // ALIGNMENT) * ALIGNMENT
+
+    arrays: Dict[str, Optional[np.ndarray]] = dict()
+    for key, layout in header['arrays'].items():
+        shape = tuple(layout['shape'])
+        if int(np.prod(shape)) == 0:
+            # empty arrays cannot be mapped
+            arrays[key] = np.empty(shape, dtype=layout['dtype'])
+            continue
+        arrays[key] = np.memmap(fn, dtype=layout['dtype'], mode='r', offset=data_start + layout['offset'], shape=shape)
+
+    names = {table: _decode_names(arrays.pop(f'{table}.offsets'), arrays.pop(f'{table}.blob'))
+             for table in header['names']}
+    return {'meta': header['meta'], 'arrays': arrays, 'names': names}
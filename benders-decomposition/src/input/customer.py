@@ -1,7 +1,9 @@
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass(frozen=True)
 class Customer:
     name: str
     demand: float
+    cluster: Optional[str] = None  # customers sharing a cluster form one block in multi-cut Benders
@@ -1,5 +1,4 @@
 from dataclasses import dataclass
-from typing import Dict
 
 
 @dataclass(frozen=True)
@@ -8,4 +7,3 @@ class Facility:
     exists: bool
     build_cost: float
     supply: float
-    transport_cost: Dict[str, float]  # customer to cost
@@ -1,46 +1,494 @@
-import json
-from typing import List
+import os
+from array import array
+from typing import List, Dict, Iterable, Optional, Tuple
 
+import numpy as np
+
+from .binary_format import is_binary_instance, read_binary, write_binary
 from .customer import Customer
 from .facility import Facility
+from .json_stream import JsonStreamReader
+from .scenario import Scenario
 
 
 class InputData:
+    """
+    Facility location instance held in NumPy arrays indexed by integer facility and customer ids.
+
+    Transport costs are kept either as a dense matrix (facilities in rows, customers in columns,
+    np.inf for missing lanes) or as sparse arcs in coordinate format.
+
+    Stochastic instances additionally hold weighted demand scenarios as a matrix with scenarios in rows
+    and customers in columns; customer_demand is then only the nominal demand.
+    """
+
+    def __init__(self,
+                 facility_names: List[str],
+                 customer_names: List[str],
+                 facility_supply: np.ndarray,
+                 facility_build_cost: np.ndarray,
+                 facility_exists: np.ndarray,
+                 customer_demand: np.ndarray,
+                 transport_cost: Optional[np.ndarray] = None,
+                 arcs: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+                 customer_cluster: Optional[List[Optional[str]]] = None,
+                 scenario_names: Optional[List[str]] = None,
+                 scenario_probability: Optional[np.ndarray] = None,
+                 scenario_demand: Optional[np.ndarray] = None):
+        """
+        :param transport_cost: dense cost matrix, exactly one of transport_cost and arcs has to be given
+        :param arcs: triple (facility ids, customer ids, costs) of existing lanes
+        :param customer_cluster: cluster of every customer, None if customer has no cluster
+        :param scenario_names: names of demand scenarios, None for a deterministic instance
+        :param scenario_probability: probability of every scenario, summing to one
+        :param scenario_demand: demands of customers in every scenario, scenarios in rows
+        """
+        assert (transport_cost is None) != (arcs is None), "Either dense or sparse transport costs are expected."
+        assert scenario_demand is None or \
+            scenario_demand.shape == (len(scenario_names), len(customer_names)) and \
+            len(scenario_probability) == len(scenario_names), \
+            "Scenario demands and probabilities have to be given for every scenario."
+
+        self.facility_names = facility_names
+        self.customer_names = customer_names
+        self.facility_supply = facility_supply
+        self.facility_build_cost = facility_build_cost
+        self.facility_exists = facility_exists
+        self.customer_demand = customer_demand
+        self.transport_cost = transport_cost
+        self._arcs = arcs
+        self.customer_cluster = customer_cluster or [None] * len(customer_names)
+        self.scenario_names = scenario_names
+        self.scenario_probability = scenario_probability
+        self.scenario_demand = scenario_demand
 
-    def __init__(self, facilities: List[Facility], customers: List[Customer]):
+        self._facility_index = {name: i for i, name in enumerate(facility_names)}
 
-        self.facilities = facilities
-        self.customers = customers
+    @property
+    def facilities(self) -> List[Facility]:
+        return [Facility(name=name, exists=bool(exists), build_cost=float(build_cost), supply=float(supply))
+                for name, exists, build_cost, supply
+                in zip(self.facility_names, self.facility_exists, self.facility_build_cost, self.facility_supply)]
+
+    @property
+    def customers(self) -> List[Customer]:
+        return [Customer(name=name, demand=float(demand), cluster=cluster)
+                for name, demand, cluster in zip(self.customer_names, self.customer_demand, self.customer_cluster)]
+
+    @property
+    def scenarios(self) -> List[Scenario]:
+        if not self.is_stochastic():
+            return []
+        return [Scenario(name=name, probability=float(probability), demand=dict(zip(self.customer_names,
+                                                                                     demand.tolist())))
+                for name, probability, demand
+                in zip(self.scenario_names, self.scenario_probability, self.scenario_demand)]
+
+    def is_dense(self) -> bool:
+        return self.transport_cost is not None
 
     def supply(self, facility_name) -> float:
-        for facility in self.facilities:
-            if facility.name == facility_name:
-                return facility.supply
+        return float(self.facility_supply[self._facility_index[facility_name]])
+
+    def supply_vector(self) -> np.ndarray:
+        return self.facility_supply
+
+    def demand_vector(self) -> np.ndarray:
+        return self.customer_demand
+
+    def arcs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Existing lanes in coordinate format.
+        :return: triple (facility ids, customer ids, costs)
+        """
+        if self._arcs is not None:
+            return self._arcs
+        facility_ids, customer_ids = np.nonzero(np.isfinite(self.transport_cost))
+        return facility_ids, customer_ids, self.transport_cost[facility_ids, customer_ids]
+
+    def cost_matrix(self) -> np.ndarray:
+        """
+        Dense matrix of unit transport costs, facilities in rows and customers in columns.
+        Missing lanes have infinite cost.
+        """
+        if self.transport_cost is not None:
+            return self.transport_cost
+        cost = np.full((len(self.facility_names), len(self.customer_names)), np.inf)
+        facility_ids, customer_ids, costs = self._arcs
+        cost[facility_ids, customer_ids] = costs
+        return cost
+
+    def total_demand(self) -> float:
+        return float(self.customer_demand.sum())
+
+    def is_stochastic(self) -> bool:
+        return self.scenario_demand is not None
+
+    def _scenario_arguments(self) -> Dict:
+        return dict(scenario_names=self.scenario_names,
+                    scenario_probability=self.scenario_probability,
+                    scenario_demand=self.scenario_demand)
+
+    def scenario(self, k: int) -> 'InputData':
+        """
+        Creates deterministic input data of k-th scenario, transport costs are shared with this one.
+        """
+        return InputData(facility_names=self.facility_names,
+                         customer_names=self.customer_names,
+                         facility_supply=self.facility_supply,
+                         facility_build_cost=self.facility_build_cost,
+                         facility_exists=self.facility_exists,
+                         customer_demand=self.scenario_demand[k],
+                         transport_cost=self.transport_cost,
+                         arcs=self._arcs,
+                         customer_cluster=self.customer_cluster)
+
+    def sample_scenarios(self, sample_size: int, rng: np.random.Generator) -> 'InputData':
+        """
+        Draws scenarios with replacement according to their probabilities (sample average approximation).
+        Scenarios drawn repeatedly are kept once with probability proportional to their number of draws.
+        :param sample_size: number of draws
+        :param rng: random generator
+        :return: input data with sampled scenarios
+        """
+        counts = rng.multinomial(sample_size, self.scenario_probability / self.scenario_probability.sum())
+        drawn = np.flatnonzero(counts)
+        return InputData(facility_names=self.facility_names,
+                         customer_names=self.customer_names,
+                         facility_supply=self.facility_supply,
+                         facility_build_cost=self.facility_build_cost,
+                         facility_exists=self.facility_exists,
+                         customer_demand=self.customer_demand,
+                         transport_cost=self.transport_cost,
+                         arcs=self._arcs,
+                         customer_cluster=self.customer_cluster,
+                         scenario_names=[self.scenario_names[k] for k in drawn],
+                         scenario_probability=counts[drawn] / sample_size,
+                         scenario_demand=self.scenario_demand[drawn])
+
+    def is_uncapacitated(self) -> bool:
+        """
+        Checks whether every facility alone can cover total demand, i.e. supply constraints never bind.
+        """
+        return bool(np.all(self.facility_supply >= self.total_demand()))
+
+    def customer_clusters(self) -> Dict[str, List[str]]:
+        """
+        Groups customers by their cluster. Customers without a cluster form a singleton cluster.
+        :return: dictionary cluster name -> list of customer names
+        """
+        clusters: Dict[str, List[str]] = dict()
+        for name, cluster in zip(self.customer_names, self.customer_cluster):
+            clusters.setdefault(cluster if cluster is not None else name, []).append(name)
+        return clusters
+
+    def restrict(self, customer_names: Iterable[str]) -> 'InputData':
+        """
+        Creates input data containing only given customers.
+        Supply of each facility is capped at total demand of these customers,
+        which keeps the data a valid relaxation of the per-customer part of the original problem.
+        :param customer_names: names of customers to keep
+        :return: restricted input data
+        """
+        customer_names = set(customer_names)
+        keep = np.array([name in customer_names for name in self.customer_names], dtype=bool)
+        customer_ids = np.flatnonzero(keep)
+        customer_demand = self.customer_demand[customer_ids]
+
+        transport_cost, arcs = None, None
+        if self.is_dense():
+            transport_cost = self.transport_cost[:, customer_ids]
+        else:
+            new_id = np.cumsum(keep) - 1
+            facility_ids, arc_customer_ids, costs = self._arcs
+            kept = keep[arc_customer_ids]
+            arcs = (facility_ids[kept], new_id[arc_customer_ids[kept]], costs[kept])
+
+        return InputData(facility_names=self.facility_names,
+                         customer_names=[self.customer_names[j] for j in customer_ids],
+                         facility_supply=np.minimum(self.facility_supply, customer_demand.sum()),
+                         facility_build_cost=self.facility_build_cost,
+                         facility_exists=self.facility_exists,
+                         customer_demand=customer_demand,
+                         transport_cost=transport_cost,
+                         arcs=arcs,
+                         customer_cluster=[self.customer_cluster[j] for j in customer_ids],
+                         scenario_names=self.scenario_names,
+                         scenario_probability=self.scenario_probability,
+                         scenario_demand=self.scenario_demand[:, customer_ids] if self.is_stochastic() else None)
+
+    def nearest_arcs(self, k: int) -> np.ndarray:
+        """
+        Selects k cheapest lanes of every customer.
+        :param k: number of candidate facilities per customer
+        :return: boolean mask over lanes ordered as in arcs()
+        """
+        _, customer_ids, costs = self.arcs()
+        order = np.lexsort((costs, customer_ids))
+        sorted_customer_ids = customer_ids[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_customer_ids, sorted_customer_ids, side='left')
+
+        keep = np.zeros(len(order), dtype=bool)
+        keep[order] = rank < k
+        return keep
+
+    def with_arcs(self, keep: np.ndarray) -> 'InputData':
+        """
+        Creates input data with sparse transport network consisting of selected lanes only.
+        :param keep: boolean mask over lanes ordered as in arcs()
+        :return: input data sharing facilities and customers with this one
+        """
+        facility_ids, customer_ids, costs = self.arcs()
+        return InputData(facility_names=self.facility_names,
+                         customer_names=self.customer_names,
+                         facility_supply=self.facility_supply,
+                         facility_build_cost=self.facility_build_cost,
+                         facility_exists=self.facility_exists,
+                         customer_demand=self.customer_demand,
+                         arcs=(facility_ids[keep], customer_ids[keep], costs[keep]),
+                         customer_cluster=self.customer_cluster,
+                         **self._scenario_arguments())
+
+    def with_added_arcs(self,
+                        facility_ids: np.ndarray,
+                        customer_ids: np.ndarray,
+                        costs: np.ndarray) -> 'InputData':
+        """
+        Creates input data with sparse transport network extended by given lanes.
+        :return: input data sharing facilities and customers with this one, new lanes follow the existing ones
+        """
+        all_facility_ids, all_customer_ids, all_costs = self.arcs()
+        return InputData(facility_names=self.facility_names,
+                         customer_names=self.customer_names,
+                         facility_supply=self.facility_supply,
+                         facility_build_cost=self.facility_build_cost,
+                         facility_exists=self.facility_exists,
+                         customer_demand=self.customer_demand,
+                         arcs=(np.concatenate([all_facility_ids, facility_ids]),
+                               np.concatenate([all_customer_ids, customer_ids]),
+                               np.concatenate([all_costs, costs])),
+                         customer_cluster=self.customer_cluster,
+                         **self._scenario_arguments())
+
+    def variant(self,
+                demand: Optional[np.ndarray] = None,
+                build_cost: Optional[np.ndarray] = None,
+                exists: Optional[np.ndarray] = None) -> 'InputData':
+        """
+        Creates input data differing in given vectors only, transport costs and scenarios are shared with this one.
+        :param demand: customer demands, None keeps current ones
+        :param build_cost: facility build costs, None keeps current ones
+        :param exists: facilities which already exist, None keeps current ones
+        :return: input data of the variant
+        """
+        return InputData(facility_names=self.facility_names,
+                         customer_names=self.customer_names,
+                         facility_supply=self.facility_supply,
+                         facility_build_cost=self.facility_build_cost if build_cost is None else build_cost,
+                         facility_exists=self.facility_exists if exists is None else exists,
+                         customer_demand=self.customer_demand if demand is None else demand,
+                         transport_cost=self.transport_cost,
+                         arcs=self._arcs,
+                         customer_cluster=self.customer_cluster,
+                         **self._scenario_arguments())
+
+    def save_npz(self, fn: str) -> None:
+        """
+        Writes instance in columnar NPZ format readable by read.
+        """
+        arrays = dict(facility_names=np.array(self.facility_names),
+                      customer_names=np.array(self.customer_names),
+                      facility_supply=self.facility_supply,
+                      facility_build_cost=self.facility_build_cost,
+                      facility_exists=self.facility_exists,
+                      customer_demand=self.customer_demand,
+                      customer_cluster=np.array(['' if c is None else c for c in self.customer_cluster]))
+        if self.is_dense():
+            arrays['transport_cost'] = self.transport_cost
+        else:
+            arrays['arc_facility'], arrays['arc_customer'], arrays['arc_cost'] = self._arcs
+        if self.is_stochastic():
+            arrays['scenario_names'] = np.array(self.scenario_names)
+            arrays['scenario_probability'] = self.scenario_probability
+            arrays['scenario_demand'] = self.scenario_demand
+        with open(fn, 'wb') as f:
+            np.savez(f, **arrays)
+
+    def save_binary(self, fn: str) -> None:
+        """
+        Writes instance in memory-mappable binary format readable by read.
+        """
+        arrays = dict(facility_supply=self.facility_supply.astype(float),
+                      facility_build_cost=self.facility_build_cost.astype(float),
+                      facility_exists=self.facility_exists.astype(bool),
+                      customer_demand=self.customer_demand.astype(float))
+        if self.is_dense():
+            arrays['transport_cost'] = self.transport_cost.astype(float)
+        else:
+            facility_ids, customer_ids, costs = self._arcs
+            arrays['arc_facility'] = facility_ids.astype(np.int32)
+            arrays['arc_customer'] = customer_ids.astype(np.int32)
+            arrays['arc_cost'] = costs.astype(float)
+        names = dict(facility_names=self.facility_names,
+                     customer_names=self.customer_names,
+                     customer_cluster=['' if c is None else c for c in self.customer_cluster])
+        if self.is_stochastic():
+            arrays['scenario_probability'] = self.scenario_probability.astype(float)
+            arrays['scenario_demand'] = self.scenario_demand.astype(float)
+            names['scenario_names'] = self.scenario_names
+        write_binary(fn, arrays, names, {'dense': self.is_dense()})
 
     @staticmethod
-    def read(fn: str):
+    def read(fn: str, dense: Optional[bool] = None):
+        """
+        Reads instance from JSON, columnar NPZ or memory-mapped binary file.
+        :param fn: path to the file
+        :param dense: keep transport costs as dense matrix; by default dense is used if every lane exists.
+                      Binary files are always used in their stored layout, so they are never copied.
+        :return: input data
+        """
+        if is_binary_instance(fn):
+            return InputData._read_binary(fn)
+        if os.path.splitext(fn)[1] == '.npz':
+            return InputData._read_npz(fn, dense)
+        return InputData._read_json(fn, dense)
+
+    @staticmethod
+    def _read_binary(fn: str):
+        data = read_binary(fn)
+        arrays, names = data['arrays'], data['names']
+        arcs = None
+        if not data['meta']['dense']:
+            arcs = (arrays['arc_facility'], arrays['arc_customer'], arrays['arc_cost'])
+        return InputData(facility_names=names['facility_names'],
+                         customer_names=names['customer_names'],
+                         facility_supply=arrays['facility_supply'],
+                         facility_build_cost=arrays['facility_build_cost'],
+                         facility_exists=arrays['facility_exists'],
+                         customer_demand=arrays['customer_demand'],
+                         transport_cost=arrays.get('transport_cost'),
+                         arcs=arcs,
+                         customer_cluster=[c or None for c in names['customer_cluster']],
+                         scenario_names=names.get('scenario_names'),
+                         scenario_probability=arrays.get('scenario_probability'),
+                         scenario_demand=arrays.get('scenario_demand'))
+
+    @staticmethod
+    def _read_npz(fn: str, dense: Optional[bool]):
+        with np.load(fn) as data:
+            transport_cost, arcs = None, None
+            if 'transport_cost' in data:
+                transport_cost = data['transport_cost']
+            else:
+                arcs = (data['arc_facility'], data['arc_customer'], data['arc_cost'])
+            input_data = InputData(
+                facility_names=data['facility_names'].tolist(),
+                customer_names=data['customer_names'].tolist(),
+                facility_supply=data['facility_supply'],
+                facility_build_cost=data['facility_build_cost'],
+                facility_exists=data['facility_exists'],
+                customer_demand=data['customer_demand'],
+                transport_cost=transport_cost,
+                arcs=arcs,
+                customer_cluster=[c or None for c in data['customer_cluster'].tolist()]
+                if 'customer_cluster' in data else None,
+                scenario_names=data['scenario_names'].tolist() if 'scenario_names' in data else None,
+                scenario_probability=data['scenario_probability'] if 'scenario_names' in data else None,
+                scenario_demand=data['scenario_demand'] if 'scenario_names' in data else None)
+        return InputData._with_layout(input_data, dense)
+
+    @staticmethod
+    def _read_json(fn: str, dense: Optional[bool]):
+        """
+        Streams JSON file facility by facility, lanes are collected into compact typed arrays.
+        Customer ids are assigned on first occurrence and re-ordered to the order of customers at the end.
+        Optional scenarios list demands differing from nominal ones, scenarios without probability share
+        the probability left by the others equally.
+        """
+        facility_names, supply, build_cost, exists = [], array('d'), array('d'), array('b')
+        customer_id: Dict[str, int] = dict()
+        demand: Dict[str, float] = dict()
+        cluster: Dict[str, Optional[str]] = dict()
+        customer_order: List[str] = []
+        arc_facility, arc_customer, arc_cost = array('i'), array('i'), array('d')
+        scenarios: List[Dict] = []
 
         with open(fn) as f:
-            data = json.load(f)
+            for key, item in JsonStreamReader(f).items():
+                if key == "facilities":
+                    i = len(facility_names)
+                    facility_names.append(item["name"])
+                    exists.append(bool(item.get("exists", False)))
+                    build_cost.append(item.get("buildCost") or 0.0)
+                    supply.append(item["supply"])
+                    for tc in item["transportCost"]:
+                        arc_facility.append(i)
+                        arc_customer.append(customer_id.setdefault(tc["customer"], len(customer_id)))
+                        arc_cost.append(tc["cost"])
+                elif key == "customers":
+                    customer_id.setdefault(item["name"], len(customer_id))
+                    customer_order.append(item["name"])
+                    demand[item["name"]] = item["demand"]
+                    cluster[item["name"]] = item.get("cluster")
+                elif key == "scenarios":
+                    scenarios.append(item)
+
+        unknown = set(customer_id) - set(demand)
+        if unknown:
+            raise ValueError(f"Transport costs refer to unknown customers: {sorted(unknown)[:10]}.")
+        unknown = {name for scenario in scenarios for name in scenario.get("demand", dict())} - set(demand)
+        if unknown:
+            raise ValueError(f"Scenarios refer to unknown customers: {sorted(unknown)[:10]}.")
 
-        facilities = []
-        for facility_data in data["facilities"]:
-            transport_cost_data = facility_data["transportCost"]
-            transport_cost = {
-                tc["customer"]: tc["cost"] for tc in transport_cost_data
-            }
+        # map ids assigned while streaming to the order of customers
+        new_id = np.empty(len(customer_id), dtype=np.int32)
+        for j, name in enumerate(customer_order):
+            new_id[customer_id[name]] = j
 
-            facility = Facility(
-                name=facility_data["name"],
-                exists=facility_data.get("exists", False),
-                build_cost=facility_data.get("buildCost"),
-                supply=facility_data["supply"],
-                transport_cost=transport_cost
-            )
+        input_data = InputData(
+            facility_names=facility_names,
+            customer_names=customer_order,
+            facility_supply=np.frombuffer(supply, dtype=float),
+            facility_build_cost=np.frombuffer(build_cost, dtype=float),
+            facility_exists=np.frombuffer(exists, dtype=np.int8).astype(bool),
+            customer_demand=np.array([demand[name] for name in customer_order], dtype=float),
+            arcs=(np.frombuffer(arc_facility, dtype=np.int32),
+                  new_id[np.frombuffer(arc_customer, dtype=np.int32)],
+                  np.frombuffer(arc_cost, dtype=float)),
+            customer_cluster=[cluster[name] for name in customer_order],
+            **InputData._json_scenarios(scenarios, customer_order, demand))
+        return InputData._with_layout(input_data, dense)
 
-            facilities.append(facility)
+    @staticmethod
+    def _json_scenarios(scenarios: List[Dict], customer_order: List[str], demand: Dict[str, float]) -> Dict:
+        if not scenarios:
+            return dict()
+        probability = np.array([scenario.get("probability", np.nan) for scenario in scenarios], dtype=float)
+        given = np.isfinite(probability)
+        if not given.all():
+            probability[~given] = max(0.0, 1.0 - probability[given].sum()) / (~given).sum()
+        if not np.isclose(probability.sum(), 1.0):
+            raise ValueError(f"Probabilities of scenarios sum to {probability.sum()} instead of 1.")
+        return dict(scenario_names=[scenario.get("name", f"scenario_{k}") for k, scenario in enumerate(scenarios)],
+                    scenario_probability=probability,
+                    scenario_demand=np.array([[scenario.get("demand", dict()).get(name, demand[name])
+                                               for name in customer_order]
+                                              for scenario in scenarios], dtype=float))
 
-        customers = [Customer(name=customer_data["name"],demand=customer_data["demand"])
-                     for customer_data in data["customers"]]
+    @staticmethod
+    def _with_layout(input_data: 'InputData', dense: Optional[bool]) -> 'InputData':
+        """
+        Converts transport costs to the requested layout, by default dense iff every lane exists.
+        """
+        n_arcs = len(input_data.arcs()[0]) if not input_data.is_dense() else None
+        if dense is None:
+            dense = input_data.is_dense() or \
+                n_arcs == len(input_data.facility_names) * len(input_data.customer_names)
 
-        return InputData(facilities=facilities, customers=customers)
+        if dense and not input_data.is_dense():
+            input_data.transport_cost = input_data.cost_matrix()
+            input_data._arcs = None
+        elif not dense and input_data.is_dense():
+            input_data._arcs = input_data.arcs()
+            input_data.transport_cost = None
+        return input_data
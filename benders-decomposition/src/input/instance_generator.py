@@ -0,0 +1,90 @@
+from typing import Optional
+
+import numpy as np
+
+from .input_data import InputData
+
+COST_DISTRIBUTIONS = ['euclidean', 'uniform']
+
+
+def generate_instance(n_facilities: int,
+                      n_customers: int,
+                      seed: int = 0,
+                      costs: str = 'euclidean',
+                      capacity_tightness: float = 2.0,
+                      density: float = 1.0,
+                      n_clusters: Optional[int] = None,
+                      n_scenarios: int = 0,
+                      demand_variation: float = 0.3) -> InputData:
+    """
+    Generates random capacitated facility location instance in the spirit of Cornuejols, Sridharan and Thizy.
+    The same arguments always give the same instance.
+    :param n_facilities: number of facilities
+    :param n_customers: number of customers
+    :param seed: seed of the random generator
+    :param costs: 'euclidean' - facilities and customers are points in unit square and unit transport cost
+                  is proportional to their distance, 'uniform' - unit transport costs are independent
+    :param capacity_tightness: ratio of total supply to total demand (of the largest scenario),
+                               1 is the tightest feasible instance
+    :param density: fraction of existing lanes; the cheapest lane of every customer always exists.
+                    Below 1 lanes are kept sparse.
+    :param n_clusters: number of customer clusters used as multi-cut blocks, None makes every customer a block
+    :param n_scenarios: number of equally likely demand scenarios, 0 gives a deterministic instance
+    :param demand_variation: scenario demands are nominal demands scaled by factors uniform in 1 +- demand_variation
+    :return: input data
+    """
+    assert costs in COST_DISTRIBUTIONS, f"Unknown cost distribution {costs}."
+    assert capacity_tightness >= 1.0, "Total supply has to cover total demand."
+    assert 0.0 < density <= 1.0, "Density has to be in (0, 1]."
+    assert 0.0 <= demand_variation <= 1.0, "Demand variation has to be in [0, 1]."
+
+    rng = np.random.default_rng(seed)
+
+    demand = rng.integers(5, 36, size=n_customers).astype(float)
+
+    # scenarios have their own generator, so deterministic instances do not change
+    scenario_demand = None
+    max_total_demand = demand.sum()
+    if n_scenarios > 0:
+        scenario_rng = np.random.default_rng([seed, 1])
+        factors = scenario_rng.uniform(1.0 - demand_variation, 1.0 + demand_variation, size=(n_scenarios, n_customers))
+        scenario_demand = np.round(demand * factors)
+        max_total_demand = scenario_demand.sum(axis=1).max()
+
+    weights = rng.uniform(0.5, 1.5, size=n_facilities)
+    supply = np.ceil(capacity_tightness * max_total_demand * weights / weights.sum())
+    build_cost = np.round(rng.uniform(100.0, 110.0, size=n_facilities) * np.sqrt(supply)
+                          + rng.uniform(0.0, 90.0, size=n_facilities))
+
+    if costs == 'euclidean':
+        facility_points = rng.random((n_facilities, 2))
+        customer_points = rng.random((n_customers, 2))
+        distance = np.linalg.norm(facility_points[:, None, :] - customer_points[None, :, :], axis=2)
+        transport_cost = np.round(10.0 * distance, 3)
+    else:
+        transport_cost = rng.integers(1, 101, size=(n_facilities, n_customers)).astype(float)
+
+    arcs = None
+    if density < 1.0:
+        keep = rng.random((n_facilities, n_customers)) < density
+        keep[np.argmin(transport_cost, axis=0), np.arange(n_customers)] = True
+        facility_ids, customer_ids = np.nonzero(keep)
+        arcs = (facility_ids, customer_ids, transport_cost[facility_ids, customer_ids])
+        transport_cost = None
+
+    customer_cluster = None
+    if n_clusters is not None:
+        customer_cluster = [f'K{k}' for k in rng.integers(0, n_clusters, size=n_customers)]
+
+    return InputData(facility_names=[f'F{i}' for i in range(n_facilities)],
+                     customer_names=[f'C{j}' for j in range(n_customers)],
+                     facility_supply=supply,
+                     facility_build_cost=build_cost,
+                     facility_exists=np.zeros(n_facilities, dtype=bool),
+                     customer_demand=demand,
+                     transport_cost=transport_cost,
+                     arcs=arcs,
+                     customer_cluster=customer_cluster,
+                     scenario_names=[f'S{k}' for k in range(n_scenarios)] if n_scenarios > 0 else None,
+                     scenario_probability=np.full(n_scenarios, 1.0 / n_scenarios) if n_scenarios > 0 else None,
+                     scenario_demand=scenario_demand)
@@ -0,0 +1,94 @@
+import json
+import re
+from typing import Any, Iterator, TextIO, Tuple
+
+CHUNK_SIZE = 1 << 20
+
+# characters which may continue a number literal, e.g. '1.' or '1.5e' cut by a chunk boundary
+_NUMBER_TAIL = re.compile(r'[-+.eE0-9]*\Z')
+
+
+class JsonStreamReader:
+    """
+    Reads a top-level JSON object incrementally. Elements of top-level arrays are decoded one at a time,
+    so only a single element (e.g. one facility) has to be held in memory.
+    """
+
+    def __init__(self, f: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int) -> None:
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def _peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos] if self.pos < len(self.buffer) else ''
+            self._fill(self.chunk_size)
+
+    def _expect(self, chars: str) -> str:
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of '{chars}' at offset {self.pos}, found '{char}'.")
+        self.pos += 1
+        return char
+
+    def _decode(self) -> Any:
+        self._peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                if self.eof or not self._may_continue(value, end):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+    def _may_continue(self, value: Any, end: int) -> bool:
+        """
+        :return: whether the decoded value is a number which might continue in the next chunk,
+                 i.e. it is followed only by characters of a number until the end of the buffer
+        """
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return _NUMBER_TAIL.match(self.buffer, end) is not None
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """
+        Iterates over top-level object.
+        :return: pairs (key, element) for every element of an array value and (key, value) for other values
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            if self._peek() == '[':
+                self.pos += 1
+                if self._peek() != ']':
+                    while True:
+                        yield key, self._decode()
+                        if self._expect(',]') == ']':
+                            break
+                else:
+                    self.pos += 1
+            else:
+                yield key, self._decode()
+            if self._expect(',}') == '}':
+                return
@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+from typing import Dict
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    probability: float
+    demand: Dict[str, float]  # customer name -> demand in this scenario
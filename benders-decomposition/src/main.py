@@ -1,12 +1,451 @@
+import json
 import logging
+import os
 import sys
 import argparse
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
+from timeit import default_timer as timer
 
-import gurobi as grb
+# solvers, Gurobi and NumPy are imported by the commands using them, so submitting a job by --daemon
+# loads nothing but the standard library
+import daemon
 
-from input import InputData
-from benders_decomposition.solver import solve_using_benders_decomposition
-from standalone_facility_location_model import solve_using_standalone_model
+if TYPE_CHECKING:
+    from input import InputData
+
+
+def create_solve_parser() -> argparse.ArgumentParser:
+    import portfolio
+    from benders_decomposition.solver import NodeCuts, LpPhase
+
+    parser = argparse.ArgumentParser(description="Solves warehouse location problem.")
+    parser.add_argument('input_data',
+                        help='Path to JSON, NPZ or binary file containing input data.')
+
+    parser.add_argument('--method',
+                        choices=['standalone', 'benders_decomposition', 'both', 'portfolio'],
+                        default='both',
+                        help='A method that should be used to solve a problem, portfolio runs several engines '
+                             'at the same time and stops when the first one proves optimality. default=both.')
+
+    parser.add_argument('--portfolio-engines',
+                        choices=list(portfolio.ENGINES.keys()),
+                        nargs='+',
+                        default=portfolio.DEFAULT_ENGINES,
+                        help='Engines of the portfolio method, each runs in its own process. '
+                             f'default={" ".join(portfolio.DEFAULT_ENGINES)}.')
+
+    parser.add_argument('--portfolio-threads',
+                        type=int,
+                        default=0,
+                        help='Gurobi threads of every portfolio engine, 0 splits cores evenly between engines. '
+                             'default=0.')
+
+    parser.add_argument('--cuts',
+                        choices=['single', 'multi', 'compare'],
+                        default='single',
+                        help='Benders cut mode: single aggregated cut, one cut per customer cluster, '
+                             'or run both and compare them. default=single.')
+
+    parser.add_argument('--workers',
+                        type=int,
+                        default=0,
+                        help='Number of worker processes solving sub-problem blocks of multi-cut Benders '
+                             'in parallel, 0 solves them inside the callback. default=0.')
+
+    parser.add_argument('--sub-problem-backend',
+                        choices=['gurobi', 'transport'],
+                        default='gurobi',
+                        help='Solver of Benders sub-problems: Gurobi LP or native transportation solver. '
+                             'default=gurobi.')
+
+    parser.add_argument('--cut-cache-size',
+                        type=int,
+                        default=10000,
+                        help='Maximal number of facility vectors whose Benders cuts are cached, '
+                             '0 disables the cache. default=10000.')
+
+    parser.add_argument('--cut-cache-memory',
+                        type=int,
+                        default=256,
+                        help='Maximal memory of cached Benders cuts in MB. default=256.')
+
+    parser.add_argument('--cut-store',
+                        default=None,
+                        help='File with Benders cuts of previous runs. Cuts still valid for the input data '
+                             'are added to the master problem before solving, generated cuts are saved to it. '
+                             'With --cuts compare the cut mode is appended to the file name.')
+
+    parser.add_argument('--candidates',
+                        type=int,
+                        default=0,
+                        help='Number of cheapest candidate facilities kept for every customer, 0 keeps all lanes. '
+                             'Benders sub-problems add pruned lanes back when needed, so their result is optimal. '
+                             'The standalone model adds back lanes priced in by its LP duals, its result is '
+                             'heuristic while some lanes stay pruned. default=0.')
+
+    parser.add_argument('--metrics',
+                        default=None,
+                        help='CSV (.csv) or JSON lines file to which a trace of every Benders callback is written, '
+                             'a summary of callback times is logged as well. With --cuts compare the cut mode is '
+                             'appended to the file name. Disabled by default.')
+
+    node_cut_defaults = NodeCuts()
+    parser.add_argument('--node-cuts',
+                        action='store_true',
+                        help='Separate Benders cuts also at fractional nodes of the master problem '
+                             'and add them as user cuts.')
+
+    parser.add_argument('--node-cut-nodes',
+                        type=int,
+                        default=node_cut_defaults.max_nodes,
+                        help=f'Cuts are separated at nodes with node count up to this value, 0 is the root only. '
+                             f'default={node_cut_defaults.max_nodes}.')
+
+    parser.add_argument('--node-cut-rounds',
+                        type=int,
+                        default=node_cut_defaults.max_rounds,
+                        help=f'Maximal number of separation rounds at a node. default={node_cut_defaults.max_rounds}.')
+
+    parser.add_argument('--node-cut-min-violation',
+                        type=float,
+                        default=node_cut_defaults.min_violation,
+                        help=f'Minimal relative violation of a cut added at a node. '
+                             f'default={node_cut_defaults.min_violation}.')
+
+    parser.add_argument('--pareto-cuts',
+                        action='store_true',
+                        help='Strengthen Benders optimality cuts to Pareto-optimal ones (Magnanti-Wong) '
+                             'using an auxiliary LP and a core point of the facility polytope.')
+
+    lp_phase_defaults = LpPhase()
+    parser.add_argument('--lp-phase',
+                        action='store_true',
+                        help='Before branching, solve LP relaxation of the master problem by a cutting-plane loop '
+                             'with in-out stabilization and add its cuts to the master problem.')
+
+    parser.add_argument('--lp-phase-rounds',
+                        type=int,
+                        default=lp_phase_defaults.max_rounds,
+                        help=f'Maximal number of rounds of the LP phase. default={lp_phase_defaults.max_rounds}.')
+
+    parser.add_argument('--lp-phase-alpha',
+                        type=float,
+                        default=lp_phase_defaults.alpha,
+                        help=f'Weight of the stability center in the separation point of the LP phase, '
+                             f'0 disables stabilization. default={lp_phase_defaults.alpha}.')
+
+    parser.add_argument('--background',
+                        action='store_true',
+                        help='Solve Benders sub-problems also in a background thread, which prefetches cuts '
+                             'for rounded node relaxations while the master problem branches (single-cut mode).')
+
+    parser.add_argument('--heuristic-start',
+                        action='store_true',
+                        help='Start both methods from facilities opened by a greedy add, drop and swap heuristic; '
+                             'Benders Decomposition also adds cuts of this start to the master problem.')
+
+    parser.add_argument('--presolve',
+                        action='store_true',
+                        help='Strengthen the Benders master problem by capacity, reachability and dominance '
+                             'inequalities and fix facilities which are always required or dominated.')
+
+    parser.add_argument('--export',
+                        default=None,
+                        help='Directory to which models are exported before solving (the standalone model and '
+                             'the Benders master problem). With --method portfolio every engine exports to its own '
+                             'subdirectory. Disabled by default.')
+
+    parser.add_argument('--export-format',
+                        default='.mps.gz',
+                        help='Extension of exported files: .lp, .rlp, .mps or .rew, optionally compressed by .gz, '
+                             '.bz2, .7z or .zip. default=.mps.gz.')
+
+    parser.add_argument('--export-background',
+                        action='store_true',
+                        help='Export copies of models in a background thread, so solving does not wait for it.')
+
+    parser.add_argument('--snapshot-interval',
+                        type=int,
+                        default=0,
+                        help='With --export, write the Benders master problem with cuts added so far and '
+                             'the full sub-problem every this many integer solutions, 0 disables snapshots. '
+                             'default=0.')
+
+    parser.add_argument('--saa-sample-size',
+                        type=int,
+                        default=0,
+                        help='For input data with demand scenarios, solve Benders Decomposition on samples of this '
+                             'many scenarios (sample average approximation) instead of all of them, 0 disables '
+                             'sampling. --solution is written for the best decision over all scenarios and '
+                             '--metrics once per replication. default=0.')
+
+    parser.add_argument('--saa-replications',
+                        type=int,
+                        default=5,
+                        help='Number of samples of sample average approximation. default=5.')
+
+    parser.add_argument('--saa-seed',
+                        type=int,
+                        default=0,
+                        help='Seed of scenario sampling. default=0.')
+
+    parser.add_argument('--solution',
+                        default=None,
+                        help='File to which open facilities, nonzero flows, duals of the transportation problem '
+                             'for the open facilities and costs are written: compressed NPZ if it ends with .npz, '
+                             'otherwise CSV files <solution>_flows.csv, _facilities.csv, _customers.csv and '
+                             '_costs.csv. With --method both the method name is appended to the file name, with --method '
+                             'portfolio the solution of the winner is written.')
+
+    parser.add_argument('--daemon',
+                        default=None,
+                        metavar='SOCKET',
+                        help='Submit the solve to the solver daemon listening on this Unix socket '
+                             '(see main.py serve) and stream its log and results back.')
+    return parser
+
+
+def method_solution_path(path: Optional[str], method: str, both: bool) -> Optional[str]:
+    """
+    :return: path of the solution file of a method, the method name is appended if more methods are run
+    """
+    if path is None or not both:
+        return path
+    base, extension = os.path.splitext(path)
+    return f'{base}_{method}{extension}'
+
+
+def check_solve_options(parser: argparse.ArgumentParser, args: argparse.Namespace, input_data: 'InputData') -> None:
+    """
+    Rejects combinations of options in which some of them would be ignored, so no run silently differs
+    from the one asked for.
+    """
+    if args.saa_sample_size > 0:
+        if not input_data.is_stochastic():
+            parser.error('--saa-sample-size requires input data with demand scenarios.')
+        if args.method not in {'benders_decomposition', 'both'}:
+            parser.error('--saa-sample-size applies to Benders Decomposition, use --method benders_decomposition '
+                         'or both.')
+        if args.cuts == 'compare':
+            parser.error('--cuts compare cannot be combined with --saa-sample-size.')
+        if args.export is not None:
+            parser.error('--export cannot be combined with --saa-sample-size, replications would overwrite '
+                         'each other\'s models.')
+    if args.method == 'portfolio' and args.cuts != 'single':
+        parser.error('--cuts cannot be combined with --method portfolio, cut modes are selected by '
+                     '--portfolio-engines.')
+    if input_data.is_stochastic():
+        if args.cut_store is not None:
+            parser.error('--cut-store is not supported for input data with demand scenarios.')
+        if args.background:
+            parser.error('--background is not supported for input data with demand scenarios.')
+
+
+def daemon_socket(argv: List[str]) -> Optional[str]:
+    """
+    :return: socket of the daemon the solve should be submitted to, None to solve in this process
+    """
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument('--daemon', default=None)
+    return parser.parse_known_args(argv)[0].daemon
+
+
+def solve(argv: List[str], input_data: Optional['InputData'] = None) -> Dict[str, Any]:
+    """
+    Solves the problem by methods selected by solve arguments.
+    :param argv: solve arguments
+    :param input_data: input data of the input_data argument, read from the file if not given
+    :return: statistics by method name
+    """
+    # arguments are checked by the daemon, which reports invalid ones back
+    socket_path = daemon_socket(argv)
+    if socket_path is not None:
+        return daemon.submit(socket_path, daemon.strip_option(argv, '--daemon'))
+
+    import portfolio
+    from input import InputData
+    from benders_decomposition.saa import solve_using_saa
+    from benders_decomposition.solver import solve_using_benders_decomposition, compare_cut_modes, NodeCuts, LpPhase
+    from standalone_facility_location_model import solve_using_standalone_model
+    from utils.model_export import ModelExporter
+
+    parser = create_solve_parser()
+    args = parser.parse_args(argv)
+
+    # solving facility problem
+    if input_data is None:
+        input_data = InputData.read(args.input_data)
+    check_solve_options(parser, args, input_data)
+    use_standalone_model = args.method in {'standalone', 'both'}
+    use_benders_decomposition = args.method in {'benders_decomposition', 'both'}
+
+    node_cuts = NodeCuts(args.node_cut_nodes, args.node_cut_rounds, args.node_cut_min_violation) \
+        if args.node_cuts else None
+
+    lp_phase = LpPhase(args.lp_phase_rounds, args.lp_phase_alpha) if args.lp_phase else None
+
+    results: Dict[str, Any] = dict()
+    options = dict(workers=args.workers,
+                   backend=args.sub_problem_backend,
+                   cut_cache_size=args.cut_cache_size,
+                   cut_cache_memory=args.cut_cache_memory,
+                   cut_store_path=args.cut_store,
+                   candidates=args.candidates,
+                   metrics_path=args.metrics,
+                   node_cuts=node_cuts,
+                   pareto_cuts=args.pareto_cuts,
+                   lp_phase=lp_phase,
+                   background=args.background,
+                   snapshot_interval=args.snapshot_interval,
+                   heuristic_start=args.heuristic_start,
+                   presolve=args.presolve)
+    if args.method == 'portfolio':
+        # engines run in their own processes, each builds its own exporter
+        export = (args.export, args.export_format, args.export_background) if args.export is not None else None
+        results['portfolio'] = portfolio.solve_using_portfolio(input_data, args.portfolio_engines,
+                                                               args.portfolio_threads, export=export,
+                                                               solution_path=args.solution, **options)
+        return results
+
+    exporter = ModelExporter(args.export, args.export_format, args.export_background) \
+        if args.export is not None else None
+    try:
+        if use_standalone_model:
+            results['standalone'] = solve_using_standalone_model(
+                input_data, candidates=args.candidates, exporter=exporter, heuristic_start=args.heuristic_start,
+                solution_path=method_solution_path(args.solution, 'standalone', args.method == 'both'))
+        if use_benders_decomposition:
+            options['exporter'] = exporter
+            if args.saa_sample_size > 0:
+                results['saa'] = solve_using_saa(
+                    input_data, args.saa_sample_size, args.saa_replications, args.saa_seed, cuts=args.cuts,
+                    solution_path=method_solution_path(args.solution, 'benders', args.method == 'both'), **options)
+            elif args.cuts == 'compare':
+                results['benders_decomposition'] = compare_cut_modes(input_data, **options)
+            else:
+                results['benders_decomposition'] = solve_using_benders_decomposition(
+                    input_data, cuts=args.cuts,
+                    solution_path=method_solution_path(args.solution, 'benders', args.method == 'both'), **options)
+    finally:
+        if exporter is not None:
+            exporter.close()
+    return results
+
+
+def convert(argv: List[str]):
+    parser = argparse.ArgumentParser(prog='main.py convert',
+                                     description="Converts input data to binary (memory-mapped) or NPZ format.")
+    parser.add_argument('input_data', help='Path to JSON, NPZ or binary file containing input data.')
+    parser.add_argument('output', help='Path to the output file.')
+    parser.add_argument('--format',
+                        choices=['binary', 'npz'],
+                        default='binary',
+                        help='Output format. default=binary.')
+    parser.add_argument('--layout',
+                        choices=['auto', 'dense', 'sparse'],
+                        default='auto',
+                        help='Layout of transport costs, auto is dense iff every lane exists. default=auto.')
+    args = parser.parse_args(argv)
+
+    from input import InputData
+    s = timer()
+    input_data = InputData.read(args.input_data, dense={'auto': None, 'dense': True, 'sparse': False}[args.layout])
+    if args.format == 'binary':
+        input_data.save_binary(args.output)
+    else:
+        input_data.save_npz(args.output)
+    logging.info("Converted %s to %s (%s) in %f sec.", args.input_data, args.output, args.format, timer() - s)
+
+
+def generate(argv: List[str]):
+    from input import generate_instance
+    from input.instance_generator import COST_DISTRIBUTIONS
+
+    parser = argparse.ArgumentParser(prog='main.py generate',
+                                     description="Generates random capacitated facility location instance.")
+    parser.add_argument('output', help='Path to the output file, .npz is written as NPZ, anything else as binary.')
+    parser.add_argument('--facilities', type=int, required=True, help='Number of facilities.')
+    parser.add_argument('--customers', type=int, required=True, help='Number of customers.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator. default=0.')
+    parser.add_argument('--costs', choices=COST_DISTRIBUTIONS, default='euclidean',
+                        help='Distribution of transport costs. default=euclidean.')
+    parser.add_argument('--capacity-tightness', type=float, default=2.0,
+                        help='Ratio of total supply to total demand. default=2.0.')
+    parser.add_argument('--density', type=float, default=1.0, help='Fraction of existing lanes. default=1.0.')
+    parser.add_argument('--clusters', type=int, default=None,
+                        help='Number of customer clusters, by default customers have no cluster.')
+    parser.add_argument('--scenarios', type=int, default=0,
+                        help='Number of equally likely demand scenarios, 0 generates a deterministic instance. '
+                             'default=0.')
+    parser.add_argument('--demand-variation', type=float, default=0.3,
+                        help='Scenario demands vary uniformly within this fraction of nominal demands. default=0.3.')
+    args = parser.parse_args(argv)
+
+    input_data = generate_instance(args.facilities, args.customers, args.seed, args.costs,
+                                   args.capacity_tightness, args.density, args.clusters,
+                                   args.scenarios, args.demand_variation)
+    if os.path.splitext(args.output)[1] == '.npz':
+        input_data.save_npz(args.output)
+    else:
+        input_data.save_binary(args.output)
+    logging.info("Generated instance written to %s.", args.output)
+
+
+def batch(argv: List[str]):
+    parser = argparse.ArgumentParser(prog='main.py batch',
+                                     description="Solves variants of one instance, building models only once.")
+    parser.add_argument('input_data', help='Path to JSON, NPZ or binary file containing base input data.')
+    parser.add_argument('variants',
+                        help='JSON file with a list of variants, each with optional "name", "demand" '
+                             '(customer -> demand), "build_cost" (facility -> cost) and "exists" (facility -> bool).')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Number of worker processes, 0 solves variants in this process. default=0.')
+    parser.add_argument('--sub-problem-backend', choices=['gurobi', 'transport'], default='gurobi',
+                        help='Solver of Benders sub-problems. default=gurobi.')
+    parser.add_argument('--output', default=None, help='CSV file the results table is written to.')
+    args = parser.parse_args(argv)
+
+    from input import InputData
+    from benders_decomposition.batch import solve_variants, report_variants, write_variants
+    input_data = InputData.read(args.input_data)
+    with open(args.variants) as f:
+        variants = json.load(f)
+
+    rows = solve_variants(input_data, variants, args.workers, backend=args.sub_problem_backend)
+    report_variants(rows)
+    if args.output is not None:
+        write_variants(rows, args.output)
+
+
+def serve(argv: List[str]):
+    parser = argparse.ArgumentParser(prog='main.py serve',
+                                     description="Runs solver daemon with warm worker processes on a Unix socket.")
+    parser.add_argument('--socket', default=daemon.DEFAULT_SOCKET,
+                        help=f'Path of the Unix socket. default={daemon.DEFAULT_SOCKET}.')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Number of worker processes, each solves one job at a time. default=2.')
+    parser.add_argument('--max-queued', type=int, default=64,
+                        help='Maximal number of jobs waiting for a worker, more are rejected. default=64.')
+    parser.add_argument('--cache-size', type=int, default=8,
+                        help='Number of parsed instances cached by every worker. default=8.')
+    args = parser.parse_args(argv)
+
+    daemon.SolverDaemon(args.socket, args.workers, args.max_queued, args.cache_size).serve()
+
+
+def run_benchmark(argv: List[str]):
+    import benchmark
+    benchmark.main(argv)
+
+
+COMMANDS = {
+    'batch': batch,
+    'convert': convert,
+    'generate': generate,
+    'benchmark': run_benchmark,
+    'serve': serve,
+}
 
 
 def main():
@@ -17,34 +456,22 @@ def main():
                             datefmt='%Y/%m/%d %I:%M:%S %p',
                             level=logging.INFO)
 
-        parser = argparse.ArgumentParser(description="Solves warehouse location problem.")
-        parser.add_argument('input_data',
-                            help='Path to JSON file containing input data.')
-
-        parser.add_argument('--method',
-                            choices=['standalone', 'benders_decomposition', 'both'],
-                            default='both',
-                            help='A method that should be used to solve a problem. default=both.')
-        args = parser.parse_args()
-
-        # solving facility problem
-        input_data = InputData.read(args.input_data)
-        use_standalone_model = args.method in {'standalone', 'both'}
-        use_benders_decomposition = args.method in {'benders_decomposition', 'both'}
-
-        if use_standalone_model:
-            solve_using_standalone_model(input_data)
-        if use_benders_decomposition:
-            solve_using_benders_decomposition(input_data)
+        argv = sys.argv[1:]
+        if argv and argv[0] in COMMANDS:
+            COMMANDS[argv[0]](argv[1:])
+        else:
+            solve(argv)
 
     except argparse.ArgumentError:
         logging.exception('Exception raised during parsing arguments')
         sys.exit(2)
-    except grb.GurobiError:
-        logging.exception("Gurobi exception thrown")
-        sys.exit(1)
-    except Exception:
-        logging.exception("Exception occurred")
+    except Exception as ex:
+        # Gurobi is imported only by commands which use it
+        gurobi = sys.modules.get('gurobi')
+        if gurobi is not None and isinstance(ex, gurobi.GurobiError):
+            logging.exception("Gurobi exception thrown")
+        else:
+            logging.exception("Exception occurred")
         sys.exit(1)
 
 
@@ -0,0 +1,205 @@
+"""
+Portfolio of solution methods racing on one instance in separate processes.
+
+Every engine runs in its own process with its own Gurobi environment. Improved incumbents are shared between
+engines as MIP starts and cutoffs, and all engines are stopped as soon as one of them proves optimality.
+Run from `benders-decomposition/src`:
+    python main.py --method portfolio --portfolio-engines standalone benders_single data/rk_martin_ex_10_8.json
+"""
+import logging
+import multiprocessing as mp
+import os
+import queue
+from timeit import default_timer as timer
+from typing import Dict, List, Any, Optional, Tuple
+
+import gurobi as grb
+import numpy as np
+
+from benders_decomposition.solver import solve_using_benders_decomposition
+from input import InputData
+from standalone_facility_location_model import solve_using_standalone_model
+from utils.incumbent_exchange import IncumbentExchange
+from utils.model_export import ModelExporter
+from utils.solution_export import extract_solution, write_solution
+
+# engine name -> (method, options of its solve function)
+ENGINES = {
+    'standalone': ('standalone', dict()),
+    'benders_single': ('benders', dict(cuts='single')),
+    'benders_multi': ('benders', dict(cuts='multi')),
+    'benders_pareto': ('benders', dict(cuts='single', pareto_cuts=True)),
+    'benders_presolve': ('benders', dict(cuts='single', presolve=True, heuristic_start=True)),
+}
+
+DEFAULT_ENGINES = ['standalone', 'benders_single', 'benders_presolve']
+
+# seconds to wait for stopped engines before they are killed
+STOP_TIMEOUT = 10.0
+# relative difference of objectives below which the winner is not worse than the best shared incumbent
+OBJECTIVE_TOLERANCE = 1e-9
+# options of Benders Decomposition naming files, every engine gets its own file with the engine name appended
+ENGINE_PATH_OPTIONS = ['cut_store_path', 'metrics_path']
+
+
+def engine_path(path: Optional[str], engine: str) -> Optional[str]:
+    """
+    :return: path of a file written by an engine, the engine name is appended to the file name
+    """
+    if path is None:
+        return None
+    base, extension = os.path.splitext(path)
+    return f'{base}_{engine}{extension}'
+
+
+def _run_engine(index: int,
+                engine: str,
+                input_data: InputData,
+                options: Dict[str, Any],
+                export: Optional[Tuple[str, str, bool]],
+                threads: int,
+                exchange: IncumbentExchange,
+                results) -> None:
+    """
+    Solves the instance by one engine. Runs in a process of the portfolio and puts triple
+    (index, statistics, error) to results.
+    """
+    logging.basicConfig(format=f'[{engine}] %(message)s', level=logging.INFO)
+    exchange.engine = index
+    # models of every engine are exported to its own subdirectory
+    exporter = ModelExporter(os.path.join(export[0], engine), export[1], export[2]) if export is not None else None
+    try:
+        # models of the engine are built in the default environment of this process
+        grb.setParam(grb.GRB.Param.OutputFlag, 0)
+        if threads > 0:
+            grb.setParam(grb.GRB.Param.Threads, threads)
+        method, engine_options = ENGINES[engine]
+        if method == 'standalone':
+            statistics = solve_using_standalone_model(input_data, options.get('candidates', 0), exporter=exporter,
+                                                      heuristic_start=options.get('heuristic_start', False),
+                                                      incumbent_exchange=exchange)
+        else:
+            options = dict(options, **{name: engine_path(options.get(name), engine) for name in ENGINE_PATH_OPTIONS})
+            statistics = solve_using_benders_decomposition(input_data, exporter=exporter, incumbent_exchange=exchange,
+                                                           **dict(options, **engine_options))
+        # standalone model restricted to candidate lanes bounds the restricted network only
+        statistics['proved'] = statistics['gap'] <= grb.getParamInfo(grb.GRB.Param.MIPGap)[2] \
+            and not statistics.get('heuristic', False)
+        results.put((index, statistics, None))
+    except Exception as ex:
+        if exchange.stop.is_set():
+            # stopped before it found any solution
+            results.put((index, dict(proved=False), None))
+        else:
+            logging.exception("Portfolio engine failed.")
+            results.put((index, None, repr(ex)))
+    finally:
+        if exporter is not None:
+            exporter.close()
+
+
+def solve_using_portfolio(input_data: InputData,
+                          engines: Optional[List[str]] = None,
+                          threads: int = 0,
+                          export: Optional[Tuple[str, str, bool]] = None,
+                          solution_path: Optional[str] = None,
+                          **options) -> Dict[str, Any]:
+    """
+    Solves the instance by several engines at the same time, the first one proving optimality wins.
+    :param input_data: input data
+    :param engines: names of engines from ENGINES, by default DEFAULT_ENGINES
+    :param threads: Gurobi threads of every engine, by default cores are split evenly between engines
+    :param export: if given, triple (directory, file format, background) of model export, every engine exports
+                   its models to a subdirectory named after it
+    :param solution_path: if given, the solution of the winner is written to this NPZ or CSV file
+    :param options: options of solve_using_benders_decomposition shared by all engines, options set by an engine
+                    take precedence; the standalone model uses 'candidates' and 'heuristic_start' only, and
+                    'cut_store_path' and 'metrics_path' get the engine name appended
+    :return: statistics of the winning engine with 'winner', 'time' and statistics of all 'engines'
+    """
+    s = timer()
+    engines = engines or DEFAULT_ENGINES
+    threads = threads or max(1, (os.cpu_count() or 1) // len(engines))
+    logging.info("[START] Solving warehouse location problem by portfolio of %s.", ", ".join(engines))
+
+    # spawn gives each engine a clean process, Gurobi environments should not be forked
+    context = mp.get_context('spawn')
+    exchange = IncumbentExchange(context, len(input_data.facility_names))
+    results = context.Queue()
+    processes = [context.Process(target=_run_engine,
+                                 args=(index, engine, input_data, options, export, threads, exchange, results),
+                                 name=f'portfolio-{engine}')
+                 for index, engine in enumerate(engines)]
+    for process in processes:
+        process.start()
+
+    finished: Dict[int, Dict[str, Any]] = dict()
+    winner = None
+    winner_time = None
+    try:
+        while len(finished) < len(processes):
+            try:
+                index, statistics, error = results.get(timeout=1.0)
+            except queue.Empty:
+                # an engine killed without reporting, e.g. by the OS, must not block the portfolio
+                for index, process in enumerate(processes):
+                    if index not in finished and not process.is_alive() and process.exitcode != 0:
+                        finished[index] = dict(error=f'exit code {process.exitcode}')
+                continue
+            finished[index] = statistics if error is None else dict(error=error)
+            if winner is None and error is None and statistics['proved']:
+                winner, winner_time = index, timer() - s
+                logging.info("Engine %s proved optimality after %f sec., other engines are stopped.",
+                             engines[index], winner_time)
+                exchange.stop.set()
+    finally:
+        exchange.stop.set()
+        for process in processes:
+            process.join(STOP_TIMEOUT)
+            if process.is_alive():
+                logging.warning("Engine process %s does not stop, it is killed.", process.name)
+                process.kill()
+                process.join()
+
+    _, best_objective, _, holder = exchange.best()
+    holder = holder if 'objective' in finished.get(holder, dict()) else None
+    if winner is None:
+        # nobody proved optimality, the engine holding the best shared incumbent is reported
+        winner = holder
+        winner_time = timer() - s
+    elif holder is not None and finished[winner]['objective'] > \
+            best_objective + OBJECTIVE_TOLERANCE * max(1.0, abs(best_objective)):
+        # the proof holds within the MIP gap, but the solution of another engine is better
+        logging.info("Engine %s holds better incumbent %f than %f of engine %s, it is reported as winner.",
+                     engines[holder], best_objective, finished[winner]['objective'], engines[winner])
+        winner = holder
+
+    report(engines, finished, winner)
+    if solution_path is not None and winner is not None:
+        is_open = np.isin(input_data.facility_names, finished[winner]['open_facilities'])
+        write_solution(extract_solution(input_data, is_open), solution_path)
+    statistics = dict(finished[winner]) if winner is not None else dict()
+    statistics['winner'] = engines[winner] if winner is not None else None
+    statistics['winner_time'] = winner_time
+    statistics['engines'] = {engines[index]: finished[index] for index in sorted(finished)}
+    statistics['time'] = timer() - s
+    logging.info("[END] Solving warehouse location problem by portfolio. It took %f sec.", statistics['time'])
+    return statistics
+
+
+def report(engines: List[str], finished: Dict[int, Dict[str, Any]], winner: Optional[int]) -> None:
+    logging.info("** Results of portfolio engines **")
+    logging.info("%-20s %-8s %16s %12s %12s", 'engine', 'result', 'objective', 'gap', 'time')
+    for index, engine in enumerate(engines):
+        statistics = finished.get(index, dict())
+        if 'error' in statistics:
+            result = 'failed'
+        else:
+            result = 'won' if index == winner else ('proved' if statistics.get('proved') else 'stopped')
+        logging.info("%-20s %-8s %16g %12g %12f", engine, result, statistics.get('objective', float('nan')),
+                     statistics.get('gap', float('nan')), statistics.get('time', float('nan')))
+    if winner is not None:
+        logging.info("Winner: %s, objective value: %f, open facilities: %s.", engines[winner],
+                     finished[winner]['objective'], " ".join(finished[winner].get('open_facilities', [])))
+    else:
+        logging.warning("No engine found a solution.")
@@ -1,10 +1,12 @@
 import logging
-from typing import Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import gurobi as grb
+import numpy as np
 from bidict import bidict
 
 from utils import is_non_zero
+from utils.model_export import ModelExporter
 
 
 class SingleModel:
@@ -12,19 +14,84 @@ class SingleModel:
     def __init__(self,
                  model: grb.Model,
                  facility_name_to_column: bidict[str, grb.Var],
-                 facility_customer_to_column: bidict[Tuple[str, str], grb.Var]):
+                 transport_columns: Union[grb.MVar, List[grb.MVar]],
+                 scenario_names: Optional[List[str]] = None,
+                 constraint_indices: Optional[List[Tuple[np.ndarray, np.ndarray]]] = None):
 
         self.model = model
         self.facility_name_to_column = facility_name_to_column
-        self.facility_customer_to_column = facility_customer_to_column
+        # one column per lane, in the order of InputData.arcs(); in the extensive form one such MVar per scenario
+        self.transport_columns = transport_columns
+        self.scenario_names = scenario_names
+        # pairs (supply constraint indices, demand constraint indices) of every scenario
+        self.constraint_indices = constraint_indices or []
+        self.cb: Optional[Callable] = None
+
+    def register_callback(self, cb: Callable):
+        self.cb = cb
+
+    def facility_columns(self) -> List[grb.Var]:
+        """
+        :return: facility columns in the order of facilities of the input data
+        """
+        return list(self.facility_name_to_column.values())
+
+    def set_start(self, is_open: np.ndarray):
+        """
+        Sets start values of facility columns, Gurobi completes the start by transport columns itself.
+        """
+        self.model.setAttr(grb.GRB.Attr.Start, self.facility_columns(), is_open.astype(float).tolist())
 
     def solve(self):
-        self.model.optimize()
+        self.model.optimize(self.cb)
 
-    def write(self):
+    def write(self, exporter: Optional[ModelExporter] = None):
+        """
+        :param exporter: exporter of the model, by default LP file is written to the working directory
+        """
         self.model.update()
         model_name = self.model.getAttr(grb.GRB.Attr.ModelName)
-        self.model.write(f'{model_name}.lp')
+        (exporter or ModelExporter()).export(self.model, model_name)
+
+    def open_facilities(self) -> List[str]:
+        """
+        :return: names of facilities open in the best solution found
+        """
+        values = self.model.getAttr(grb.GRB.Attr.X, self.facility_columns())
+        return [name for name, value in zip(self.facility_name_to_column.keys(), values) if is_non_zero(value)]
+
+    def flows(self) -> List[np.ndarray]:
+        """
+        :return: values of transport columns in the order of lanes, one vector per scenario of the extensive form
+        """
+        columns = self.transport_columns if self.scenario_names is not None else [self.transport_columns]
+        return [c.getAttr(grb.GRB.Attr.X) for c in columns]
+
+    def duals(self, relaxed: bool) -> Optional[List[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Solves a copy of the model as LP, either its LP relaxation or the transportation problem
+        with facilities fixed to the best solution found.
+        :param relaxed: solve the LP relaxation, otherwise the fixed model
+        :return: pairs (supply duals, demand duals) of every scenario, None if the LP is not optimal
+        """
+        lp = self.model.relax() if relaxed else self.model.fixed()
+        try:
+            lp.Params.OutputFlag = 0
+            lp.optimize()
+            if lp.Status != grb.GRB.Status.OPTIMAL:
+                return None
+            pi = np.array(lp.getAttr(grb.GRB.Attr.Pi, lp.getConstrs()))
+            return [(pi[supply], pi[demand]) for supply, demand in self.constraint_indices]
+        finally:
+            lp.dispose()
+
+    def statistics(self) -> Dict[str, float]:
+        return {
+            'nodes': self.model.getAttr(grb.GRB.Attr.NodeCount),
+            'runtime': self.model.getAttr(grb.GRB.Attr.Runtime),
+            'objective': self.model.getAttr(grb.GRB.Attr.ObjVal),
+            'gap': self.model.getAttr(grb.GRB.Attr.MIPGap),
+        }
 
     def report_results(self):
         obj_val = self.model.getAttr(grb.GRB.Attr.ObjVal)
@@ -32,8 +99,5 @@ class SingleModel:
         logging.info("** Final results using standalone model! **")
         logging.info("Objective value: %f", obj_val)
         logging.info("The facilities at the following locations should be built:")
-        for var in self.model.getVars():
-            if is_non_zero(var.x):
-                facility_name = self.facility_name_to_column.inverse.get(var)
-                if facility_name:
-                    logging.info("    %s", facility_name)
+        for facility_name in self.open_facilities():
+            logging.info("    %s", facility_name)
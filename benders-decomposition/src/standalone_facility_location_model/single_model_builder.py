@@ -1,5 +1,9 @@
-from typing import Tuple, Dict
+import logging
+from timeit import default_timer as timer
+from typing import List, Tuple
+
 import gurobi as grb
+import numpy as np
 from bidict import bidict
 
 from input import InputData
@@ -11,35 +15,67 @@ from .single_model import SingleModel
 
 class SingleModelBuilder:
 
-    def __init__(self, data: InputData):
+    def __init__(self, data: InputData, with_names: bool = False):
+        """
+        Builds the extensive form with transport columns and constraints of every scenario if data is stochastic.
+        :param data: input data
+        :param with_names: whether lane columns and constraints should be named
+        """
         self.data = data
+        self.with_names = with_names
 
         self.model = grb.Model("facility_location_single_model")
 
-        self.facility_name_to_column: Dict[str, grb.Var] = None
-        self.facility_customer_to_column: Dict[Tuple[str, str], grb.Var] = None
+        self.facility_columns: grb.MVar = None
+        self.transport_columns: List[grb.MVar] = []
+        self.supply_constraints: List[grb.MConstr] = []
+        self.demand_constraints: List[grb.MConstr] = []
 
     def build(self):
+        s = timer()
 
         self._build_columns()
         self._build_constraints()
         self.model.update()
 
-        facility_name_to_column = bidict(self.facility_name_to_column)
-        facility_customer_to_column = bidict(self.facility_customer_to_column)
+        facility_name_to_column = bidict(zip(self.data.facility_names, self.facility_columns.tolist()))
+        constraint_indices = [(self._indices(supply), self._indices(demand))
+                              for supply, demand in zip(self.supply_constraints, self.demand_constraints)]
+
+        logging.info("Built %s in %f sec.", self.model.ModelName, timer() - s)
+        if self.data.is_stochastic():
+            return SingleModel(self.model, facility_name_to_column, self.transport_columns,
+                               self.data.scenario_names, constraint_indices)
+        return SingleModel(self.model, facility_name_to_column, self.transport_columns[0],
+                           constraint_indices=constraint_indices)
+
+    @staticmethod
+    def _indices(constraints: grb.MConstr) -> np.ndarray:
+        return np.array([constraint.index for constraint in constraints.tolist()], dtype=np.int64)
 
-        return SingleModel(self.model, facility_name_to_column, facility_customer_to_column)
+    def _recourse_data(self) -> List[Tuple[InputData, float]]:
+        """
+        :return: pairs (data, probability) of every scenario, the data itself for a deterministic instance
+        """
+        if not self.data.is_stochastic():
+            return [(self.data, 1.0)]
+        return [(self.data.scenario(k), float(probability))
+                for k, probability in enumerate(self.data.scenario_probability)]
 
     def _build_constraints(self):
-        build_supply_constraints(self.data,
-                                 self.model,
-                                 self.facility_customer_to_column,
-                                 self.facility_name_to_column)
+        for (data, _), transport_columns in zip(self._recourse_data(), self.transport_columns):
+            self.supply_constraints.append(build_supply_constraints(data,
+                                                                    self.model,
+                                                                    transport_columns,
+                                                                    self.facility_columns,
+                                                                    self.with_names))
 
-        build_demand_constraints(self.data,
-                                 self.model,
-                                 self.facility_customer_to_column)
+            self.demand_constraints.append(build_demand_constraints(data,
+                                                                    self.model,
+                                                                    transport_columns,
+                                                                    self.with_names))
 
     def _build_columns(self):
-        self.facility_name_to_column = build_facility_columns(self.data, self.model)
-        self.facility_customer_to_column = build_transport_columns(self.data, self.model)
+        self.facility_columns = build_facility_columns(self.data, self.model)
+        self.transport_columns = [build_transport_columns(data, self.model, self.with_names, probability)
+                                  for data, probability in self._recourse_data()]
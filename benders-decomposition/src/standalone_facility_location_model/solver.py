@@ -1,19 +1,142 @@
 import logging
+from typing import Dict, Optional, Tuple
 from timeit import default_timer as timer
 
+import gurobi as grb
+import numpy as np
+
 from input import InputData
-from standalone_facility_location_model import SingleModelBuilder
+from standalone_facility_location_model import SingleModelBuilder, SingleModel
+from utils import is_non_zero
+from utils.incumbent_exchange import IncumbentExchange
+from utils.model_export import ModelExporter
+from utils.solution_export import extract_solution, write_solution
+from utils.start_heuristic import StartHeuristic
+
+# reduced cost below -LANE_TOLERANCE makes a pruned lane enter the restricted model
+LANE_TOLERANCE = 1e-6
 
 
-def solve_using_standalone_model(input_data: InputData):
+def solve_using_standalone_model(input_data: InputData,
+                                 candidates: int = 0,
+                                 exporter: Optional[ModelExporter] = None,
+                                 heuristic_start: bool = False,
+                                 incumbent_exchange: Optional[IncumbentExchange] = None,
+                                 solution_path: Optional[str] = None) -> Dict[str, float]:
+    """
+    Solves the problem using a single MIP model.
+    :param input_data: input data
+    :param candidates: if positive, the model starts with this many cheapest lanes of every customer;
+                       pruned lanes with negative reduced cost at the LP relaxation or at the best solution
+                       are added back and the model is solved again until none prices in (all of them
+                       if the restricted model is infeasible). Lanes still pruned at the end make the result
+                       heuristic, which is marked in the statistics
+    :param exporter: if given, the model is exported by it before solving
+    :param heuristic_start: start from facilities opened by greedy add, drop and swap heuristic
+    :param incumbent_exchange: if given, incumbents are shared with other processes solving the same instance
+    :param solution_path: if given, open facilities, nonzero flows, duals of the transportation problem
+                          for the open facilities and costs are written to this NPZ or CSV file
+    :return: statistics of the run
+    """
     s = timer()
     logging.info("[START] solving warehouse location problem using standalone model.")
+    if input_data.is_stochastic():
+        logging.info("Standalone model is the extensive form of %d demand scenarios.", len(input_data.scenario_names))
 
-    single_model = SingleModelBuilder(input_data).build()
-    single_model.write()
+    active = None
+    if candidates > 0:
+        keep = input_data.nearest_arcs(candidates)
+        if not keep.all():
+            logging.info("Standalone model is restricted to %d of %d lanes.", keep.sum(), keep.size)
+            active = keep
+
+    # exported models are meant to be read, so lanes and constraints are named only for them
+    model_data, single_model = _build(input_data, active, exporter is not None, incumbent_exchange)
+    if exporter is not None:
+        single_model.write(exporter)
+    if heuristic_start:
+        single_model.set_start(StartHeuristic(model_data).run())
+    build_time = timer() - s
     single_model.solve()
+
+    restored_lane_count = 0
+    while active is not None and not active.all():
+        if incumbent_exchange is not None and incumbent_exchange.stop.is_set():
+            break
+        start = None
+        if single_model.model.Status == grb.GRB.Status.INFEASIBLE:
+            logging.warning("Restricted standalone model is infeasible, pruned lanes are added back.")
+            entering = np.flatnonzero(~active)
+        elif single_model.model.SolCount > 0:
+            entering = _price_lanes(input_data, active, single_model)
+            start = _is_open(single_model)
+        else:
+            break
+        if entering.size == 0:
+            break
+
+        active[entering] = True
+        restored_lane_count += entering.size
+        logging.info("%d pruned lanes price in, standalone model is solved again with %d of %d lanes.",
+                     entering.size, active.sum(), active.size)
+        single_model.model.dispose()
+        model_data, single_model = _build(input_data, active, exporter is not None, incumbent_exchange)
+        if start is not None:
+            single_model.set_start(start)
+        single_model.solve()
+
+    heuristic = active is not None and not active.all()
+    if heuristic:
+        logging.warning("Standalone model ended restricted to %d of %d lanes, its solution is heuristic "
+                        "and its gap holds for the restricted model only.", active.sum(), active.size)
     single_model.report_results()
+    if solution_path is not None:
+        write_solution(extract_solution(model_data, _is_open(single_model), single_model.flows()), solution_path)
 
-    e = timer()
+    statistics = single_model.statistics()
+    statistics['open_facilities'] = single_model.open_facilities()
+    statistics['heuristic'] = heuristic
+    statistics['restored_lanes'] = restored_lane_count
+    statistics['build_time'] = build_time
+    statistics['time'] = timer() - s
     logging.info("[END] solving warehouse location problem using standalone model."
-                 "It took %f sec.", e - s)
+                 "It took %f sec.", statistics['time'])
+    return statistics
+
+
+def _build(input_data: InputData,
+           active: Optional[np.ndarray],
+           with_names: bool,
+           incumbent_exchange: Optional[IncumbentExchange]) -> Tuple[InputData, SingleModel]:
+    """
+    :return: pair (input data of the model restricted to active lanes, model)
+    """
+    data = input_data.with_arcs(active) if active is not None else input_data
+    single_model = SingleModelBuilder(data, with_names=with_names).build()
+    if incumbent_exchange is not None:
+        single_model.register_callback(incumbent_exchange.callback(single_model.facility_columns()))
+    return data, single_model
+
+
+def _is_open(single_model: SingleModel) -> np.ndarray:
+    return is_non_zero(np.array(single_model.model.getAttr(grb.GRB.Attr.X, single_model.facility_columns())))
+
+
+def _price_lanes(input_data: InputData, active: np.ndarray, single_model: SingleModel) -> np.ndarray:
+    """
+    Prices pruned lanes with duals of the LP relaxation and of the transportation problem of the best solution
+    (the model with fixed facilities) of every scenario.
+    :return: indices of pruned lanes with negative reduced cost in any of them
+    """
+    pruned = np.flatnonzero(~active)
+    facility_ids, customer_ids, costs = input_data.arcs()
+    facility_ids, customer_ids, costs = facility_ids[pruned], customer_ids[pruned], costs[pruned]
+    weights = input_data.scenario_probability if input_data.is_stochastic() else np.ones(1)
+
+    entering = np.zeros(len(pruned), dtype=bool)
+    for relaxed in [True, False]:
+        for weight, (supply_duals, demand_duals) in zip(weights, single_model.duals(relaxed) or []):
+            # column of x_ij has -1 in supply row i and +1 in demand row j
+            reduced_costs = weight * costs - (demand_duals[customer_ids] - supply_duals[facility_ids])
+            entering |= reduced_costs < -LANE_TOLERANCE
+    return pruned[entering]
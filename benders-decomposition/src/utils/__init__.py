@@ -7,6 +7,10 @@ def is_non_zero(var):
     return np.abs(var) > 0.0001
 
 
+def is_positive(var):
+    return var > 0.0001
+
+
 sc = grb.StatusConstClass
 status_code_to_string = {
     sc.__dict__[k]: k
@@ -0,0 +1,117 @@
+import logging
+from typing import Callable, Dict, Optional, List, Tuple
+
+import gurobi as grb
+import numpy as np
+
+# attempts to inject one shared incumbent, Benders master may reject the first one while its cuts are added
+MAX_INJECT_ATTEMPTS = 2
+# number of own candidate solutions remembered until one of them becomes the incumbent
+MAX_CANDIDATES = 16
+
+
+class IncumbentExchange:
+    """
+    Best facility vector shared between solver processes racing on the same instance.
+
+    Every process publishes incumbents of its model which improve the shared objective, and injects better
+    shared vectors into its own model as heuristic solutions, so they act as MIP starts and cutoffs at once.
+    Only facility values are injected, Gurobi completes the remaining columns (transport columns of the
+    standalone model, recourse variables of the Benders master bounded by the cuts added so far).
+    All processes are interrupted once stop is set.
+    """
+
+    def __init__(self, context, n_facilities: int):
+        """
+        :param context: multiprocessing context of the processes, shared objects are created by it
+        :param n_facilities: number of facilities, vectors are in the order of InputData.facility_names
+        """
+        self.lock = context.Lock()
+        self.objective = context.RawValue('d', float('inf'))
+        self.is_open = context.RawArray('b', n_facilities)
+        self.version = context.RawValue('i', 0)
+        self.holder = context.RawValue('i', -1)
+        self.stop = context.Event()
+        # index of the engine in the current process, set by the process itself
+        self.engine = -1
+
+    def publish(self, objective: float, is_open: np.ndarray) -> bool:
+        """
+        Shares facility vector of the current engine if it improves the shared objective.
+        :return: True if shared
+        """
+        with self.lock:
+            if objective >= self.objective.value:
+                return False
+            self.objective.value = objective
+            self.is_open[:] = is_open.astype(np.int8).tolist()
+            self.version.value += 1
+            self.holder.value = self.engine
+        logging.info("Incumbent %f is shared.", objective)
+        return True
+
+    def best(self) -> Tuple[int, float, np.ndarray, int]:
+        """
+        :return: quadruple (version, objective, facility vector, index of the engine which found it)
+        """
+        with self.lock:
+            return self.version.value, self.objective.value, np.array(self.is_open[:], dtype=bool), \
+                self.holder.value
+
+    def callback(self, facility_columns: List[grb.Var], inner: Optional[Callable] = None) -> Callable:
+        """
+        Wraps callback of a model, so it exchanges incumbents and stops when requested.
+        :param facility_columns: facility columns of the model in the order of shared vectors
+        :param inner: callback of the model, None if it has none
+        :return: callback function
+        """
+        # own MIPSOL candidates by objective, one of them is published once Gurobi accepts it as incumbent
+        candidates: Dict[float, np.ndarray] = dict()
+        state = dict(incumbent=float('inf'), injected=0, attempts=0)
+
+        def publish_incumbent(incumbent: float) -> None:
+            if incumbent >= state['incumbent']:
+                return
+            state['incumbent'] = incumbent
+            tolerance = 1e-9 * max(1.0, abs(incumbent))
+            for objective, is_open in candidates.items():
+                if abs(objective - incumbent) <= tolerance:
+                    self.publish(incumbent, is_open)
+                    break
+            candidates.clear()
+
+        def inject(model, incumbent: float) -> None:
+            version, objective, is_open, holder = self.best()
+            if version == 0 or holder == self.engine or objective >= incumbent - 1e-9 * max(1.0, abs(objective)):
+                return
+            if version != state['injected']:
+                state['injected'], state['attempts'] = version, 0
+            if state['attempts'] >= MAX_INJECT_ATTEMPTS:
+                return
+            state['attempts'] += 1
+            model.cbSetSolution(facility_columns, is_open.astype(float).tolist())
+            model.cbUseSolution()
+
+        def callback_inner(model, where):
+            if inner is not None:
+                inner(model, where)
+
+            if where == grb.GRB.Callback.MIPSOL:
+                if len(candidates) >= MAX_CANDIDATES:
+                    candidates.pop(next(iter(candidates)))
+                candidates[model.cbGet(grb.GRB.Callback.MIPSOL_OBJ)] = \
+                    np.array(model.cbGetSolution(facility_columns)) > 0.5
+            elif where == grb.GRB.Callback.MIP:
+                if self.stop.is_set():
+                    model.terminate()
+                    return
+                publish_incumbent(model.cbGet(grb.GRB.Callback.MIP_OBJBST))
+            elif where == grb.GRB.Callback.MIPNODE:
+                if self.stop.is_set():
+                    model.terminate()
+                    return
+                incumbent = model.cbGet(grb.GRB.Callback.MIPNODE_OBJBST)
+                publish_incumbent(incumbent)
+                inject(model, incumbent)
+
+        return callback_inner
@@ -1,100 +1,91 @@
-from typing import Dict, Tuple
+from typing import Optional, List, Iterable
 
 import gurobi as grb
+import numpy as np
+import scipy.sparse as sp
 
 from input import InputData
 
 
-def build_transport_columns(data: InputData, model: grb.Model) -> Dict[Tuple[str, str], grb.Var]:
-    facility_customer_to_column: Dict[Tuple[str, str], grb.Var] = dict()
-
-    lb = 0.0
-    ub = grb.GRB.INFINITY
-
-    for facility in data.facilities:
-        for customer_name, unit_transport_cost in facility.transport_cost.items():
-            name = f'x_{facility.name}_{customer_name}'
-            var = model.addVar(
-                lb=lb,
-                ub=ub,
-                obj=unit_transport_cost,
-                vtype=grb.GRB.CONTINUOUS,
-                name=name,
-                column=None
-            )
-            facility_customer_to_column[(facility.name, customer_name)] = var
-
-    return facility_customer_to_column
-
-
-def build_facility_columns(data: InputData, model: grb.Model) -> Dict[str, grb.Var]:
-    facility_name_to_column: Dict[str, grb.Var] = dict()
-
-    for facility in data.facilities:
-
-        name = f'facility_{facility.name}'
-        lb, obj = (0.0, facility.build_cost) if not facility.exists else (1.0, 0)
-        var = model.addVar(
-            lb=lb,
-            ub=1.0,
-            obj=obj,
-            vtype=grb.GRB.BINARY,
-            name=name,
-            column=None
-        )
+def _names(with_names: bool, names: Iterable[str]) -> Optional[List[str]]:
+    """
+    Names are generated only when requested, for millions of lanes they are expensive to build and to pass to Gurobi.
+    """
+    return list(names) if with_names else None
 
-        facility_name_to_column[facility.name] = var
 
-    return facility_name_to_column
+def build_transport_columns(data: InputData,
+                            model: grb.Model,
+                            with_names: bool = False,
+                            weight: float = 1.0) -> grb.MVar:
+    """
+    Builds column x_ij >= 0 for every lane, in the order of data.arcs().
+    :param weight: factor of transport costs in the objective, e.g. probability of a scenario in the extensive form
+    """
+    facility_ids, customer_ids, costs = data.arcs()
+    names = _names(with_names, (f'x_{data.facility_names[i]}_{data.customer_names[j]}'
+                                for i, j in zip(facility_ids, customer_ids)))
+    return model.addMVar(len(costs),
+                         lb=0.0,
+                         ub=grb.GRB.INFINITY,
+                         obj=weight * np.asarray(costs, dtype=float),
+                         vtype=grb.GRB.CONTINUOUS,
+                         name=names)
+
+
+def build_facility_columns(data: InputData, model: grb.Model, with_names: bool = True) -> grb.MVar:
+    """
+    Builds binary column y_i for every facility; existing facilities are fixed to 1 and cost nothing.
+    """
+    exists = np.asarray(data.facility_exists, dtype=bool)
+    names = _names(with_names, (f'facility_{name}' for name in data.facility_names))
+    return model.addMVar(len(exists),
+                         lb=np.where(exists, 1.0, 0.0),
+                         ub=1.0,
+                         obj=np.where(exists, 0.0, data.facility_build_cost),
+                         vtype=grb.GRB.BINARY,
+                         name=names)
 
 
 def build_supply_constraints(data: InputData,
                              model: grb.Model,
-                             facility_customer_pair_to_column: Dict[Tuple[str, str], grb.Var],
-                             facility_name_to_column: Dict[str, grb.Var]) -> Dict[str, grb.Constr]:
+                             transport_columns: grb.MVar,
+                             facility_columns: Optional[grb.MVar],
+                             with_names: bool = False) -> grb.MConstr:
 
     """
-    Build constraints s_i y_i - \sum_{j=0}^{m} x_ij >= 0, for all i = 1, ..., n
-    :param data:
-    :param model:
-    :param facility_customer_pair_to_column:
-    :param facility_name_to_column:
-    :return:
+    Build constraints s_i y_i - \\sum_{j=0}^{m} x_ij >= 0, for all i = 1, ..., n.
+    Without facility columns y_i = 1, i.e. constraints - \\sum_{j=0}^{m} x_ij >= -s_i are built.
+    :param data: input data
+    :param model: model to which constraints are added
+    :param transport_columns: columns built by build_transport_columns
+    :param facility_columns: columns built by build_facility_columns or None
+    :param with_names: whether constraints should be named
+    :return: constraints in the order of facilities
     """
+    facility_ids, _, costs = data.arcs()
+    n_facilities, n_arcs = len(data.facility_names), len(costs)
+    lane_matrix = sp.csr_matrix((-np.ones(n_arcs), (facility_ids, np.arange(n_arcs))), shape=(n_facilities, n_arcs))
 
-    facility_to_row = dict()
-    for facility in data.facilities:
-        lhs = [
-            -facility_customer_pair_to_column[(facility.name, customer_name)]
-            for customer_name in facility.transport_cost.keys()
-        ]
-
-        facility_var = facility_name_to_column.get(facility.name, 1)
-        lhs.append(1 * facility.supply * facility_var)
-        lhs = grb.quicksum(lhs)
-        name = f'supply_{facility.name}'
-
-        row = model.addConstr(lhs >= 0.0, name=name)
-        facility_to_row[facility.name] = row
-
-    return facility_to_row
+    supply = np.asarray(data.facility_supply, dtype=float)
+    names = _names(with_names, (f'supply_{name}' for name in data.facility_names))
+    if facility_columns is None:
+        return model.addConstr(lane_matrix @ transport_columns >= -supply, name=names)
+    return model.addConstr(lane_matrix @ transport_columns + supply * facility_columns >= 0.0, name=names)
 
 
 def build_demand_constraints(data: InputData,
                              model: grb.Model,
-                             facility_customer_pair_to_column: Dict[Tuple[str, str], grb.Var]) \
-        -> Dict[str, grb.Constr]:
-
-    customer_to_row = dict()
-    for customer in data.customers:
-        lhs = grb.quicksum([
-            facility_customer_pair_to_column[(facility.name, customer.name)]
-            for facility in data.facilities]
-        )
-        rhs = customer.demand
-        name = f'demand_{customer.name}'
-        row = model.addConstr(lhs >= rhs, name=name)
-
-        customer_to_row[customer.name] = row
+                             transport_columns: grb.MVar,
+                             with_names: bool = False) -> grb.MConstr:
+    """
+    Build constraints \\sum_{i=0}^{n} x_ij >= d_j, for all j = 1, ..., m
+    :return: constraints in the order of customers
+    """
+    _, customer_ids, costs = data.arcs()
+    n_customers, n_arcs = len(data.customer_names), len(costs)
+    lane_matrix = sp.csr_matrix((np.ones(n_arcs), (customer_ids, np.arange(n_arcs))), shape=(n_customers, n_arcs))
 
-    return customer_to_row
+    names = _names(with_names, (f'demand_{name}' for name in data.customer_names))
+    return model.addConstr(lane_matrix @ transport_columns >= np.asarray(data.customer_demand, dtype=float),
+                           name=names)
@@ -0,0 +1,90 @@
+import logging
+import os
+import queue
+import threading
+from timeit import default_timer as timer
+from typing import Optional
+
+import gurobi as grb
+
+MODEL_FORMATS = ['.lp', '.rlp', '.mps', '.rew']
+COMPRESSIONS = ['', '.gz', '.bz2', '.7z', '.zip']
+
+
+class ModelExporter:
+    """
+    Writes Gurobi models to files. Format is given by the file extension (e.g. .lp, .mps, .mps.gz, .mps.bz2),
+    compression is done by Gurobi while writing.
+
+    In background mode the model is copied into a new environment and the copy is written by a background thread,
+    so solving continues while the file is formatted and compressed. Models and environments must not be used
+    by two threads at once, which the private copy guarantees.
+    """
+
+    def __init__(self, directory: str = '.', file_format: str = '.lp', background: bool = False):
+        """
+        :param directory: directory files are written to, created if it does not exist
+        :param file_format: extension of written files, one of MODEL_FORMATS optionally followed by one of COMPRESSIONS
+        :param background: write copies of models in a background thread
+        """
+        if not any(file_format == model_format + compression
+                   for model_format in MODEL_FORMATS for compression in COMPRESSIONS):
+            raise ValueError(f"Unsupported model file format {file_format}.")
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.file_format = file_format
+        self.background = background
+        self.written_count = 0
+
+        self.requests: Optional[queue.Queue] = None
+        self.thread: Optional[threading.Thread] = None
+        if background:
+            self.requests = queue.Queue()
+            self.thread = threading.Thread(target=self._run, name='model-export', daemon=True)
+            self.thread.start()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}{self.file_format}')
+
+    def export(self, model: grb.Model, name: str) -> None:
+        """
+        Writes updated model to file name + file format in the export directory.
+        In background mode this returns as soon as the model is copied.
+        """
+        path = self.path(name)
+        if not self.background:
+            self._write(model, path)
+            return
+        env = grb.Env()
+        copy = model.copy(env)
+        copy.ModelName = model.ModelName
+        self.requests.put((copy, env, path))
+
+    def _write(self, model: grb.Model, path: str) -> None:
+        s = timer()
+        model.write(path)
+        self.written_count += 1
+        logging.info("Model %s written to %s in %f sec.", model.ModelName, path, timer() - s)
+
+    def _run(self) -> None:
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            model, env, path = request
+            try:
+                self._write(model, path)
+            except Exception:
+                logging.exception("Writing model to %s failed.", path)
+            finally:
+                model.dispose()
+                env.dispose()
+
+    def close(self) -> None:
+        """
+        Waits until models queued for writing are written.
+        """
+        if self.thread is not None:
+            self.requests.put(None)
+            self.thread.join()
@@ -0,0 +1,174 @@
+import csv
+import logging
+import os
+from timeit import default_timer as timer
+from typing import List, NamedTuple, Optional
+
+import gurobi as grb
+import numpy as np
+
+from input import InputData
+from utils import is_positive
+from utils.model_build_utils import build_transport_columns, build_supply_constraints, build_demand_constraints
+
+
+class Solution(NamedTuple):
+    """
+    Solution in columnar form: open facilities, nonzero flows of all scenarios stacked in coordinate format,
+    duals of supply and demand constraints of the transportation problem for the open facilities and costs.
+    Deterministic instances have a single scenario with probability one.
+    """
+    facility_names: List[str]
+    customer_names: List[str]
+    scenario_names: List[str]
+    scenario_probability: np.ndarray
+    is_open: np.ndarray
+    flow_scenario: np.ndarray
+    flow_facility: np.ndarray
+    flow_customer: np.ndarray
+    flow: np.ndarray
+    unit_cost: np.ndarray
+    supply_duals: np.ndarray
+    demand_duals: np.ndarray
+    build_cost: float
+    transport_cost: np.ndarray
+
+    @property
+    def expected_transport_cost(self) -> float:
+        return float(self.scenario_probability @ self.transport_cost)
+
+    @property
+    def total_cost(self) -> float:
+        return self.build_cost + self.expected_transport_cost
+
+
+def extract_solution(data: InputData,
+                     is_open: np.ndarray,
+                     flows: Optional[List[np.ndarray]] = None,
+                     env: Optional[grb.Env] = None) -> Solution:
+    """
+    Solves the transportation problem of every scenario for the open facilities, so duals (and flows of
+    a Benders run, whose master problem has none) are known, all values are fetched in bulk.
+    :param data: input data the solution belongs to
+    :param is_open: vector of open facilities ordered as facility names
+    :param flows: flows over lanes in the order of data.arcs() for every scenario, if known from the model,
+                  otherwise flows of the transportation problems are used
+    :param env: Gurobi environment, default one is used if not given
+    :return: the solution
+    """
+    s = timer()
+    is_open = np.asarray(is_open, dtype=bool)
+    facility_ids, customer_ids, costs = data.arcs()
+    if data.is_stochastic():
+        scenario_names, probability, demands = data.scenario_names, data.scenario_probability, data.scenario_demand
+    else:
+        scenario_names, probability, demands = ['nominal'], np.ones(1), [data.demand_vector()]
+
+    model = grb.Model("facility_location_solution", env=env)
+    try:
+        model.Params.OutputFlag = 0
+        transport_columns = build_transport_columns(data, model)
+        supply_constraints = build_supply_constraints(data, model, transport_columns, None)
+        demand_constraints = build_demand_constraints(data, model, transport_columns)
+        supply_constraints.setAttr(grb.GRB.Attr.RHS, -np.asarray(data.facility_supply, dtype=float) * is_open)
+
+        nonzero_flows, supply_duals, demand_duals, transport_cost = [], [], [], []
+        for k, demand in enumerate(demands):
+            demand_constraints.setAttr(grb.GRB.Attr.RHS, np.asarray(demand, dtype=float))
+            model.optimize()
+            if model.Status != grb.GRB.Status.OPTIMAL:
+                raise ValueError(f"Open facilities cannot serve scenario {scenario_names[k]}, "
+                                 f"transportation problem is {model.Status}.")
+            flow = flows[k] if flows is not None else transport_columns.getAttr(grb.GRB.Attr.X)
+            nonzero = np.flatnonzero(is_positive(flow))
+            nonzero_flows.append((np.full(len(nonzero), k, dtype=np.int32), nonzero, flow[nonzero]))
+            supply_duals.append(supply_constraints.getAttr(grb.GRB.Attr.Pi))
+            demand_duals.append(demand_constraints.getAttr(grb.GRB.Attr.Pi))
+            transport_cost.append(float(costs[nonzero] @ flow[nonzero]))
+    finally:
+        model.dispose()
+
+    lanes = np.concatenate([nonzero for _, nonzero, _ in nonzero_flows])
+    solution = Solution(facility_names=list(data.facility_names),
+                        customer_names=list(data.customer_names),
+                        scenario_names=list(scenario_names),
+                        scenario_probability=np.asarray(probability, dtype=float),
+                        is_open=is_open,
+                        flow_scenario=np.concatenate([k for k, _, _ in nonzero_flows]),
+                        flow_facility=np.asarray(facility_ids)[lanes].astype(np.int32),
+                        flow_customer=np.asarray(customer_ids)[lanes].astype(np.int32),
+                        flow=np.concatenate([flow for _, _, flow in nonzero_flows]),
+                        unit_cost=np.asarray(costs, dtype=float)[lanes],
+                        supply_duals=np.array(supply_duals),
+                        demand_duals=np.array(demand_duals),
+                        build_cost=float(np.where(data.facility_exists, 0.0, data.facility_build_cost) @ is_open),
+                        transport_cost=np.array(transport_cost))
+    logging.info("Solution with %d nonzero flows extracted in %f sec.", len(solution.flow), timer() - s)
+    return solution
+
+
+def write_solution(solution: Solution, path: str) -> None:
+    """
+    Writes solution as compressed NPZ if path ends with .npz, otherwise as CSV files path_flows.csv,
+    path_facilities.csv, path_customers.csv and path_costs.csv, where path is stripped of .csv.
+    """
+    base, extension = os.path.splitext(path)
+    if extension == '.npz':
+        np.savez_compressed(path,
+                            facility_names=np.array(solution.facility_names),
+                            customer_names=np.array(solution.customer_names),
+                            scenario_names=np.array(solution.scenario_names),
+                            scenario_probability=solution.scenario_probability,
+                            is_open=solution.is_open,
+                            flow_scenario=solution.flow_scenario,
+                            flow_facility=solution.flow_facility,
+                            flow_customer=solution.flow_customer,
+                            flow=solution.flow,
+                            unit_cost=solution.unit_cost,
+                            supply_duals=solution.supply_duals,
+                            demand_duals=solution.demand_duals,
+                            build_cost=solution.build_cost,
+                            transport_cost=solution.transport_cost,
+                            total_cost=solution.total_cost)
+    else:
+        if extension != '.csv':
+            base = path
+        _write_csv_solution(solution, base)
+    logging.info("Solution written to %s: build cost %f, expected transport cost %f, total cost %f.",
+                 path, solution.build_cost, solution.expected_transport_cost, solution.total_cost)
+
+
+def _dual_columns(prefix: str, scenario_names: List[str]) -> List[str]:
+    return [prefix] if len(scenario_names) == 1 else [f'{prefix}_{name}' for name in scenario_names]
+
+
+def _write_csv(fn: str, header: List[str], columns: List[list]) -> None:
+    with open(fn, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(zip(*columns))
+
+
+def _write_csv_solution(solution: Solution, base: str) -> None:
+    facility_names = np.array(solution.facility_names)
+    customer_names = np.array(solution.customer_names)
+    scenario_names = np.array(solution.scenario_names)
+    _write_csv(f'{base}_flows.csv',
+               ['scenario', 'facility', 'customer', 'flow', 'unit_cost'],
+               [scenario_names[solution.flow_scenario].tolist(),
+                facility_names[solution.flow_facility].tolist(),
+                customer_names[solution.flow_customer].tolist(),
+                solution.flow.tolist(),
+                solution.unit_cost.tolist()])
+    _write_csv(f'{base}_facilities.csv',
+               ['facility', 'open'] + _dual_columns('supply_dual', solution.scenario_names),
+               [solution.facility_names, solution.is_open.astype(int).tolist()] + solution.supply_duals.tolist())
+    _write_csv(f'{base}_customers.csv',
+               ['customer'] + _dual_columns('demand_dual', solution.scenario_names),
+               [solution.customer_names] + solution.demand_duals.tolist())
+    items = ['build_cost', 'transport_cost', 'total_cost']
+    values = [solution.build_cost, solution.expected_transport_cost, solution.total_cost]
+    if len(solution.scenario_names) > 1:
+        items += [f'transport_cost_{name}' for name in solution.scenario_names]
+        values += solution.transport_cost.tolist()
+    _write_csv(f'{base}_costs.csv', ['item', 'value'], [items, values])
@@ -0,0 +1,167 @@
+import logging
+from timeit import default_timer as timer
+from typing import Tuple
+
+import numpy as np
+
+from input import InputData
+
+
+class StartHeuristic:
+    """
+    Greedy add, drop and swap of facilities giving a start vector for the MIP.
+
+    Candidates are scored by build cost plus an estimate of transport cost, computed at once for all customers:
+    every customer is served by its cheapest open facility and the demand overloading a facility is charged
+    with the mean regret (second cheapest minus cheapest cost) of its customers. Demand which cannot be served
+    at all is charged with a penalty higher than any transport and build cost per unit.
+    Stochastic instances are scored with expected demands, supply has to cover total demand of every scenario.
+
+    The penalty only guides the search, a small shortage can still look cheaper than the build cost it saves.
+    Drops and swaps therefore never close supply needed to cover the required supply, and the final vector
+    is repaired by opening facilities of the lowest build cost per unit of supply until it covers it.
+    """
+
+    def __init__(self, data: InputData, max_swap_rounds: int = 20, swap_candidates: int = 5):
+        """
+        :param data: input data
+        :param max_swap_rounds: maximal number of improving swaps
+        :param swap_candidates: number of closed facilities with best add gains tried in swaps
+        """
+        self.cost = data.cost_matrix()
+        self.supply = np.asarray(data.facility_supply, dtype=float)
+        self.build_cost = np.where(data.facility_exists, 0.0, data.facility_build_cost).astype(float)
+        self.exists = np.asarray(data.facility_exists, dtype=bool)
+        if data.is_stochastic():
+            self.demand = data.scenario_probability @ data.scenario_demand
+            self.required_supply = float(data.scenario_demand.sum(axis=1).max())
+        else:
+            self.demand = np.asarray(data.demand_vector(), dtype=float)
+            self.required_supply = float(self.demand.sum())
+        self.max_swap_rounds = max_swap_rounds
+        self.swap_candidates = swap_candidates
+
+        finite_cost = self.cost[np.isfinite(self.cost)]
+        self.penalty = 2.0 * (finite_cost.max(initial=0.0) + (self.build_cost / np.maximum(self.supply, 1.0)).max()) \
+            + 1.0
+        self.evaluation_count = 0
+
+    def transport_estimate(self, is_open: np.ndarray) -> float:
+        """
+        :param is_open: boolean vector of open facilities
+        :return: estimated transport cost including penalties for unserved demand
+        """
+        self.evaluation_count += 1
+        shortage = max(0.0, self.required_supply - self.supply[is_open].sum())
+        open_ids = np.flatnonzero(is_open)
+        if open_ids.size == 0:
+            return self.penalty * (self.demand.sum() + shortage)
+
+        cost = self.cost[open_ids]
+        customers = np.arange(cost.shape[1])
+        if open_ids.size > 1:
+            two_cheapest = np.argpartition(cost, 1, axis=0)[:2]
+            first = np.where(cost[two_cheapest[0], customers] <= cost[two_cheapest[1], customers],
+                             two_cheapest[0], two_cheapest[1])
+            second = np.where(first == two_cheapest[0], two_cheapest[1], two_cheapest[0])
+            regret = cost[second, customers] - cost[first, customers]
+        else:
+            first = np.zeros(cost.shape[1], dtype=int)
+            regret = np.full(cost.shape[1], np.inf)
+        cheapest = cost[first, customers]
+
+        is_served = np.isfinite(cheapest)
+        unserved = float(self.demand[~is_served].sum())
+        served_demand = np.where(is_served, self.demand, 0.0)
+        load = np.bincount(first, weights=served_demand, minlength=open_ids.size)
+        overload = np.maximum(load - self.supply[open_ids], 0.0)
+        regret = np.where(np.isfinite(regret), regret, self.penalty)
+        weighted_regret = np.bincount(first, weights=regret * served_demand, minlength=open_ids.size)
+        mean_regret = np.divide(weighted_regret, load, out=np.zeros_like(load), where=load > 0.0)
+
+        return float(cheapest[is_served] @ self.demand[is_served] + overload @ mean_regret
+                     + self.penalty * (unserved + shortage))
+
+    def total_cost(self, is_open: np.ndarray) -> float:
+        return float(self.build_cost @ is_open) + self.transport_estimate(is_open)
+
+    def _best_flip(self, is_open: np.ndarray, candidates: np.ndarray) -> Tuple[float, int]:
+        """
+        :return: pair (best total cost, facility) over flips of candidate facilities, facility is -1 if none
+        """
+        best_cost, best_facility = np.inf, -1
+        for i in candidates:
+            is_open[i] = not is_open[i]
+            cost = self.total_cost(is_open)
+            is_open[i] = not is_open[i]
+            if cost < best_cost:
+                best_cost, best_facility = cost, i
+        return best_cost, best_facility
+
+    def _closable(self, is_open: np.ndarray) -> np.ndarray:
+        """
+        :return: open facilities which are not existing and whose closing keeps the required supply
+        """
+        spare_supply = self.supply[is_open].sum() - self.required_supply
+        return np.flatnonzero(is_open & ~self.exists & (self.supply <= spare_supply))
+
+    def _repair(self, is_open: np.ndarray) -> None:
+        """
+        Opens facilities of the lowest build cost per unit of supply until the required supply is covered.
+        """
+        unit_cost = self.build_cost / np.maximum(self.supply, np.finfo(float).tiny)
+        for i in np.argsort(np.where(is_open, np.inf, unit_cost), kind='stable'):
+            if is_open[i] or self.supply[is_open].sum() >= self.required_supply:
+                break
+            is_open[i] = True
+
+    def run(self) -> np.ndarray:
+        """
+        :return: boolean vector of open facilities, existing facilities are always open; their supply covers
+                 the required supply whenever all facilities together do
+        """
+        s = timer()
+        is_open = self.exists.copy()
+        current = self.total_cost(is_open)
+
+        # add facilities while it pays off
+        while not is_open.all():
+            cost, facility = self._best_flip(is_open, np.flatnonzero(~is_open))
+            if cost >= current:
+                break
+            is_open[facility], current = True, cost
+
+        # a shortage left by the greedy add would make the start infeasible
+        self._repair(is_open)
+        current = self.total_cost(is_open)
+
+        # drop facilities which became redundant
+        while True:
+            cost, facility = self._best_flip(is_open, self._closable(is_open))
+            if facility < 0 or cost >= current:
+                break
+            is_open[facility], current = False, cost
+
+        # swap an open facility with one of closed facilities of best add gains
+        for _ in range(self.max_swap_rounds):
+            closed = np.flatnonzero(~is_open)
+            add_costs = []
+            for k in closed:
+                is_open[k] = True
+                add_costs.append(self.total_cost(is_open))
+                is_open[k] = False
+            best_swap = (current, -1, -1)
+            for k in closed[np.argsort(add_costs)[:self.swap_candidates]]:
+                is_open[k] = True
+                cost, facility = self._best_flip(is_open, self._closable(is_open))
+                is_open[k] = False
+                if cost < best_swap[0]:
+                    best_swap = (cost, facility, k)
+            current, facility, k = best_swap
+            if facility < 0:
+                break
+            is_open[facility], is_open[k] = False, True
+
+        logging.info("Start heuristic opened %d facilities with estimated cost %f in %f sec (%d evaluations).",
+                     is_open.sum(), current, timer() - s, self.evaluation_count)
+        return is_open
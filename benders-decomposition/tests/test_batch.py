@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from benders_decomposition.batch import solve_variants, variant_vectors
+from input import generate_instance
+from standalone_facility_location_model import solve_using_standalone_model
+from test_benders import MIP_GAP
+
+
+def make_variants(data, n_variants):
+    rng = np.random.default_rng(0)
+    variants = []
+    for k in range(n_variants):
+        variant = dict(name=f'variant_{k}')
+        if k % 2 == 1:
+            variant['demand'] = {name: float(value) for name, value
+                                 in zip(data.customer_names, data.demand_vector() * rng.uniform(0.8, 1.1, size=20))}
+        if k % 3 == 2:
+            variant['build_cost'] = {data.facility_names[0]: 0.0}
+            variant['exists'] = {data.facility_names[1]: True}
+        variants.append(variant)
+    return variants
+
+
+@pytest.mark.parametrize('options', [dict(), dict(backend='transport'), dict(workers=2)])
+def test_variants_match_individual_standalone_solves(options):
+    data = generate_instance(8, 20, 0, capacity_tightness=1.5)
+    variants = make_variants(data, 6)
+    rows = solve_variants(data, variants, **options)
+
+    assert [row['name'] for row in rows] == [variant['name'] for variant in variants]
+    for variant, row in zip(variants, rows):
+        demand, build_cost, exists = variant_vectors(data, variant)
+        expected = solve_using_standalone_model(data.variant(demand=demand, build_cost=build_cost, exists=exists))
+        assert row['status'] == 'OPTIMAL'
+        assert row['objective'] == pytest.approx(expected['objective'], rel=MIP_GAP)
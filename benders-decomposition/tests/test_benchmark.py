@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import benchmark
+from input import generate_instance
+from test_benders import MIP_GAP
+
+
+@pytest.mark.parametrize('arguments', [dict(), dict(costs='uniform', density=0.5, n_clusters=3, n_scenarios=2)])
+def test_generator_is_deterministic_and_feasible(arguments):
+    data = generate_instance(10, 30, 7, capacity_tightness=1.2, **arguments)
+    again = generate_instance(10, 30, 7, capacity_tightness=1.2, **arguments)
+    np.testing.assert_array_equal(data.cost_matrix(), again.cost_matrix())
+    np.testing.assert_array_equal(data.facility_build_cost, again.facility_build_cost)
+    np.testing.assert_array_equal(data.demand_vector(), again.demand_vector())
+    demands = data.scenario_demand if data.is_stochastic() else data.demand_vector()[None, :]
+    if data.is_stochastic():
+        np.testing.assert_array_equal(demands, again.scenario_demand)
+    assert data.supply_vector().sum() >= 1.2 * demands.sum(axis=1).max()
+    # every customer keeps at least one lane
+    assert np.isfinite(data.cost_matrix()).any(axis=0).all()
+
+
+def test_benchmark_methods_agree():
+    records = benchmark.run_benchmark([(8, 20)], benchmark.METHODS, [0], dict(capacity_tightness=1.5),
+                                      dict(backend='transport', candidates=0))
+    assert [record['method'] for record in records] == benchmark.METHODS
+    assert all('error' not in record for record in records)
+    objective = records[0]['objective']
+    for record in records[1:]:
+        assert record['objective'] == pytest.approx(objective, rel=MIP_GAP)
+        assert record['peak_rss_mb'] > 0
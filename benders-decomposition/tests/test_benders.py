@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from benders_decomposition.solver import LpPhase, NodeCuts, solve_using_benders_decomposition
+from input import InputData, generate_instance
+from standalone_facility_location_model import solve_using_standalone_model
+
+# objectives of both methods agree within the default relative MIP gap of Gurobi
+MIP_GAP = 1e-4
+
+
+def assert_matches_standalone(data, **options):
+    expected = solve_using_standalone_model(data)
+    statistics = solve_using_benders_decomposition(data, **options)
+    assert statistics['objective'] == pytest.approx(expected['objective'], rel=MIP_GAP)
+    return statistics
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('capacity_tightness', [1.2, 2.0])
+def test_single_cut_matches_standalone(seed, capacity_tightness):
+    data = generate_instance(8, 20, seed, capacity_tightness=capacity_tightness)
+    statistics = assert_matches_standalone(data, cuts='single')
+    assert statistics['optimality_cuts'] > 0
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('n_clusters', [None, 3])
+def test_multi_cut_matches_standalone(seed, n_clusters):
+    # customers without a cluster are blocks of their own
+    data = generate_instance(8, 20, seed, capacity_tightness=1.5, n_clusters=n_clusters)
+    assert_matches_standalone(data, cuts='multi')
+
+
+def test_worker_pool_matches_local_blocks():
+    data = generate_instance(8, 20, 0, capacity_tightness=1.5, n_clusters=3)
+    local = solve_using_benders_decomposition(data, cuts='multi')
+    pooled = assert_matches_standalone(data, cuts='multi', workers=2)
+    assert pooled['objective'] == pytest.approx(local['objective'], rel=MIP_GAP)
+
+
+@pytest.mark.parametrize('cuts', ['single', 'multi'])
+def test_transport_backend_matches_standalone(cuts):
+    data = generate_instance(8, 20, 1, capacity_tightness=1.2, n_clusters=3)
+    assert_matches_standalone(data, cuts=cuts, backend='transport')
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('cuts', ['single', 'multi'])
+def test_node_cuts_match_standalone(seed, cuts):
+    data = generate_instance(10, 30, seed, capacity_tightness=1.5, n_clusters=3)
+    statistics = assert_matches_standalone(data, cuts=cuts, node_cuts=NodeCuts(max_nodes=100))
+    assert statistics['user_cuts'] > 0
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('backend', ['gurobi', 'transport'])
+def test_pareto_cuts_match_standalone(seed, backend):
+    data = generate_instance(8, 20, seed, capacity_tightness=1.2)
+    assert_matches_standalone(data, pareto_cuts=True, backend=backend)
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('cuts', ['single', 'multi'])
+def test_lp_phase_matches_standalone(seed, cuts):
+    data = generate_instance(8, 20, seed, capacity_tightness=1.2, n_clusters=3)
+    statistics = assert_matches_standalone(data, cuts=cuts, lp_phase=LpPhase())
+    assert statistics['lp_cuts'] > 0
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('options', [dict(), dict(node_cuts=NodeCuts(max_nodes=100)), dict(cuts='multi', workers=2)])
+def test_background_solves_match_standalone(seed, options):
+    data = generate_instance(8, 20, seed, capacity_tightness=1.2, n_clusters=3)
+    assert_matches_standalone(data, background=True, **options)
+
+
+@pytest.mark.parametrize('cuts', ['single', 'multi'])
+def test_reference_instance_matches_standalone(cuts):
+    # known optimum of the example instance shipped with the project
+    data = InputData.read(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'data',
+                                       'rk_martin_ex_10_8.json'))
+    statistics = assert_matches_standalone(data, cuts=cuts)
+    assert statistics['objective'] == pytest.approx(860000.0)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from input import InputData, generate_instance
+from input.binary_format import is_binary_instance
+from test_benders import assert_matches_standalone
+
+
+def assert_same_data(actual: InputData, expected: InputData):
+    assert actual.facility_names == expected.facility_names
+    assert actual.customer_names == expected.customer_names
+    assert actual.is_dense() == expected.is_dense()
+    np.testing.assert_array_equal(actual.supply_vector(), expected.supply_vector())
+    np.testing.assert_array_equal(actual.demand_vector(), expected.demand_vector())
+    np.testing.assert_array_equal(actual.facility_build_cost, expected.facility_build_cost)
+    np.testing.assert_array_equal(actual.facility_exists, expected.facility_exists)
+    np.testing.assert_array_equal(actual.cost_matrix(), expected.cost_matrix())
+    assert actual.customer_cluster == expected.customer_cluster
+    assert actual.is_stochastic() == expected.is_stochastic()
+    if expected.is_stochastic():
+        assert actual.scenario_names == expected.scenario_names
+        np.testing.assert_array_equal(actual.scenario_probability, expected.scenario_probability)
+        np.testing.assert_array_equal(actual.scenario_demand, expected.scenario_demand)
+
+
+@pytest.mark.parametrize('arguments', [dict(),
+                                       dict(density=0.5, n_clusters=3),
+                                       dict(n_scenarios=3)])
+def test_binary_instance_reads_like_npz(tmp_path, arguments):
+    data = generate_instance(6, 15, 0, **arguments)
+    binary_path, npz_path = str(tmp_path / 'instance.bin'), str(tmp_path / 'instance.npz')
+    data.save_binary(binary_path)
+    data.save_npz(npz_path)
+
+    assert is_binary_instance(binary_path) and not is_binary_instance(npz_path)
+    binary = InputData.read(binary_path)
+    assert_same_data(binary, data)
+    assert_same_data(binary, InputData.read(npz_path))
+
+
+def test_benders_on_memory_mapped_instance_matches_standalone(tmp_path):
+    path = str(tmp_path / 'instance.bin')
+    generate_instance(8, 20, 0, capacity_tightness=1.5, density=0.6).save_binary(path)
+    assert_matches_standalone(InputData.read(path), cuts='multi')
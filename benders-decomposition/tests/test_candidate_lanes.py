@@ -0,0 +1,25 @@
+import pytest
+
+from input import generate_instance
+from standalone_facility_location_model import solve_using_standalone_model
+from test_benders import MIP_GAP, assert_matches_standalone
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('cuts', ['single', 'multi'])
+def test_benders_with_candidate_lanes_matches_standalone(seed, cuts):
+    # restored lanes keep the cuts valid, so the optimum of the full model is reached
+    data = generate_instance(8, 20, seed, capacity_tightness=1.2, n_clusters=3)
+    assert_matches_standalone(data, cuts=cuts, candidates=2)
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('density', [1.0, 0.6])
+def test_restricted_standalone_model_is_exact_or_heuristic(seed, density):
+    data = generate_instance(8, 20, seed, capacity_tightness=1.2, density=density)
+    expected = solve_using_standalone_model(data)
+    restricted = solve_using_standalone_model(data, candidates=2)
+    if restricted['heuristic']:
+        assert restricted['objective'] >= expected['objective'] * (1 - MIP_GAP)
+    else:
+        assert restricted['objective'] == pytest.approx(expected['objective'], rel=MIP_GAP)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from benders_decomposition.cut import Cut, OPTIMALITY
+from benders_decomposition.cut_cache import CutCache
+from benders_decomposition.solver import solve_using_benders_decomposition
+from input import generate_instance
+from test_benders import MIP_GAP, assert_matches_standalone
+
+
+def make_cut(n_facilities: int = 4) -> Cut:
+    return Cut(OPTIMALITY, np.zeros(n_facilities), 1.0, None, np.zeros(n_facilities), np.zeros(3))
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CutCache(max_entries=2, max_bytes=10 ** 6)
+    keys = [CutCache.key(np.array(is_open, dtype=bool)) for is_open in [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0]]]
+    cache.put(keys[0], [make_cut()])
+    cache.put(keys[1], [make_cut()])
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], [make_cut()])
+
+    assert keys[0] in cache and keys[1] not in cache and keys[2] in cache
+    assert cache.get(keys[1]) is None
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+
+
+def test_memory_limit_evicts_entries():
+    cut = make_cut()
+    cache = CutCache(max_entries=100, max_bytes=CutCache._entry_bytes(b'\x00', [cut]) * 2)
+    for i in range(5):
+        cache.put(bytes([i]), [cut])
+    assert len(cache.entries) == 2
+    assert cache.size_bytes <= cache.max_bytes
+    assert cache.evictions == 3
+
+
+@pytest.mark.parametrize('seed', range(2))
+def test_cached_cuts_give_same_objective_as_uncached(seed):
+    data = generate_instance(8, 20, seed, capacity_tightness=1.2)
+    uncached = solve_using_benders_decomposition(data, cut_cache_size=0)
+    cached = assert_matches_standalone(data)
+    assert cached['objective'] == pytest.approx(uncached['objective'], rel=MIP_GAP)
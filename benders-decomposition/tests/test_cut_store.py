@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from benders_decomposition.cut_store import CutStore
+from input import generate_instance
+from test_benders import MIP_GAP, assert_matches_standalone
+
+
+@pytest.mark.parametrize('cuts', ['single', 'multi'])
+def test_stored_cuts_seed_changed_instance(tmp_path, cuts):
+    path = str(tmp_path / 'cuts.npz')
+    data = generate_instance(8, 20, 0, capacity_tightness=1.5, n_clusters=3)
+    first = assert_matches_standalone(data, cuts=cuts, cut_store_path=path)
+
+    if cuts == 'single':
+        assert len(CutStore(data, dict()).load(path)) > 0
+    # cuts re-derived for changed demands must not cut off the optimum of the changed instance
+    rng = np.random.default_rng(0)
+    changed = data.variant(demand=data.demand_vector() * rng.uniform(0.8, 1.2, size=20))
+    assert_matches_standalone(changed, cuts=cuts, cut_store_path=path)
+    second = assert_matches_standalone(data, cuts=cuts, cut_store_path=path)
+    assert second['objective'] == pytest.approx(first['objective'], rel=MIP_GAP)
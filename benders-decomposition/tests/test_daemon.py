@@ -0,0 +1,46 @@
+import os
+import threading
+
+import pytest
+
+import daemon
+from input import generate_instance
+from standalone_facility_location_model import solve_using_standalone_model
+from test_benders import MIP_GAP
+
+
+def test_strip_option_removes_both_forms():
+    assert daemon.strip_option(['data.json', '--daemon', 'a.sock', '--cuts', 'multi'], '--daemon') == \
+        ['data.json', '--cuts', 'multi']
+    assert daemon.strip_option(['data.json', '--daemon=a.sock'], '--daemon') == ['data.json']
+
+
+def test_jobs_of_daemon_match_standalone_model(tmp_path, monkeypatch):
+    data = generate_instance(8, 20, 0, capacity_tightness=1.5, n_clusters=3)
+    data.save_npz(str(tmp_path / 'instance.npz'))
+    expected = solve_using_standalone_model(data)
+
+    socket_path = str(tmp_path / 'daemon.sock')
+    solver_daemon = daemon.SolverDaemon(socket_path, workers=1)
+    thread = threading.Thread(target=solver_daemon.serve)
+    thread.start()
+    try:
+        while not os.path.exists(socket_path):
+            thread.join(0.05)
+        # relative paths are resolved in the working directory of the client
+        monkeypatch.chdir(tmp_path)
+        first = daemon.submit(socket_path, ['instance.npz', '--method', 'benders_decomposition'])
+        second = daemon.submit(socket_path, ['instance.npz', '--method', 'benders_decomposition', '--cuts', 'multi'])
+        with pytest.raises(RuntimeError):
+            daemon.submit(socket_path, ['instance.npz', '--cuts', 'unknown'])
+        assert solver_daemon.status()['finished'] == 2
+        # both jobs are solved by the warm worker from its single cached instance
+        assert solver_daemon.workers[0].job_count == 2
+        assert len(solver_daemon.workers[0].cached) == 1
+    finally:
+        solver_daemon.shutdown()
+        thread.join()
+
+    for results in [first, second]:
+        assert results['benders_decomposition']['objective'] == pytest.approx(expected['objective'], rel=MIP_GAP)
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,56 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from input import InputData, generate_instance
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'data', 'rk_martin_ex_10_8.json')
+
+
+def write_json(data: InputData, path: str) -> None:
+    cost = data.cost_matrix()
+    document = dict(
+        facilities=[dict(name=name, supply=float(data.facility_supply[i]), buildCost=float(data.facility_build_cost[i]),
+                         exists=bool(data.facility_exists[i]),
+                         transportCost=[dict(customer=data.customer_names[j], cost=float(cost[i, j]))
+                                        for j in np.flatnonzero(np.isfinite(cost[i]))])
+                    for i, name in enumerate(data.facility_names)],
+        customers=[dict(name=name, demand=float(demand)) for name, demand in zip(data.customer_names,
+                                                                                  data.demand_vector())])
+    with open(path, 'w') as f:
+        json.dump(document, f)
+
+
+def test_streamed_instance_matches_json_document():
+    with open(DATA) as f:
+        document = json.load(f)
+    data = InputData.read(DATA)
+
+    assert data.facility_names == [facility['name'] for facility in document['facilities']]
+    assert data.customer_names == [customer['name'] for customer in document['customers']]
+    np.testing.assert_array_equal(data.supply_vector(), [facility['supply'] for facility in document['facilities']])
+    np.testing.assert_array_equal(data.facility_build_cost,
+                                  [facility.get('buildCost') or 0.0 for facility in document['facilities']])
+    np.testing.assert_array_equal(data.facility_exists,
+                                  [facility.get('exists', False) for facility in document['facilities']])
+    np.testing.assert_array_equal(data.demand_vector(), [customer['demand'] for customer in document['customers']])
+    cost = data.cost_matrix()
+    for i, facility in enumerate(document['facilities']):
+        for lane in facility['transportCost']:
+            assert cost[i, data.customer_names.index(lane['customer'])] == lane['cost']
+
+
+@pytest.mark.parametrize('density', [1.0, 0.5])
+@pytest.mark.parametrize('dense', [None, True, False])
+def test_generated_instance_survives_json_roundtrip(tmp_path, density, dense):
+    data = generate_instance(6, 15, 0, density=density)
+    path = str(tmp_path / 'instance.json')
+    write_json(data, path)
+    read = InputData.read(path, dense=dense)
+
+    assert read.is_dense() == (density == 1.0 if dense is None else dense)
+    np.testing.assert_array_equal(read.cost_matrix(), data.cost_matrix())
+    np.testing.assert_array_equal(read.supply_vector(), data.supply_vector())
+    np.testing.assert_array_equal(read.demand_vector(), data.demand_vector())
@@ -0,0 +1,38 @@
+import io
+import json
+
+import pytest
+
+from input.json_stream import JsonStreamReader
+
+DOCUMENT = """{
+    "name": "chunked",
+    "scale": 1.5e3,
+    "values": [1.5, -0.25, 3e-2, 12.125E+2, 7, -1.0e10, 0.5],
+    "facilities": [{"name": "F1", "supply": 2.75e2, "exists": true}, {"name": "F2", "supply": 100.5}],
+    "empty": [],
+    "flag": false,
+    "last": -12.5e-3
+}"""
+
+
+def read_stream(text: str, chunk_size: int) -> dict:
+    expected = json.loads(text)
+    result = {key: [] for key, value in expected.items() if isinstance(value, list)}
+    for key, item in JsonStreamReader(io.StringIO(text), chunk_size).items():
+        if isinstance(expected[key], list):
+            result[key].append(item)
+        else:
+            result[key] = item
+    return result
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 65))
+def test_numbers_cut_by_chunk_boundary(chunk_size):
+    assert read_stream(DOCUMENT, chunk_size) == json.load(io.StringIO(DOCUMENT))
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 65))
+def test_compact_document(chunk_size):
+    compact = json.dumps(json.loads(DOCUMENT), separators=(',', ':'))
+    assert read_stream(compact, chunk_size) == json.loads(compact)
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+import main
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+
+
+def test_daemon_socket_is_parsed_in_both_forms():
+    assert main.daemon_socket(['data.json', '--daemon', '/tmp/a.sock', '--method', 'standalone']) == '/tmp/a.sock'
+    assert main.daemon_socket(['data.json', '--daemon=/tmp/a.sock']) == '/tmp/a.sock'
+    assert main.daemon_socket(['data.json', '--method', 'standalone']) is None
+
+
+def test_daemon_submission_imports_only_standard_library():
+    # a fresh interpreter, modules imported by other tests must not hide imports of main
+    script = ("import sys, main\n"
+              "main.daemon.submit = lambda socket_path, argv: dict(argv=argv)\n"
+              "assert main.solve(['data.json', '--daemon', '/tmp/a.sock']) == dict(argv=['data.json'])\n"
+              "print(' '.join(m for m in ['gurobi', 'numpy', 'scipy', 'input', 'portfolio', 'benchmark',\n"
+              "                           'benders_decomposition'] if m in sys.modules))\n")
+    output = subprocess.run([sys.executable, '-c', script], cwd=SRC, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == ''
@@ -0,0 +1,36 @@
+import itertools
+
+import gurobi as grb
+import numpy as np
+import pytest
+
+from benders_decomposition.master_presolve import MasterPresolve
+from benders_decomposition.sub_problem_builder import SubProblemBuilder
+from input import generate_instance
+from test_benders import assert_matches_standalone
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('density', [1.0, 0.4])
+def test_covers_and_fixings_keep_every_feasible_facility_vector(seed, density):
+    data = generate_instance(7, 15, seed, capacity_tightness=1.1, density=density)
+    presolve = MasterPresolve(data).run()
+    # covers come before dominance inequalities, which may cut off feasible but dominated vectors
+    covers = presolve.cuts[:presolve.counts['capacity_covers'] + presolve.counts['reachability_covers']]
+    sub_problem = SubProblemBuilder(data).build()
+    for values in itertools.product([0.0, 1.0], repeat=7):
+        is_open = np.array(values)
+        if sub_problem.solve_for(is_open).status != grb.GRB.Status.OPTIMAL:
+            continue
+        assert all(cut.coefficients @ is_open + cut.constant >= -1e-9 for cut in covers)
+        assert is_open[presolve.fixed_open].all()
+    sub_problem.dispose()
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('arguments', [dict(capacity_tightness=1.05),
+                                       dict(capacity_tightness=1.3, density=0.4),
+                                       dict(capacity_tightness=1.3, n_scenarios=3)])
+def test_presolved_benders_matches_standalone(seed, arguments):
+    data = generate_instance(8, 20, seed, **arguments)
+    assert_matches_standalone(data, presolve=True)
@@ -0,0 +1,33 @@
+import csv
+import json
+
+import pytest
+
+from benders_decomposition.metrics import FIELDS
+from input import generate_instance
+from test_benders import assert_matches_standalone
+
+
+@pytest.mark.parametrize('cuts', ['single', 'multi'])
+def test_trace_accounts_for_added_cuts(tmp_path, cuts):
+    data = generate_instance(8, 20, 0, capacity_tightness=1.2, n_clusters=3)
+    path = tmp_path / 'metrics.csv'
+    statistics = assert_matches_standalone(data, cuts=cuts, metrics_path=str(path))
+
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        assert reader.fieldnames == FIELDS
+        rows = list(reader)
+    added = [row for row in rows if row['added'] == 'True']
+    assert len(added) == statistics['feasibility_cuts'] + statistics['optimality_cuts']
+    assert sum(row['kind'] == 'feasibility' for row in added) == statistics['feasibility_cuts']
+    assert len({row['event'] for row in rows}) <= statistics['callbacks']
+
+
+def test_trace_is_written_as_json_lines(tmp_path):
+    data = generate_instance(6, 15, 0)
+    path = tmp_path / 'metrics.jsonl'
+    assert_matches_standalone(data, metrics_path=str(path))
+    with open(path) as f:
+        rows = [json.loads(line) for line in f]
+    assert rows and all(set(row) <= set(FIELDS) for row in rows)
@@ -0,0 +1,40 @@
+import os
+
+import gurobi as grb
+import pytest
+
+from input import generate_instance
+from standalone_facility_location_model import solve_using_standalone_model
+from test_benders import MIP_GAP, assert_matches_standalone
+from utils.model_export import ModelExporter
+
+
+def test_unsupported_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ModelExporter(str(tmp_path), '.txt')
+
+
+@pytest.mark.parametrize('file_format', ['.lp', '.mps.gz'])
+@pytest.mark.parametrize('background', [False, True])
+def test_exported_standalone_model_solves_to_same_objective(tmp_path, file_format, background):
+    data = generate_instance(8, 20, 0, capacity_tightness=1.5)
+    exporter = ModelExporter(str(tmp_path), file_format, background)
+    expected = solve_using_standalone_model(data, exporter=exporter)
+    exporter.close()
+
+    (file_name,) = os.listdir(tmp_path)
+    assert file_name.endswith(file_format)
+    model = grb.read(str(tmp_path / file_name))
+    model.Params.OutputFlag = 0
+    model.optimize()
+    assert model.ObjVal == pytest.approx(expected['objective'], rel=MIP_GAP)
+    model.dispose()
+
+
+def test_benders_exports_master_and_snapshots(tmp_path):
+    data = generate_instance(8, 20, 0, capacity_tightness=1.2)
+    exporter = ModelExporter(str(tmp_path), '.lp', background=True)
+    statistics = assert_matches_standalone(data, exporter=exporter, snapshot_interval=1)
+    exporter.close()
+    assert statistics['callbacks'] > 0
+    assert exporter.written_count == len(os.listdir(tmp_path)) > 1
@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+import pytest
+
+import portfolio
+from input import generate_instance
+from standalone_facility_location_model import solve_using_standalone_model
+
+
+def test_engine_path_appends_engine_name():
+    assert portfolio.engine_path('out/metrics.csv', 'benders_single') == 'out/metrics_benders_single.csv'
+    assert portfolio.engine_path(None, 'standalone') is None
+
+
+def test_winner_matches_standalone_model(tmp_path):
+    data = generate_instance(8, 20, 0, capacity_tightness=1.5)
+    expected = solve_using_standalone_model(data)
+    solution_path = str(tmp_path / 'solution.npz')
+
+    statistics = portfolio.solve_using_portfolio(data, ['standalone', 'benders_single'], threads=1,
+                                                 export=(str(tmp_path / 'export'), '.lp', False),
+                                                 solution_path=solution_path,
+                                                 metrics_path=str(tmp_path / 'metrics.csv'))
+
+    assert statistics['winner'] in {'standalone', 'benders_single'}
+    assert statistics['objective'] == pytest.approx(expected['objective'], rel=1e-6)
+    # options reach the engines: the winner's solution, per-engine exports and Benders metrics are written
+    with np.load(solution_path) as solution:
+        assert float(solution['total_cost']) == pytest.approx(expected['objective'], rel=1e-6)
+    assert sorted(os.listdir(tmp_path / 'export')) == ['benders_single', 'standalone']
+    assert (tmp_path / 'metrics_benders_single.csv').exists()
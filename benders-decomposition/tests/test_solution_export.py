@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+from benders_decomposition.solver import solve_using_benders_decomposition
+from input import generate_instance
+from standalone_facility_location_model import solve_using_standalone_model
+from test_benders import MIP_GAP
+
+TOLERANCE = 1e-6
+
+
+@pytest.mark.parametrize('arguments', [dict(), dict(density=0.5), dict(n_scenarios=3)])
+@pytest.mark.parametrize('method', ['standalone', 'benders'])
+def test_written_solution_is_feasible_and_costs_the_objective(tmp_path, arguments, method):
+    data = generate_instance(8, 20, 0, capacity_tightness=1.3, **arguments)
+    path = str(tmp_path / 'solution.npz')
+    solve = solve_using_standalone_model if method == 'standalone' else solve_using_benders_decomposition
+    statistics = solve(data, solution_path=path)
+
+    supply = np.asarray(data.facility_supply, dtype=float)
+    demands = data.scenario_demand if data.is_stochastic() else [data.demand_vector()]
+    with np.load(path) as solution:
+        assert float(solution['total_cost']) == pytest.approx(statistics['objective'], rel=MIP_GAP)
+        is_open = solution['is_open']
+        assert sorted(np.array(data.facility_names)[is_open]) == sorted(statistics['open_facilities'])
+        excess = 0.0
+        for k, demand in enumerate(demands):
+            in_scenario = solution['flow_scenario'] == k
+            facility, customer = solution['flow_facility'][in_scenario], solution['flow_customer'][in_scenario]
+            flow = solution['flow'][in_scenario]
+            np.testing.assert_allclose(np.bincount(customer, flow, len(demand)), demand,
+                                       rtol=TOLERANCE, atol=TOLERANCE)
+            assert (np.bincount(facility, flow, len(supply)) <= supply * is_open + TOLERANCE).all()
+            transport_cost = float(solution['unit_cost'][in_scenario] @ flow)
+            np.testing.assert_allclose(data.cost_matrix()[facility, customer], solution['unit_cost'][in_scenario])
+            # duals are optimal for the open facilities, flows of the standalone model are optimal within its gap
+            dual_value = solution['demand_duals'][k] @ demand - solution['supply_duals'][k] @ (supply * is_open)
+            assert dual_value <= transport_cost * (1 + TOLERANCE)
+            if method == 'benders':
+                assert dual_value == pytest.approx(transport_cost, rel=TOLERANCE)
+            excess += solution['scenario_probability'][k] * (transport_cost - dual_value)
+            assert solution['transport_cost'][k] == pytest.approx(transport_cost)
+        assert excess <= MIP_GAP * statistics['objective']
+
+
+def test_solution_is_written_as_csv_files(tmp_path):
+    data = generate_instance(8, 20, 0, capacity_tightness=1.3, n_scenarios=2)
+    solve_using_benders_decomposition(data, solution_path=str(tmp_path / 'solution.csv'))
+    assert sorted(os.listdir(tmp_path)) == ['solution_costs.csv', 'solution_customers.csv',
+                                            'solution_facilities.csv', 'solution_flows.csv']
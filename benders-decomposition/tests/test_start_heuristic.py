@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from input import generate_instance
+from standalone_facility_location_model import solve_using_standalone_model
+from test_benders import MIP_GAP, assert_matches_standalone
+from utils.start_heuristic import StartHeuristic
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('capacity_tightness', [1.05, 1.3, 2.0])
+def test_start_supply_covers_demand(seed, capacity_tightness):
+    data = generate_instance(20, 60, seed, capacity_tightness=capacity_tightness)
+    is_open = StartHeuristic(data).run()
+    supply = np.asarray(data.facility_supply, dtype=float)
+    assert supply[is_open].sum() >= data.demand_vector().sum()
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_start_supply_covers_every_scenario(seed):
+    data = generate_instance(15, 40, seed, capacity_tightness=1.1, n_scenarios=5)
+    is_open = StartHeuristic(data).run()
+    supply = np.asarray(data.facility_supply, dtype=float)
+    assert supply[is_open].sum() >= data.scenario_demand.sum(axis=1).max()
+
+
+def test_existing_facilities_stay_open():
+    data = generate_instance(10, 30, 0, capacity_tightness=1.05)
+    data.facility_exists[:3] = True
+    is_open = StartHeuristic(data).run()
+    assert is_open[:3].all()
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_start_does_not_change_optimum(seed):
+    data = generate_instance(8, 20, seed, capacity_tightness=1.2)
+    expected = solve_using_standalone_model(data)
+    started = solve_using_standalone_model(data, heuristic_start=True)
+    assert started['objective'] == pytest.approx(expected['objective'], rel=MIP_GAP)
+    assert_matches_standalone(data, heuristic_start=True)
+    assert_matches_standalone(data, cuts='multi', heuristic_start=True)
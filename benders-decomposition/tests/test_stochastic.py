@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from benders_decomposition.saa import evaluate_decision, solve_using_saa
+from input import generate_instance
+from standalone_facility_location_model import solve_using_standalone_model
+from test_benders import MIP_GAP, assert_matches_standalone
+
+
+@pytest.mark.parametrize('seed', range(2))
+@pytest.mark.parametrize('options', [dict(cuts='single'), dict(cuts='multi'),
+                                     dict(cuts='multi', workers=2), dict(backend='transport')])
+def test_scenario_decomposition_matches_extensive_form(seed, options):
+    data = generate_instance(8, 20, seed, capacity_tightness=1.3, n_scenarios=3)
+    statistics = assert_matches_standalone(data, **options)
+
+    # the expected cost of the decision over all scenarios is the objective
+    is_open = np.isin(data.facility_names, statistics['open_facilities']).astype(float)
+    assert evaluate_decision(data, is_open) == pytest.approx(statistics['objective'], rel=MIP_GAP)
+
+
+def test_saa_upper_bound_is_evaluated_cost_of_best_decision():
+    data = generate_instance(8, 20, 0, capacity_tightness=1.3, n_scenarios=6)
+    expected = solve_using_standalone_model(data)
+    statistics = solve_using_saa(data, sample_size=3, replications=3)
+    assert statistics['upper_bound'] >= expected['objective'] * (1 - MIP_GAP)
+    is_open = np.isin(data.facility_names, statistics['open_facilities']).astype(float)
+    assert evaluate_decision(data, is_open) == pytest.approx(statistics['upper_bound'])
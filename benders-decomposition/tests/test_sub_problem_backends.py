@@ -0,0 +1,84 @@
+import gurobi as grb
+import numpy as np
+import pytest
+
+from benders_decomposition.backend_check import TOLERANCE, check_certificate, random_input_data
+from benders_decomposition.sub_problem_builder import SubProblemBuilder
+
+CONFIGURATIONS = [dict(backend=backend, candidates=candidates, pareto=pareto)
+                  for backend in ['gurobi', 'transport'] for candidates in [0, 2] for pareto in [False, True]]
+
+
+@pytest.mark.parametrize('configuration', CONFIGURATIONS)
+@pytest.mark.parametrize('seed', range(3))
+def test_added_lanes_and_demands_match_full_sub_problem(configuration, seed):
+    rng = np.random.default_rng(seed)
+    data = random_input_data(rng, 5, 10)
+    keep = rng.random(50) < 0.6
+    sub_problem = SubProblemBuilder(data.with_arcs(keep), **configuration).build()
+
+    facility_ids, customer_ids, costs = data.arcs()
+    sub_problem.add_arcs(facility_ids[~keep], customer_ids[~keep], costs[~keep])
+    demand = data.demand_vector() * rng.uniform(0.5, 1.5, size=10)
+    sub_problem.update_demand(demand)
+    data = data.variant(demand=demand)
+    reference = SubProblemBuilder(data).build()
+
+    for _ in range(5):
+        is_open = (rng.random(5) < 0.7) * rng.choice([1.0, 0.5], size=5)
+        expected, result = reference.solve_for(is_open), sub_problem.solve_for(is_open)
+        assert result.status == expected.status
+        if expected.status == grb.GRB.Status.OPTIMAL:
+            assert result.obj_val == pytest.approx(expected.obj_val, rel=TOLERANCE, abs=TOLERANCE)
+        assert check_certificate(sub_problem, data.cost_matrix(), is_open, result) == []
+    sub_problem.dispose()
+    reference.dispose()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_warm_started_solves_match_fresh_models(seed):
+    rng = np.random.default_rng(seed)
+    data = random_input_data(rng, 6, 12)
+    warm = SubProblemBuilder(data).build()
+    for _ in range(10):
+        # tight random vectors make some solves infeasible, after which the last optimal basis is restored
+        is_open = (rng.random(6) < 0.5).astype(float)
+        fresh = SubProblemBuilder(data).build()
+        expected, result = fresh.solve_for(is_open), warm.solve_for(is_open)
+        fresh.dispose()
+        assert result.status == expected.status
+        if expected.status == grb.GRB.Status.OPTIMAL:
+            assert result.obj_val == pytest.approx(expected.obj_val, rel=TOLERANCE, abs=TOLERANCE)
+        assert check_certificate(warm, data.cost_matrix(), is_open, result) == []
+        # a repeated vector reuses the result without solving
+        solve_count = warm.solve_count
+        assert warm.solve_for(is_open).status == result.status
+        assert warm.solve_count == solve_count
+    warm.dispose()
+
+
+@pytest.mark.parametrize('backend', ['gurobi', 'transport'])
+@pytest.mark.parametrize('seed', range(3))
+def test_pareto_cuts_dominate_backend_cuts_at_core_point(backend, seed):
+    rng = np.random.default_rng(seed)
+    data = random_input_data(rng, 6, 12)
+    supply, demand = data.supply_vector(), data.demand_vector()
+    plain = SubProblemBuilder(data, backend=backend).build()
+    pareto = SubProblemBuilder(data, backend=backend, pareto=True).build()
+
+    def cut_value(result, y):
+        return float(result.demand_duals @ demand - result.supply_duals @ (supply * y))
+
+    for _ in range(10):
+        is_open = (rng.random(6) < 0.7).astype(float)
+        core_point = pareto.core_point.copy()
+        expected, result = plain.solve_for(is_open), pareto.solve_for(is_open)
+        assert result.status == expected.status
+        if expected.status != grb.GRB.Status.OPTIMAL:
+            continue
+        # both cuts are tight at the facility vector, the Pareto-optimal one is at least as deep at the core point
+        assert cut_value(result, is_open) == pytest.approx(expected.obj_val, rel=TOLERANCE, abs=TOLERANCE)
+        assert cut_value(result, core_point) >= cut_value(expected, core_point) - TOLERANCE * max(1.0, expected.obj_val)
+        assert check_certificate(pareto, data.cost_matrix(), is_open, result) == []
+    plain.dispose()
+    pareto.dispose()
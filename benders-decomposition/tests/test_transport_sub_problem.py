@@ -0,0 +1,82 @@
+import gurobi as grb
+import numpy as np
+import pytest
+
+from input import InputData
+from benders_decomposition.backend_check import TOLERANCE, check_certificate, random_input_data
+from benders_decomposition.sub_problem_builder import SubProblemBuilder
+
+
+def build_both(data):
+    return [SubProblemBuilder(data, backend=backend).build() for backend in ['gurobi', 'transport']]
+
+
+def assert_agree(data, reference, transport, is_open):
+    expected, result = reference.solve_for(is_open), transport.solve_for(is_open)
+    assert result.status == expected.status
+    if expected.status == grb.GRB.Status.OPTIMAL:
+        assert result.obj_val == pytest.approx(expected.obj_val, rel=TOLERANCE, abs=TOLERANCE)
+    # duals of degenerate sub-problems differ, both must be certificates of the same outcome
+    assert check_certificate(transport, data.cost_matrix(), is_open, result) == []
+    assert check_certificate(reference, data.cost_matrix(), is_open, expected) == []
+    return result
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_warm_solves_match_sub_problem(seed):
+    rng = np.random.default_rng(seed)
+    data = random_input_data(rng, 6, 12)
+    reference, transport = build_both(data)
+    for _ in range(10):
+        is_open = rng.random(6) < 0.6
+        if rng.random() < 0.3:
+            # fractional facility values as separated at MIPNODE
+            is_open = is_open * rng.random(6)
+        assert_agree(data, reference, transport, is_open.astype(float))
+    reference.dispose()
+
+
+def test_farkas_ray_covers_unreachable_customers():
+    # customer c2 is served by f2 only
+    data = InputData(facility_names=['f0', 'f1', 'f2'],
+                     customer_names=['c0', 'c1', 'c2'],
+                     facility_supply=np.full(3, 100.0),
+                     facility_build_cost=np.zeros(3),
+                     facility_exists=np.zeros(3, dtype=bool),
+                     customer_demand=np.full(3, 10.0),
+                     arcs=(np.array([0, 0, 1, 1, 2, 2, 2]),
+                           np.array([0, 1, 0, 1, 0, 1, 2]),
+                           np.array([1.0, 2.0, 3.0, 1.0, 5.0, 5.0, 1.0])))
+    reference, transport = build_both(data)
+
+    result = assert_agree(data, reference, transport, np.array([1.0, 1.0, 0.0]))
+    assert result.status == grb.GRB.Status.INFEASIBLE
+    np.testing.assert_array_equal(result.demand_duals, [0.0, 0.0, -1.0])
+    np.testing.assert_array_equal(result.supply_duals, [0.0, 0.0, -1.0])
+
+    # reopening f2 restores feasibility from the flow left by the infeasible solve
+    assert_agree(data, reference, transport, np.array([1.0, 1.0, 1.0]))
+    reference.dispose()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_demand_updates_and_added_lanes_match_sub_problem(seed):
+    rng = np.random.default_rng(seed)
+    data = random_input_data(rng, 5, 10)
+    keep = rng.random(50) < 0.6
+    restricted = data.with_arcs(keep)
+    reference, transport = build_both(restricted)
+    is_open = np.ones(5)
+    assert_agree(restricted, reference, transport, is_open)
+
+    demand = data.demand_vector() * rng.uniform(0.5, 1.5, size=10)
+    for sub_problem in [reference, transport]:
+        sub_problem.update_demand(demand)
+    restricted = restricted.variant(demand=demand)
+    assert_agree(restricted, reference, transport, is_open)
+
+    facility_ids, customer_ids, costs = data.arcs()
+    for sub_problem in [reference, transport]:
+        sub_problem.add_arcs(facility_ids[~keep], customer_ids[~keep], costs[~keep])
+    assert_agree(data.variant(demand=demand), reference, transport, is_open)
+    reference.dispose()